@@ -0,0 +1,360 @@
+import json
+import os
+import threading
+import zlib
+from datetime import datetime
+
+from formato_binario import documentos_segmento, escribir_segmento, fusionar_segmentos, leer_registros
+
+
+class AlmacenSegmentos:
+    """Almacenamiento append-only del índice: segmentos inmutables + WAL.
+
+    Estructura en disco (directorio):
+        manifest.json        -> lista de segmentos vivos y WAL activo
+        seg_000001.bin       -> segmento inmutable en formato binario (mmap)
+        wal_000001.log       -> write-ahead log de páginas aún no selladas
+
+    Cada línea del WAL lleva un CRC32 para detectar escrituras cortadas por
+    un crash; una línea corrupta al final del WAL se descarta. Quien usa el
+    almacén decide cuándo sellar (ver necesita_sellar) y recibe el aviso
+    al_cambiar() cuando una fusión en segundo plano cambia los segmentos.
+
+    Las fusiones siguen una política por niveles de tamaño (ver
+    elegir_fusion): se juntan max_segmentos segmentos contiguos de tamaño
+    parecido, así que cada página se reescribe O(log n) veces en vez de
+    en cada fusión y hay como mucho max_segmentos - 1 segmentos por nivel.
+    """
+
+    def __init__(self, directorio, max_wal=1000, max_segmentos=8, al_cambiar=None):
+        self.directorio = directorio
+        self.max_wal = max_wal
+        self.max_segmentos = max_segmentos
+        self.al_cambiar = al_cambiar
+        self.lock = threading.RLock()
+        self.fusionando = False
+        self.wal = None
+        self.registros_wal = 0
+        self.manifest = None
+        # Archivos que no se pudieron borrar aún (p. ej. mmap abierto en Windows)
+        self.por_borrar = []
+
+    # ------------------------------------------------------------------
+    # Formato de registros
+    # ------------------------------------------------------------------
+    def codificar_registro(self, registro):
+        """Serializa un registro como '<crc32> <json>\\n'"""
+        datos = json.dumps(registro, ensure_ascii=False, separators=(',', ':'))
+        crc = zlib.crc32(datos.encode('utf-8')) & 0xffffffff
+        return f"{crc:08x} {datos}\n"
+
+    def decodificar_registro(self, linea):
+        """Devuelve el registro o None si la línea está cortada o corrupta"""
+        linea = linea.rstrip('\n')
+        if len(linea) < 10 or linea[8] != ' ':
+            return None
+        datos = linea[9:]
+        try:
+            if int(linea[:8], 16) != zlib.crc32(datos.encode('utf-8')) & 0xffffffff:
+                return None
+            return json.loads(datos)
+        except ValueError:
+            return None
+
+    def leer_archivo(self, nombre):
+        """Lee todos los registros válidos de un WAL (o segmento JSONL antiguo)"""
+        ruta = os.path.join(self.directorio, nombre)
+        registros = []
+        if not os.path.exists(ruta):
+            return registros
+        with open(ruta, 'r', encoding='utf-8', errors='replace') as f:
+            for linea in f:
+                registro = self.decodificar_registro(linea)
+                if registro is None:
+                    # Escritura incompleta: todo lo posterior es basura
+                    break
+                registros.append(registro)
+        return registros
+
+    def escribir_atomico(self, nombre, contenido):
+        """Escribe un archivo completo vía tmp + fsync + rename"""
+        ruta = os.path.join(self.directorio, nombre)
+        tmp = ruta + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(contenido)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, ruta)
+
+    # ------------------------------------------------------------------
+    # Manifest
+    # ------------------------------------------------------------------
+    def manifest_base(self):
+        return {
+            'version': 1,
+            'segmentos': [],
+            'wal': 'wal_000001.log',
+            'siguiente_id': 1,
+            'created': datetime.now().isoformat()
+        }
+
+    def guardar_manifest(self):
+        self.escribir_atomico('manifest.json',
+                              json.dumps(self.manifest, ensure_ascii=False, indent=2))
+
+    def existe(self):
+        return os.path.exists(os.path.join(self.directorio, 'manifest.json'))
+
+    def ruta(self, nombre):
+        return os.path.join(self.directorio, nombre)
+
+    def segmentos(self):
+        """Nombres de los segmentos vivos, en orden de doc_id"""
+        with self.lock:
+            return list(self.manifest['segmentos'])
+
+    def borrar(self, nombres):
+        """Borra archivos obsoletos; los que estén en uso se reintentan luego"""
+        for nombre in list(self.por_borrar) + list(nombres):
+            try:
+                if os.path.exists(self.ruta(nombre)):
+                    os.remove(self.ruta(nombre))
+                if nombre in self.por_borrar:
+                    self.por_borrar.remove(nombre)
+            except OSError:
+                if nombre not in self.por_borrar:
+                    self.por_borrar.append(nombre)
+
+    def nuevo_nombre(self, prefijo, extension):
+        """Reserva el siguiente identificador de archivo"""
+        numero = self.manifest['siguiente_id']
+        self.manifest['siguiente_id'] += 1
+        return f"{prefijo}_{numero:06d}.{extension}"
+
+    # ------------------------------------------------------------------
+    # Carga
+    # ------------------------------------------------------------------
+    def abrir(self):
+        """Abre el almacén y devuelve los registros del WAL para replay.
+
+        Los segmentos no se leen aquí: el índice los abre con mmap.
+        """
+        with self.lock:
+            os.makedirs(self.directorio, exist_ok=True)
+            ruta_manifest = os.path.join(self.directorio, 'manifest.json')
+            if os.path.exists(ruta_manifest):
+                with open(ruta_manifest, 'r', encoding='utf-8') as f:
+                    self.manifest = json.load(f)
+            else:
+                self.manifest = self.manifest_base()
+                self.guardar_manifest()
+
+            self.limpiar_huerfanos()
+            self.actualizar_segmentos_jsonl()
+
+            # Replay del WAL: se reescribe sin la cola corrupta para poder
+            # seguir añadiendo detrás de registros válidos
+            del_wal = self.leer_archivo(self.manifest['wal'])
+            self.escribir_atomico(self.manifest['wal'],
+                                  ''.join(self.codificar_registro(r) for r in del_wal))
+            self.registros_wal = len(del_wal)
+            self.wal = open(os.path.join(self.directorio, self.manifest['wal']),
+                            'a', encoding='utf-8')
+            return del_wal
+
+    def actualizar_segmentos_jsonl(self):
+        """Convierte los segmentos JSONL de versiones anteriores en un único segmento binario"""
+        antiguos = [n for n in self.manifest['segmentos'] if n.endswith('.jsonl')]
+        if not antiguos:
+            return
+        registros = []
+        urls_vistas = set()
+        for nombre in self.manifest['segmentos']:
+            lista = self.leer_archivo(nombre) if nombre.endswith('.jsonl') else leer_registros(self.ruta(nombre))
+            for registro in lista:
+                if registro.get('url') in urls_vistas:
+                    continue
+                urls_vistas.add(registro.get('url'))
+                registro.setdefault('doc_id', len(registros))
+                registros.append(registro)
+        destino = self.nuevo_nombre('seg', 'bin')
+        escribir_segmento(self.ruta(destino), registros, base=0)
+        viejos = self.manifest['segmentos']
+        self.manifest['segmentos'] = [destino]
+        self.guardar_manifest()
+        self.borrar(viejos)
+        print(f"📁 {len(antiguos)} segmentos JSONL convertidos a {destino}")
+
+    def limpiar_huerfanos(self):
+        """Borra archivos que no referencia el manifest (restos de un crash)"""
+        vivos = set(self.manifest['segmentos']) | {self.manifest['wal'], 'manifest.json'}
+        for nombre in os.listdir(self.directorio):
+            if nombre not in vivos and (nombre.startswith('seg_') or
+                                        nombre.startswith('wal_') or
+                                        nombre.endswith('.tmp')):
+                try:
+                    os.remove(os.path.join(self.directorio, nombre))
+                except OSError:
+                    pass
+
+    def importar(self, registros, created=None):
+        """Crea el primer segmento a partir de registros existentes (migración)"""
+        with self.lock:
+            if created:
+                self.manifest['created'] = created
+            if registros:
+                nombre = self.nuevo_nombre('seg', 'bin')
+                escribir_segmento(self.ruta(nombre), registros)
+                self.manifest['segmentos'].append(nombre)
+            self.guardar_manifest()
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    def agregar(self, registros):
+        """Añade registros al WAL con un único fsync para todo el lote"""
+        if not registros:
+            return
+        with self.lock:
+            self.wal.write(''.join(self.codificar_registro(r) for r in registros))
+            self.wal.flush()
+            os.fsync(self.wal.fileno())
+            self.registros_wal += len(registros)
+
+    def necesita_sellar(self):
+        return self.registros_wal >= self.max_wal
+
+    def sellar(self, terminos_nuevos=None):
+        """Convierte el WAL actual en un segmento binario inmutable y abre uno nuevo.
+
+        Devuelve el nombre del segmento creado (o None si el WAL estaba vacío).
+        """
+        with self.lock:
+            if self.registros_wal == 0:
+                return None
+            wal_viejo = self.manifest['wal']
+            self.wal.close()
+
+            registros = self.leer_archivo(wal_viejo)
+            segmento = self.nuevo_nombre('seg', 'bin')
+            escribir_segmento(self.ruta(segmento), registros, terminos_nuevos=terminos_nuevos)
+
+            # El manifest es el punto de commit: hasta que se reemplaza,
+            # el WAL viejo sigue siendo la fuente de verdad
+            self.manifest['segmentos'].append(segmento)
+            self.manifest['wal'] = self.nuevo_nombre('wal', 'log')
+            self.guardar_manifest()
+
+            self.borrar([wal_viejo])
+            self.wal = open(os.path.join(self.directorio, self.manifest['wal']),
+                            'a', encoding='utf-8')
+            self.registros_wal = 0
+
+            if self.elegir_fusion(self.manifest['segmentos']):
+                self.fusionar_en_segundo_plano()
+            return segmento
+
+    def fusionar_en_segundo_plano(self):
+        """Lanza la fusión de segmentos en un hilo daemon"""
+        with self.lock:
+            if self.fusionando:
+                return
+            self.fusionando = True
+        thread = threading.Thread(target=self.fusionar)
+        thread.daemon = True
+        thread.start()
+
+    def nivel(self, documentos):
+        """Nivel de tamaño de un segmento: 0 por debajo de max_segmentos WALs
+        sellados, 1 por debajo de max_segmentos² y así sucesivamente"""
+        factor = max(self.max_segmentos, 2)
+        nivel = 0
+        while documentos >= self.max_wal * factor ** (nivel + 1):
+            nivel += 1
+        return nivel
+
+    def elegir_fusion(self, segmentos):
+        """Tramo (inicio, fin) de segmentos contiguos que toca fusionar, o None.
+
+        El tamaño es el número de documentos (los bytes crecen menos que
+        las páginas porque el vocabulario se comparte). En cuanto hay
+        max_segmentos segmentos contiguos del mismo nivel se fusionan, los
+        del nivel más bajo primero, y el resultado pasa al nivel siguiente.
+        """
+        niveles = [self.nivel(documentos_segmento(self.ruta(nombre))) for nombre in segmentos]
+        llenos = []
+        inicio = 0
+        for fin in range(1, len(niveles) + 1):
+            if fin == len(niveles) or niveles[fin] != niveles[inicio]:
+                if fin - inicio >= max(self.max_segmentos, 2):
+                    llenos.append((inicio, fin))
+                inicio = fin
+        return min(llenos, key=lambda tramo: niveles[tramo[0]], default=None)
+
+    def fusionar(self):
+        """Fusiona los tramos que elige elegir_fusion hasta que no quede ninguno.
+
+        Los segmentos son inmutables, así que se leen sin bloquear a los
+        escritores; sólo el cambio de manifest se hace bajo el lock. Como
+        sellar() sólo añade al final, el tramo fusionado sigue en la misma
+        posición. fusionar_segmentos copia las secciones de los segmentos
+        sin cargar sus páginas en memoria.
+        """
+        try:
+            while True:
+                with self.lock:
+                    segmentos = list(self.manifest['segmentos'])
+                    tramo = self.elegir_fusion(segmentos)
+                    if tramo is None:
+                        return
+                    inicio, fin = tramo
+                    origen = segmentos[inicio:fin]
+                    destino = self.nuevo_nombre('seg', 'bin')
+
+                fusionar_segmentos(self.ruta(destino), [self.ruta(nombre) for nombre in origen])
+
+                with self.lock:
+                    if self.manifest['segmentos'][inicio:fin] != origen:
+                        # limpiar() cambió el almacén mientras se fusionaba
+                        self.borrar([destino])
+                        return
+                    self.manifest['segmentos'][inicio:fin] = [destino]
+                    self.guardar_manifest()
+
+                if self.al_cambiar:
+                    self.al_cambiar()
+                self.borrar(origen)
+        except Exception as e:
+            print(f"Error fusionando segmentos: {e}")
+        finally:
+            self.fusionando = False
+
+    def limpiar(self):
+        """Elimina todos los segmentos y el WAL"""
+        with self.lock:
+            viejos = list(self.manifest['segmentos']) + [self.manifest['wal']]
+            if self.wal:
+                self.wal.close()
+            # Los identificadores siguen creciendo para no reutilizar nombres
+            siguiente_id = self.manifest['siguiente_id']
+            self.manifest = self.manifest_base()
+            self.manifest['siguiente_id'] = siguiente_id
+            self.manifest['wal'] = self.nuevo_nombre('wal', 'log')
+            self.guardar_manifest()
+            self.borrar(viejos)
+            self.wal = open(os.path.join(self.directorio, self.manifest['wal']),
+                            'a', encoding='utf-8')
+            self.registros_wal = 0
+
+    def ultima_modificacion(self):
+        """Fecha ISO de la última escritura al almacén"""
+        rutas = [os.path.join(self.directorio, n) for n in ('manifest.json', self.manifest['wal'])]
+        tiempos = [os.path.getmtime(r) for r in rutas if os.path.exists(r)]
+        return datetime.fromtimestamp(max(tiempos)).isoformat() if tiempos else None
+
+    def estadisticas(self):
+        with self.lock:
+            return {
+                'segmentos': len(self.manifest['segmentos']),
+                'registros_wal': self.registros_wal
+            }
@@ -1,6 +1,10 @@
 from flask import Flask, render_template, request, jsonify, redirect, url_for
 from crawler import WebCrawler, CrawlerManager
 from indexador import Indexador
+from shards import IndexadorDistribuido
+import cliente_http
+from url_canonica import canonicalizar
+import os
 import threading
 import time
 import requests
@@ -9,9 +13,14 @@ import urllib.parse
 import re
 
 app = Flask(__name__)
-indexador = Indexador()
+
+# BUSCADOR_SHARDS > 1 reparte el índice en procesos worker (búsqueda scatter-gather)
+NUM_SHARDS = int(os.environ.get('BUSCADOR_SHARDS', '1'))
+indexador = IndexadorDistribuido(num_shards=NUM_SHARDS) if NUM_SHARDS > 1 else Indexador()
 crawler_manager = CrawlerManager()
 active_crawler = None
+# Pools keep-alive y caché DNS compartidos con los crawlers del proceso
+cliente = cliente_http.compartido()
 
 crawler_status = {
     'running': False,
@@ -84,23 +93,25 @@ def abrir_url():
         user_agent = USER_AGENTS.get(user_agent_key, USER_AGENTS['chrome'])
         headers = {'User-Agent': user_agent}
         
-        response = requests.head(url, headers=headers, timeout=5, allow_redirects=True)
+        response = cliente.head(url, headers=headers, timeout=5, allow_redirects=True)
         
         if response.status_code < 400:
+            # El índice guarda las URLs canónicas, como las del crawler
+            canonica = canonicalizar(url)
             # Si se solicita indexar y no está ya indexada
-            if indexar and not indexador.url_esta_indexada(url):
+            if indexar and not indexador.url_esta_indexada(canonica):
                 def indexar_url_task():
                     crawler = WebCrawler(max_pages=1, user_agent_key=user_agent_key)
-                    resultado = crawler.crawl_page(url, force_refresh=True)
+                    resultado = crawler.crawl_page(canonica, force_refresh=True, parsear_304=True)
                     if resultado['success'] and resultado['page_info']:
-                        indexador.agregar_paginas({url: resultado['page_info']})
+                        indexador.agregar_paginas({canonica: resultado['page_info']})
                 
                 thread = threading.Thread(target=indexar_url_task)
                 thread.daemon = True
                 thread.start()
                 mensaje_indexado = " (añadiendo al índice...)"
             else:
-                mensaje_indexado = " (ya estaba en el índice)" if indexador.url_esta_indexada(url) else ""
+                mensaje_indexado = " (ya estaba en el índice)" if indexador.url_esta_indexada(canonica) else ""
             
             return jsonify({
                 'success': True,
@@ -149,7 +160,7 @@ def buscar_en_internet():
                 'Cache-Control': 'no-cache'
             }
             
-            response = requests.get(search_url, headers=headers, timeout=10)
+            response = cliente.get(search_url, headers=headers, timeout=10)
             
             if response.status_code == 200:
                 from bs4 import BeautifulSoup
@@ -210,7 +221,7 @@ def buscar_en_internet():
         if len(resultados_totales) < 3:
             try:
                 ddg_url = f"https://html.duckduckgo.com/html/?q={urllib.parse.quote(query)}"
-                response = requests.get(ddg_url, headers=headers, timeout=10)
+                response = cliente.get(ddg_url, headers=headers, timeout=10)
                 
                 if response.status_code == 200:
                     from bs4 import BeautifulSoup
@@ -240,7 +251,7 @@ def buscar_en_internet():
         if len(resultados_totales) < 3:
             try:
                 bing_url = f"https://www.bing.com/search?q={urllib.parse.quote(query)}"
-                response = requests.get(bing_url, headers=headers, timeout=10)
+                response = cliente.get(bing_url, headers=headers, timeout=10)
                 
                 if response.status_code == 200:
                     from bs4 import BeautifulSoup
@@ -287,11 +298,14 @@ def buscar_en_internet():
         indexadas_count = 0
         
         for resultado in resultados_unicos[:5]:
-            url = resultado['url']
+            # El índice guarda las URLs canónicas, como las del crawler
+            url = canonicalizar(resultado['url'])
+            if url in paginas_indexadas:
+                continue
             if not indexador.url_esta_indexada(url):
                 try:
                     print(f"Indexando: {url}")
-                    page_result = crawler.crawl_page(url, force_refresh=True)
+                    page_result = crawler.crawl_page(url, force_refresh=True, parsear_304=True)
                     if page_result['success'] and page_result['page_info']:
                         paginas_indexadas[url] = page_result['page_info']
                         indexadas_count += 1
@@ -335,7 +349,7 @@ def proxy():
             'Upgrade-Insecure-Requests': '1'
         }
         
-        response = requests.get(url, headers=headers, timeout=10, stream=True)
+        response = cliente.get(url, headers=headers, timeout=10, stream=True)
         
         content_type = response.headers.get('Content-Type', '').lower()
         
@@ -608,7 +622,7 @@ def proxy_recurso():
         user_agent = USER_AGENTS.get(user_agent_key, USER_AGENTS['chrome'])
         headers = {'User-Agent': user_agent}
         
-        response = requests.get(url, headers=headers, timeout=10, stream=True)
+        response = cliente.get(url, headers=headers, timeout=10, stream=True)
         
         excluded_headers = ['content-encoding', 'content-length', 'transfer-encoding', 'connection']
         headers = [(name, value) for (name, value) in response.raw.headers.items()
@@ -633,7 +647,8 @@ def admin():
         crawler_status['pages_crawled'] = status['pages_crawled']
         crawler_status['domains_discovered'] = status['domains_discovered']
         crawler_status['queue_size'] = status['queue_size']
-        crawler_status['crawler_type'] = 'infinito'
+        crawler_status['pages_per_minute'] = status['pages_per_minute']
+        crawler_status['crawler_type'] = 'infinito' if status['mode'] == 'secuencial' else f"infinito {status['mode']}"
     
     return render_template('admin.html', 
                          stats=stats, 
@@ -650,14 +665,16 @@ def crawl():
     user_agent_key = request.form.get('user_agent', 'chrome')
     
     if action == 'start_infinite':
+        modo = request.form.get('mode', 'secuencial')
+        
         def indexador_callback(paginas):
             indexador.agregar_paginas(paginas)
         
-        active_crawler = crawler_manager.start_crawler(indexador_callback, user_agent_key)
+        active_crawler = crawler_manager.start_crawler(indexador_callback, user_agent_key, modo)
         
         crawler_status['running'] = True
         crawler_status['start_time'] = time.time()
-        crawler_status['crawler_type'] = 'infinito'
+        crawler_status['crawler_type'] = 'infinito' if modo == 'secuencial' else f'infinito {modo}'
         crawler_status['user_agent'] = user_agent_key
         
         return jsonify({
@@ -686,31 +703,39 @@ def crawl():
             
             def crawl_limited():
                 crawler.crawling_active = True
-                crawler.url_queue.put(url)
+                for semilla in crawler.semillas([url]):
+                    crawler.url_queue.put(semilla)
                 pages = 0
                 
                 while crawler.crawling_active and pages < max_pages:
                     try:
                         current_url = crawler.url_queue.get(timeout=5)
-                        if current_url in crawler.visited:
+                    except:
+                        break
+                    
+                    try:
+                        if crawler.ya_visitada(current_url):
                             continue
                         
                         result = crawler.crawl_page(current_url)
                         if result['success'] and result['page_info']:
-                            page_info = result['page_info']
-                            crawler.index[current_url] = page_info
-                            indexador.agregar_paginas({current_url: page_info})
+                            # Como los demás motores: las casi duplicadas no se
+                            # indexan ni aportan enlaces
+                            links = crawler.registrar_pagina(current_url, result, indexador.agregar_paginas)
+                            if result.get('duplicate_of'):
+                                continue
                             pages += 1
                             crawler_status['pages_crawled'] = pages
                             crawler_status['current_url'] = current_url
                             
-                            for link in result['links']:
-                                if link not in crawler.visited:
-                                    crawler.url_queue.put(link)
-                        
-                        crawler.url_queue.task_done()
+                            profundidad = crawler.url_queue.profundidad(current_url) + 1
+                            for link in links:
+                                crawler.url_queue.put(link, profundidad)
                     except:
                         break
+                    finally:
+                        # La frontera necesita la URL para liberar la plaza de su host
+                        crawler.url_queue.task_done(current_url)
                 
                 crawler_status['running'] = False
             
@@ -755,6 +780,29 @@ def cache_stats():
         return jsonify(stats)
     return jsonify({'error': 'No hay crawler activo'}), 404
 
+@app.route('/http_stats')
+def http_stats():
+    """Reutilización de conexiones y caché DNS de las peticiones salientes"""
+    return jsonify(cliente.estadisticas())
+
+@app.route('/filtro_urls', methods=['GET', 'POST'])
+def filtro_urls():
+    """Aciertos por regla del filtro de URLs; POST sustituye las reglas en caliente"""
+    global active_crawler
+    if not active_crawler:
+        return jsonify({'error': 'No hay crawler activo'}), 404
+    filtro = active_crawler.filtro_urls
+    if request.method == 'POST':
+        data = request.json or {}
+        try:
+            if data.get('ruta'):
+                filtro.recargar(data['ruta'])
+            else:
+                filtro.cambiar_reglas(data.get('dominios'), data.get('extensiones'), data.get('patrones'))
+        except (OSError, ValueError, re.error) as e:
+            return jsonify({'error': f'Reglas no válidas: {e}'}), 400
+    return jsonify(filtro.estadisticas())
+
 @app.route('/limpiar_cache', methods=['POST'])
 def limpiar_cache():
     """Limpia el caché manualmente"""
@@ -778,8 +826,8 @@ def forzar_actualizacion():
     
     global active_crawler
     if active_crawler:
-        active_crawler.eliminar_del_cache(url)
-        
+        # La copia en caché se conserva: sus ETag/Last-Modified hacen la
+        # petición condicional y un 304 sólo renueva la fecha
         def refresh_task():
             time.sleep(1)
             active_crawler.crawl_page(url, force_refresh=True)
@@ -0,0 +1,84 @@
+"""Mide top_k_wand frente a la puntuación exhaustiva sobre un índice sintético.
+
+Genera páginas con vocabulario zipfiano, las importa como un único
+segmento binario (como queda el índice tras una fusión) y mide, para
+consultas de uno y dos términos de distinta frecuencia, el tiempo de
+Indexador.buscar con y sin poda (sin caché de resultados). Comprueba
+además que los dos caminos devuelven los mismos resultados.
+
+Uso: python benchmarks/bench_busqueda.py [n_docs]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from itertools import accumulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from almacenamiento import AlmacenSegmentos
+from indexador import Indexador
+
+
+def generar_paginas(n_docs, vocabulario=50000, semilla=1):
+    """Registros de página con texto zipfiano y keywords como las del crawler"""
+    random.seed(semilla)
+    acumulados = list(accumulate(1 / (r + 1) for r in range(vocabulario)))
+    for doc_id in range(n_docs):
+        palabras = [f"t{w}" for w in random.choices(range(vocabulario), cum_weights=acumulados,
+                                                      k=random.randint(20, 200))]
+        yield {
+            'doc_id': doc_id,
+            'url': f"https://www.ejemplo-{doc_id % 977}.com/articulos/{doc_id}.html",
+            'title': ' '.join(palabras[:8]),
+            'description': ' '.join(palabras[8:20]),
+            'text_snippet': ' '.join(palabras[20:]),
+            'keywords': [w for w, _ in Counter(palabras).most_common(10)],
+            'domain': f"www.ejemplo-{doc_id % 977}.com",
+            'crawled_date': '2024-01-01T00:00:00'
+        }
+
+
+def medir(indexador, consulta, exhaustivo, repeticiones=5):
+    mejor = None
+    for _ in range(repeticiones):
+        indexador.cache.limpiar()
+        inicio = time.perf_counter()
+        resultados = indexador.buscar(consulta, exhaustivo=exhaustivo)
+        segundos = time.perf_counter() - inicio
+        mejor = segundos if mejor is None else min(mejor, segundos)
+    return mejor * 1000, resultados[0]
+
+
+def main():
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    directorio = tempfile.mkdtemp(prefix='bench_busqueda_')
+    try:
+        inicio = time.perf_counter()
+        almacen = AlmacenSegmentos(os.path.join(directorio, 'index'))
+        almacen.abrir()
+        almacen.importar(list(generar_paginas(n_docs)))
+        almacen.wal.close()
+        indexador = Indexador(os.path.join(directorio, 'index.json'))
+        print(f"{n_docs} documentos indexados en {time.perf_counter() - inicio:.1f} s\n")
+
+        segmento = indexador.segmentos[0]
+        print(f"{'consulta':<14} {'df':>8} {'wand ms':>9} {'exhaustivo ms':>14}")
+        for consulta in ('t0', 't1', 't10', 't100', 't1000', 't0 t1', 't0 t10', 't1 t100'):
+            df = sum(segmento.frecuencia_documental(t) for t in consulta.split())
+            ms_wand, wand = medir(indexador, consulta, False)
+            ms_todo, todo = medir(indexador, consulta, True)
+            if [r['url'] for r in wand] != [r['url'] for r in todo]:
+                print(f"  ¡{consulta}: resultados distintos!")
+            print(f"{consulta:<14} {df:>8} {ms_wand:>9.2f} {ms_todo:>14.2f}")
+        indexador.ingesta.cerrar()
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Compara la extracción de páginas con BeautifulSoup('html.parser') y con lxml.
+
+Para cada página mide el camino completo que usa el crawler (análisis,
+page_info y enlaces) con los dos motores y comprueba que el resultado
+coincide:
+
+    bs4     BeautifulSoup(html, 'html.parser') + extract_info + extract_links
+    lxml    extraccion.analizar (un solo recorrido) + construir_page_info
+
+Uso: python benchmarks/bench_extraccion.py [directorio_con_html | n_paginas]
+
+Sin directorio genera n_paginas sintéticas (200 por defecto) con la forma
+de una página de noticias: cabecera, navegación, artículo y pie.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler import WebCrawler
+
+PALABRAS = ('rastreo índice búsqueda página enlace servidor consulta documento motor '
+            'noticias tecnología ciencia economía deporte cultura política mundo').split()
+
+
+def pagina_sintetica(i):
+    random.seed(i)
+    texto = lambda n: ' '.join(random.choice(PALABRAS) for _ in range(n))
+    enlaces = ''.join(f'<li><a href="/seccion/{random.randint(1, 500)}">{texto(2)}</a></li>' for _ in range(40))
+    parrafos = ''.join(f'<p>{texto(60)} <a href="https://otro{random.randint(1, 50)}.com/a">{texto(3)}</a> '
+                       f'{texto(30)}</p>' for _ in range(25))
+    return (f'<!DOCTYPE html><html><head><title>{texto(6)}</title>'
+            f'<meta name="description" content="{texto(20)}"><meta name="keywords" content="{texto(5)}">'
+            f'<style>body {{ color: #333 }}</style><script>var x = {i};</script></head><body>'
+            f'<header><h1>{texto(4)}</h1></header><nav><ul>{enlaces}</ul></nav>'
+            f'<main><article>{parrafos}</article><aside>{texto(40)}</aside></main>'
+            f'<footer>{texto(20)}</footer></body></html>')
+
+
+def cargar_paginas(argumento):
+    if argumento and os.path.isdir(argumento):
+        paginas = []
+        for raiz, _, archivos in os.walk(argumento):
+            for nombre in archivos:
+                if nombre.endswith(('.html', '.htm')):
+                    with open(os.path.join(raiz, nombre), encoding='utf-8', errors='replace') as f:
+                        paginas.append((f'https://ejemplo.com/{nombre}', f.read()))
+        return paginas
+    n = int(argumento) if argumento else 200
+    return [(f'https://ejemplo.com/noticia/{i}', pagina_sintetica(i)) for i in range(n)]
+
+
+def medir(crawler, motor, paginas):
+    crawler.motor_html = motor
+    resultados = []
+    inicio = time.perf_counter()
+    for url, html in paginas:
+        resultados.append(crawler.extraer_pagina(url, html))
+    return time.perf_counter() - inicio, resultados
+
+
+def main():
+    paginas = cargar_paginas(sys.argv[1] if len(sys.argv) > 1 else None)
+    if not paginas:
+        print("No hay páginas HTML que medir")
+        return
+    crawler = WebCrawler(cache_dir=tempfile.mkdtemp(prefix='bench_extraccion_'))
+    megas = sum(len(html.encode('utf-8')) for _, html in paginas) / 1e6
+    print(f"{len(paginas)} páginas, {megas:.1f} MB\n")
+
+    tiempos = {}
+    salidas = {}
+    for motor in ('bs4', 'lxml'):
+        segundos, salidas[motor] = medir(crawler, motor, paginas)
+        tiempos[motor] = segundos
+        print(f"  {motor:<6} {len(paginas) / segundos:8.1f} páginas/s {megas / segundos:7.2f} MB/s")
+    print(f"\n  lxml es {tiempos['bs4'] / tiempos['lxml']:.1f}x más rápido")
+
+    sin_fecha = lambda info: info and {k: v for k, v in info.items() if k != 'crawled_date'}
+    distintas = sum(1 for (a, la), (b, lb) in zip(salidas['bs4'], salidas['lxml'])
+                    if sin_fecha(a) != sin_fecha(b) or la != lb)
+    print(f"  resultados distintos: {distintas} de {len(paginas)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Compara la representación de postings comprimida por bloques con las anteriores.
+
+Genera un corpus sintético con vocabulario zipfiano y mide, para cada
+representación, bytes por posting y velocidad de recorrido:
+
+    urls       dict término -> lista de URLs (índice JSON original)
+    dict       dict término -> {doc_id: tf} (segmento en memoria anterior)
+    u32        arrays u32 de doc_id y tf sin comprimir (segmento binario v1)
+    bloques    bloques de TAM_BLOQUE con deltas empaquetados (segmento v3)
+
+Uso: python benchmarks/bench_postings.py [n_docs]
+"""
+
+import os
+import random
+import sys
+import time
+from array import array
+from itertools import accumulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from postings import CursorBloques, ListaBloques, codificar_lista
+from recuperacion import CursorPostings
+
+
+def generar_corpus(n_docs, vocabulario=50000, terminos_por_doc=20, semilla=1):
+    """Postings {término: (docs, tfs)} con frecuencias zipfianas"""
+    random.seed(semilla)
+    acumulados = list(accumulate(1 / (r + 1) for r in range(vocabulario)))
+    postings = {}
+    for doc_id in range(n_docs):
+        terminos = set(random.choices(range(vocabulario), cum_weights=acumulados, k=terminos_por_doc))
+        for t in terminos:
+            docs, tfs = postings.setdefault(t, ([], []))
+            docs.append(doc_id)
+            tfs.append(min(int(random.expovariate(0.7)) + 1, 300))
+    return postings
+
+
+def tam_urls(postings):
+    """Bytes de las listas de URLs; las cadenas se cuentan una vez por documento"""
+    urls = {}
+    total = 0
+    for docs, _ in postings.values():
+        lista = []
+        for d in docs:
+            url = urls.get(d)
+            if url is None:
+                url = urls[d] = f"https://www.ejemplo-{d % 977}.com/articulos/{d}/pagina.html"
+                total += sys.getsizeof(url)
+            lista.append(url)
+        total += sys.getsizeof(lista)
+    return total
+
+
+def tam_dict(postings):
+    """Bytes de los dicts; cada doc_id es un int compartido entre todos sus términos"""
+    total = 0
+    ids = set()
+    for docs, tfs in postings.values():
+        total += sys.getsizeof(dict(zip(docs, tfs)))
+        ids.update(docs)
+    # Los int > 256 no están cacheados por el intérprete
+    return total + sum(sys.getsizeof(x) for x in ids if x > 256)
+
+
+def tam_u32(postings):
+    return sum(len(docs) * 8 for docs, _ in postings.values())
+
+
+def codificar(postings):
+    listas = {}
+    total = 0
+    for t, (docs, tfs) in postings.items():
+        primeros, ultimos, offsets, max_tfs, min_lens, max_pesos, datos = codificar_lista(
+            docs, tfs, [1] * len(docs), 1)
+        listas[t] = ListaBloques(datos, primeros, ultimos, offsets, len(docs), max_tfs, min_lens, max_pesos, 1)
+        total += len(datos) + len(primeros) * 16 + len(offsets) * 8 + len(max_pesos) * 8
+    return listas, total
+
+
+def recorrer(cursor):
+    n = 0
+    while cursor.doc is not None:
+        cursor.avanzar()
+        n += 1
+    return n
+
+
+def medir(nombre, funcion, cantidad, unidad='postings'):
+    inicio = time.perf_counter()
+    funcion()
+    segundos = time.perf_counter() - inicio
+    print(f"  {nombre:<34} {cantidad / segundos / 1e6:8.2f} M {unidad}/s")
+
+
+def main():
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    postings = generar_corpus(n_docs)
+    total = sum(len(docs) for docs, _ in postings.values())
+    print(f"{n_docs} documentos, {len(postings)} términos, {total} postings\n")
+
+    arrays = {t: (array('I', docs), array('I', tfs)) for t, (docs, tfs) in postings.items()}
+    listas, tam_bloques = codificar(postings)
+
+    print("Bytes por posting")
+    for nombre, tam in (('urls', tam_urls(postings)), ('dict', tam_dict(postings)),
+                        ('u32', tam_u32(postings)), ('bloques', tam_bloques)):
+        print(f"  {nombre:<10} {tam / total:8.2f}")
+
+    longitudes = array('I', [1]) * n_docs
+    print("\nRecorrido completo")
+    medir('u32 (CursorPostings)', lambda: sum(
+        recorrer(CursorPostings(d, f, 1, 1, longitudes, 0)) for d, f in arrays.values()), total)
+    medir('bloques (CursorBloques)', lambda: sum(
+        recorrer(CursorBloques(l, 1, 1, longitudes, 0)) for l in listas.values()), total)
+    medir('bloques (sólo decodificar)', lambda: [
+        l.decodificar(b) for l in listas.values() for b in range(len(l.primeros))], total)
+
+    # Saltos como los de WAND: objetivos crecientes sobre las listas más largas
+    largas = sorted(postings, key=lambda t: -len(postings[t][0]))[:50]
+    objetivos = sorted(random.sample(range(n_docs), 2000))
+
+    def saltar(crear):
+        for t in largas:
+            cursor = crear(t)
+            for objetivo in objetivos:
+                cursor.saltar_a(objetivo)
+
+    saltos = len(largas) * len(objetivos)
+    print(f"\nSaltos (50 listas más largas, {len(objetivos)} objetivos cada una)")
+    medir('u32 (CursorPostings)', lambda: saltar(
+        lambda t: CursorPostings(*arrays[t], 1, 1, longitudes, 0)), saltos, 'saltos')
+    medir('bloques (CursorBloques)', lambda: saltar(
+        lambda t: CursorBloques(listas[t], 1, 1, longitudes, 0)), saltos, 'saltos')
+
+
+if __name__ == '__main__':
+    main()
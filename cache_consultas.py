@@ -0,0 +1,87 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheResultados:
+    """Caché LRU + TTL de resultados de búsqueda, acotada en bytes.
+
+    Cada entrada recuerda la generación del índice con la que se calculó;
+    si el índice ha cambiado desde entonces la entrada se descarta al
+    leerla, así que invalidar toda la caché es sólo incrementar un contador.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, ttl=300):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entradas = OrderedDict()
+        self.bytes_usados = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidaciones = 0
+        self.expiraciones = 0
+
+    def obtener(self, clave, generacion):
+        """Devuelve el valor guardado o None si no existe, expiró o es de otra generación"""
+        with self.lock:
+            entrada = self.entradas.get(clave)
+            if entrada is None:
+                self.misses += 1
+                return None
+            valor, gen, creado, tam = entrada
+            if gen != generacion:
+                self.quitar(clave)
+                self.invalidaciones += 1
+                self.misses += 1
+                return None
+            if time.time() - creado > self.ttl:
+                self.quitar(clave)
+                self.expiraciones += 1
+                self.misses += 1
+                return None
+            self.entradas.move_to_end(clave)
+            self.hits += 1
+            return valor
+
+    def guardar(self, clave, valor, generacion):
+        tam = len(json.dumps(valor, ensure_ascii=False, default=str)) + len(repr(clave))
+        if tam > self.max_bytes:
+            return
+        with self.lock:
+            if clave in self.entradas:
+                self.quitar(clave)
+            self.entradas[clave] = (valor, generacion, time.time(), tam)
+            self.bytes_usados += tam
+            while self.bytes_usados > self.max_bytes:
+                viejo = next(iter(self.entradas))
+                self.quitar(viejo)
+                self.evictions += 1
+
+    def quitar(self, clave):
+        """Elimina una entrada (con el lock tomado)"""
+        entrada = self.entradas.pop(clave)
+        self.bytes_usados -= entrada[3]
+
+    def limpiar(self):
+        with self.lock:
+            self.entradas.clear()
+            self.bytes_usados = 0
+
+    def estadisticas(self):
+        with self.lock:
+            consultas = self.hits + self.misses
+            return {
+                'entradas': len(self.entradas),
+                'bytes': self.bytes_usados,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / consultas * 100, 2) if consultas else 0,
+                'evictions': self.evictions,
+                'invalidaciones': self.invalidaciones,
+                'expiraciones': self.expiraciones
+            }
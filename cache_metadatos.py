@@ -0,0 +1,196 @@
+"""Metadatos del caché de páginas en SQLite.
+
+Sustituye a cache_metadata.json, que se reescribía entero (y se recorría
+para sumar tamaños) tras cada página guardada o borrada. Cada operación
+es ahora una sentencia sobre una fila en modo WAL, y total_cached y
+total_size se mantienen con triggers en la tabla contadores, así que el
+coste por página no depende del tamaño del caché y no hace falta cargar
+nada en memoria al crear el WebCrawler.
+
+Un cache_metadata.json heredado se importa la primera vez y se renombra
+a cache_metadata.json.migrado.
+
+El HTML se guarda por contenido: la columna contenido es la clave del
+cuerpo en el almacén de páginas, así que varias URLs con la misma
+respuesta comparten un solo cuerpo. borrar() devuelve los cuerpos que
+se han quedado sin ninguna URL para que el crawler los borre.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+# PRAGMA user_version: 1 claves de URL canónica, 2 canónica con barra final
+VERSION_CLAVES = 2
+
+CAMPOS = ('url', 'cached_date', 'last_accessed', 'headers', 'size', 'etag', 'last_modified', 'contenido')
+
+ESQUEMA = '''
+    CREATE TABLE IF NOT EXISTS paginas (
+        clave TEXT PRIMARY KEY,
+        url TEXT NOT NULL,
+        cached_date TEXT NOT NULL,
+        last_accessed TEXT NOT NULL,
+        headers TEXT NOT NULL DEFAULT '{}',
+        size INTEGER NOT NULL DEFAULT 0,
+        etag TEXT NOT NULL DEFAULT '',
+        last_modified TEXT NOT NULL DEFAULT '',
+        contenido TEXT NOT NULL DEFAULT ''
+    );
+    CREATE INDEX IF NOT EXISTS paginas_fecha ON paginas (cached_date);
+    CREATE TABLE IF NOT EXISTS contadores (total_cached INTEGER NOT NULL, total_size INTEGER NOT NULL);
+    INSERT INTO contadores SELECT COUNT(*), COALESCE(SUM(size), 0) FROM paginas
+        WHERE NOT EXISTS (SELECT 1 FROM contadores);
+    CREATE TRIGGER IF NOT EXISTS paginas_alta AFTER INSERT ON paginas BEGIN
+        UPDATE contadores SET total_cached = total_cached + 1, total_size = total_size + NEW.size;
+    END;
+    CREATE TRIGGER IF NOT EXISTS paginas_baja AFTER DELETE ON paginas BEGIN
+        UPDATE contadores SET total_cached = total_cached - 1, total_size = total_size - OLD.size;
+    END;
+    CREATE TRIGGER IF NOT EXISTS paginas_tamano AFTER UPDATE OF size ON paginas BEGIN
+        UPDATE contadores SET total_size = total_size - OLD.size + NEW.size;
+    END;
+'''
+
+# INSERT OR REPLACE borraría la fila sin disparar paginas_baja; el upsert
+# dispara paginas_tamano y mantiene los contadores exactos
+UPSERT = (f'INSERT INTO paginas (clave, {", ".join(CAMPOS)}) VALUES (?, {", ".join("?" * len(CAMPOS))}) '
+          f'ON CONFLICT (clave) DO UPDATE SET {", ".join(f"{c} = excluded.{c}" for c in CAMPOS)}')
+
+
+class MetadatosCache:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.lock = threading.Lock()
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self.conexion.row_factory = sqlite3.Row
+        self.conexion.execute('PRAGMA journal_mode=WAL')
+        # Es un caché: perder las últimas filas en un corte de luz es aceptable
+        self.conexion.execute('PRAGMA synchronous=NORMAL')
+        self.conexion.executescript(ESQUEMA)
+        columnas = [fila[1] for fila in self.conexion.execute('PRAGMA table_info(paginas)')]
+        if 'contenido' not in columnas:
+            # Base de datos anterior a los cuerpos por contenido: el cuerpo sigue bajo la clave de la URL
+            with self.conexion:
+                self.conexion.execute("ALTER TABLE paginas ADD COLUMN contenido TEXT NOT NULL DEFAULT ''")
+                self.conexion.execute("UPDATE paginas SET contenido = clave")
+        self.conexion.execute('CREATE INDEX IF NOT EXISTS paginas_contenido ON paginas (contenido)')
+
+    def importar_json(self, ruta_json):
+        """Importa un cache_metadata.json heredado en una sola transacción"""
+        try:
+            with open(ruta_json, 'r', encoding='utf-8') as f:
+                urls = json.load(f).get('urls', {})
+        except (OSError, ValueError) as e:
+            print(f"⚠️ No se pudo leer {ruta_json}: {e}")
+            return 0
+        filas = []
+        for clave, metadata in urls.items():
+            fecha = metadata.get('cached_date') or datetime.now().isoformat()
+            filas.append((clave, metadata.get('url', ''), fecha, metadata.get('last_accessed') or fecha,
+                          json.dumps(metadata.get('headers') or {}), metadata.get('size', 0),
+                          metadata.get('etag') or '', metadata.get('last_modified') or '', clave))
+        with self.lock, self.conexion:
+            self.conexion.executemany(UPSERT, filas)
+        os.replace(ruta_json, ruta_json + '.migrado')
+        print(f"📦 {len(filas)} entradas de {ruta_json} migradas a {self.ruta}")
+        return len(filas)
+
+    def migrar_claves(self, generar_clave):
+        """Recalcula las claves con generar_clave(url) una vez por cada cambio
+        de VERSION_CLAVES; si dos URLs acaban con la misma clave se queda la
+        más reciente. Devuelve los cuerpos que se han quedado sin URL"""
+        with self.lock:
+            if self.conexion.execute('PRAGMA user_version').fetchone()[0] >= VERSION_CLAVES:
+                return []
+            cambios = [(clave, generar_clave(url), fecha) for clave, url, fecha in
+                       self.conexion.execute('SELECT clave, url, cached_date FROM paginas')]
+            cambios = [c for c in cambios if c[0] != c[1]]
+            # De la más antigua a la más reciente: la última en moverse gana
+            cambios.sort(key=lambda c: c[2])
+            sustituidos = set()
+            with self.conexion:
+                for vieja, nueva, _ in cambios:
+                    fila = self.conexion.execute('SELECT contenido FROM paginas WHERE clave = ?', (nueva,)).fetchone()
+                    if fila:
+                        sustituidos.add(fila[0])
+                        self.conexion.execute('DELETE FROM paginas WHERE clave = ?', (nueva,))
+                    self.conexion.execute('UPDATE paginas SET clave = ? WHERE clave = ?', (nueva, vieja))
+                self.conexion.execute(f'PRAGMA user_version = {VERSION_CLAVES}')
+            huerfanos = [cuerpo for cuerpo in sustituidos if self.conexion.execute(
+                'SELECT 1 FROM paginas WHERE contenido = ? LIMIT 1', (cuerpo,)).fetchone() is None]
+        if cambios:
+            print(f"🔑 {len(cambios)} entradas del caché pasadas a la clave de su URL canónica")
+        return huerfanos
+    
+    def referenciado(self, contenido):
+        """Si alguna URL usa el cuerpo"""
+        with self.lock:
+            return self.conexion.execute('SELECT 1 FROM paginas WHERE contenido = ? LIMIT 1',
+                                         (contenido,)).fetchone() is not None
+    
+    def __contains__(self, clave):
+        with self.lock:
+            return self.conexion.execute('SELECT 1 FROM paginas WHERE clave = ?', (clave,)).fetchone() is not None
+
+    def obtener(self, clave):
+        """Metadatos de la página como dict, o None"""
+        with self.lock:
+            fila = self.conexion.execute('SELECT * FROM paginas WHERE clave = ?', (clave,)).fetchone()
+        if fila is None:
+            return None
+        metadata = {campo: fila[campo] for campo in CAMPOS}
+        metadata['headers'] = json.loads(metadata['headers'])
+        return metadata
+
+    def guardar(self, clave, metadata):
+        fila = dict(metadata, headers=json.dumps(metadata.get('headers') or {}))
+        with self.lock, self.conexion:
+            self.conexion.execute(UPSERT, [clave] + [fila.get(campo, '') for campo in CAMPOS])
+
+    def actualizar(self, clave, **campos):
+        """Cambia algunos campos de una página existente"""
+        asignaciones = ', '.join(f'{campo} = ?' for campo in campos if campo in CAMPOS)
+        with self.lock, self.conexion:
+            self.conexion.execute(f'UPDATE paginas SET {asignaciones} WHERE clave = ?',
+                                  [valor for campo, valor in campos.items() if campo in CAMPOS] + [clave])
+
+    def borrar(self, claves):
+        """Borra las páginas; devuelve los cuerpos que ya no usa ninguna URL"""
+        with self.lock, self.conexion:
+            cuerpos = set()
+            for clave in claves:
+                fila = self.conexion.execute('SELECT contenido FROM paginas WHERE clave = ?', (clave,)).fetchone()
+                if fila:
+                    cuerpos.add(fila[0])
+            self.conexion.executemany('DELETE FROM paginas WHERE clave = ?', [(c,) for c in claves])
+            return [cuerpo for cuerpo in cuerpos if self.conexion.execute(
+                'SELECT 1 FROM paginas WHERE contenido = ? LIMIT 1', (cuerpo,)).fetchone() is None]
+
+    def claves(self):
+        with self.lock:
+            return [fila[0] for fila in self.conexion.execute('SELECT clave FROM paginas')]
+
+    def expiradas(self, max_days, dias_revalidable=None):
+        """Claves con más de max_days días; las que tienen ETag o Last-Modified
+        usan dias_revalidable si se indica"""
+        ahora = datetime.now()
+        limite = (ahora - timedelta(days=max_days + 1)).isoformat()
+        consulta = 'SELECT clave FROM paginas WHERE cached_date <= ?'
+        parametros = [limite]
+        if dias_revalidable is not None:
+            consulta += (" AND (etag = '' AND last_modified = '' OR cached_date <= ?)")
+            parametros.append((ahora - timedelta(days=dias_revalidable + 1)).isoformat())
+        with self.lock:
+            return [fila[0] for fila in self.conexion.execute(consulta, parametros)]
+
+    def totales(self):
+        """(páginas, bytes sin comprimir) desde los contadores incrementales"""
+        with self.lock:
+            return tuple(self.conexion.execute('SELECT total_cached, total_size FROM contadores').fetchone())
+
+    def cerrar(self):
+        with self.lock:
+            self.conexion.close()
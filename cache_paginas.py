@@ -0,0 +1,351 @@
+"""Almacén de páginas del caché en archivos pack comprimidos.
+
+Sustituye al archivo cache/<md5>.html por URL: cada página es un
+registro comprimido (zstd si está instalado zstandard, si no zlib) que
+se añade al final del pack activo. Cuando el pack llega a tam_pack se
+abre otro. Un índice en memoria clave -> (pack, offset, tamaño,
+secuencia, bytes originales) permite leer cualquier página de forma
+aleatoria a través de mmap.
+
+Registro: CABECERA (magia, códec, secuencia, clave md5, largo
+comprimido, largo original, crc32) seguido de los datos. Un borrado es
+un registro sin datos (códec BORRADO). Al abrir se recorren las
+cabeceras y gana, por clave, el registro de mayor secuencia; una cola
+cortada por un crash se trunca.
+
+Reescribir o borrar una página deja basura en su pack. Cuando un pack
+cerrado supera UMBRAL_BASURA, un hilo en segundo plano copia sus
+registros vivos (sin descomprimir) a un pack nuevo y borra el viejo.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIA = b'PAG1'
+# magia, códec, secuencia, clave (md5), largo comprimido, largo original, crc32
+CABECERA = struct.Struct('<4sBxxxQ16sIII')
+BORRADO, ZLIB, ZSTD = 0, 1, 2
+# Fracción de bytes muertos a partir de la cual se compacta un pack cerrado
+UMBRAL_BASURA = 0.5
+
+# Un almacén por directorio y proceso: varios WebCrawler comparten el caché
+_abiertos = {}
+_abiertos_lock = threading.Lock()
+
+
+def abrir_almacen(directorio, **opciones):
+    """Almacén compartido del directorio (lo crea la primera vez)"""
+    clave = os.path.abspath(directorio)
+    with _abiertos_lock:
+        almacen = _abiertos.get(clave)
+        if almacen is None:
+            almacen = _abiertos[clave] = AlmacenPaginas(directorio, **opciones)
+        return almacen
+
+
+class AlmacenPaginas:
+    def __init__(self, directorio, tam_pack=64 * 1024 * 1024, compresion=None):
+        self.directorio = directorio
+        self.tam_pack = tam_pack
+        if compresion is None:
+            compresion = 'zstd' if zstandard else 'zlib'
+        if compresion == 'zstd' and not zstandard:
+            print("⚠️ zstandard no está instalado, el caché usará zlib")
+            compresion = 'zlib'
+        self.codec = ZSTD if compresion == 'zstd' else ZLIB
+        self.lock = threading.RLock()
+        self.compactando = False
+        # clave (16 bytes) -> (pack, offset, tamaño del registro, secuencia, bytes originales)
+        self.indice = {}
+        # pack -> {'total': bytes, 'vivos': bytes}
+        self.packs = {}
+        # pack -> {clave: (offset, secuencia)} de sus registros de borrado
+        self.tumbas = {}
+        self.mapas = {}
+        # Totales de estadisticas(), al día en cada escritura, borrado y compactación
+        self.bytes_disco = 0
+        self.bytes_vivos = 0
+        self.bytes_originales = 0
+        self.secuencia = 0
+        self.activo = None
+        self.archivo = None
+        os.makedirs(directorio, exist_ok=True)
+        self.cargar()
+
+    def ruta(self, pack):
+        return os.path.join(self.directorio, f'pack_{pack:06d}.dat')
+
+    # ------------------------------------------------------------------
+    # Apertura
+    # ------------------------------------------------------------------
+    def cargar(self):
+        """Reconstruye el índice recorriendo las cabeceras de todos los packs"""
+        ids = sorted(int(nombre[5:11]) for nombre in os.listdir(self.directorio)
+                     if nombre.startswith('pack_') and nombre.endswith('.dat'))
+        borrados = {}
+        for pack in ids:
+            ruta = self.ruta(pack)
+            tam = os.path.getsize(ruta)
+            offset = 0
+            if tam:
+                with open(ruta, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    while offset + CABECERA.size <= tam:
+                        magia, codec, seq, clave, largo, original, crc = CABECERA.unpack_from(m, offset)
+                        fin = offset + CABECERA.size + largo
+                        if magia != MAGIA or fin > tam:
+                            break
+                        self.secuencia = max(self.secuencia, seq)
+                        if codec == BORRADO:
+                            self.tumbas.setdefault(pack, {})[clave] = (offset, seq)
+                            if seq > borrados.get(clave, 0):
+                                borrados[clave] = seq
+                        else:
+                            actual = self.indice.get(clave)
+                            if actual is None or seq > actual[3]:
+                                self.indice[clave] = (pack, offset, fin - offset, seq, original)
+                        offset = fin
+            if offset < tam:
+                # Registro cortado por un crash: se descarta la cola
+                print(f"⚠️ Pack {ruta} truncado en el byte {offset}")
+                with open(ruta, 'r+b') as f:
+                    f.truncate(offset)
+            self.packs[pack] = {'total': offset, 'vivos': 0}
+
+        for clave, seq in borrados.items():
+            entrada = self.indice.get(clave)
+            if entrada and entrada[3] < seq:
+                del self.indice[clave]
+        for pack, offset, tam, seq, original in self.indice.values():
+            self.packs[pack]['vivos'] += tam
+            self.bytes_originales += original
+        self.bytes_disco = sum(tam['total'] for tam in self.packs.values())
+        self.bytes_vivos = sum(tam['vivos'] for tam in self.packs.values())
+
+        self.activo = ids[-1] if ids else 1
+        self.packs.setdefault(self.activo, {'total': 0, 'vivos': 0})
+        self.archivo = open(self.ruta(self.activo), 'ab')
+
+    # ------------------------------------------------------------------
+    # Lectura y escritura
+    # ------------------------------------------------------------------
+    def __contains__(self, clave_hex):
+        return bytes.fromhex(clave_hex) in self.indice
+
+    def __len__(self):
+        return len(self.indice)
+
+    def mapa(self, pack, fin):
+        """mmap de un pack que cubra hasta el byte fin (con el lock)"""
+        m = self.mapas.get(pack)
+        if m is None or len(m) < fin:
+            if m is not None:
+                m.close()
+            with open(self.ruta(pack), 'rb') as f:
+                m = self.mapas[pack] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return m
+
+    def leer(self, clave_hex):
+        """Contenido de la página, o None si no está o el registro es ilegible"""
+        with self.lock:
+            entrada = self.indice.get(bytes.fromhex(clave_hex))
+            if entrada is None:
+                return None
+            pack, offset, tam = entrada[:3]
+            registro = self.mapa(pack, offset + tam)[offset:offset + tam]
+        _, codec, _, _, largo, _, crc = CABECERA.unpack_from(registro)
+        datos = registro[CABECERA.size:]
+        if zlib.crc32(datos) != crc:
+            print(f"⚠️ Registro corrupto en el pack {pack} (offset {offset})")
+            return None
+        if codec == ZSTD:
+            if not zstandard:
+                return None
+            datos = zstandard.ZstdDecompressor().decompress(datos)
+        else:
+            datos = zlib.decompress(datos)
+        return datos.decode('utf-8')
+
+    def comprimir(self, datos):
+        if self.codec == ZSTD:
+            return zstandard.ZstdCompressor(level=3).compress(datos)
+        return zlib.compress(datos, 6)
+
+    def escribir(self, codec, clave, datos, original):
+        """Añade un registro al pack activo; devuelve (pack, offset, tamaño, secuencia) (con el lock)"""
+        self.secuencia += 1
+        registro = CABECERA.pack(MAGIA, codec, self.secuencia, clave, len(datos), original,
+                                 zlib.crc32(datos)) + datos
+        offset = self.packs[self.activo]['total']
+        self.archivo.write(registro)
+        self.archivo.flush()
+        self.packs[self.activo]['total'] += len(registro)
+        self.bytes_disco += len(registro)
+        return self.activo, offset, len(registro), self.secuencia
+
+    def rotar(self):
+        """Cierra el pack activo si está lleno y abre otro (con el lock)"""
+        if self.packs[self.activo]['total'] < self.tam_pack:
+            return
+        self.archivo.close()
+        self.activo = max(self.packs) + 1
+        self.packs[self.activo] = {'total': 0, 'vivos': 0}
+        self.archivo = open(self.ruta(self.activo), 'ab')
+
+    def olvidar(self, clave):
+        """Quita la entrada del índice y cuenta su registro como basura (con el lock)"""
+        entrada = self.indice.pop(clave, None)
+        if entrada:
+            self.packs[entrada[0]]['vivos'] -= entrada[2]
+            self.bytes_vivos -= entrada[2]
+            self.bytes_originales -= entrada[4]
+        return entrada
+
+    def guardar(self, clave_hex, contenido):
+        """Guarda la página; devuelve (bytes originales, bytes en disco)"""
+        original = contenido.encode('utf-8')
+        datos = self.comprimir(original)
+        clave = bytes.fromhex(clave_hex)
+        with self.lock:
+            self.olvidar(clave)
+            pack, offset, tam, seq = self.escribir(self.codec, clave, datos, len(original))
+            self.indice[clave] = (pack, offset, tam, seq, len(original))
+            self.packs[pack]['vivos'] += tam
+            self.bytes_vivos += tam
+            self.bytes_originales += len(original)
+            self.rotar()
+            self.revisar_basura()
+        return len(original), tam
+
+    def borrar(self, clave_hex):
+        clave = bytes.fromhex(clave_hex)
+        with self.lock:
+            if self.olvidar(clave) is None:
+                return False
+            # La marca de borrado impide que una copia vieja reviva al reabrir
+            pack, offset, _, seq = self.escribir(BORRADO, clave, b'', 0)
+            self.tumbas.setdefault(pack, {})[clave] = (offset, seq)
+            self.rotar()
+            self.revisar_basura()
+        return True
+
+    # ------------------------------------------------------------------
+    # Compactación
+    # ------------------------------------------------------------------
+    def pack_con_basura(self):
+        """Pack cerrado con más de UMBRAL_BASURA de bytes muertos (con el lock)"""
+        for pack, tam in self.packs.items():
+            if pack != self.activo and tam['total'] and \
+                    tam['total'] - tam['vivos'] > tam['total'] * UMBRAL_BASURA:
+                return pack
+        return None
+
+    def revisar_basura(self):
+        if not self.compactando and self.pack_con_basura() is not None:
+            self.compactando = True
+            thread = threading.Thread(target=self.compactar)
+            thread.daemon = True
+            thread.start()
+
+    def compactar(self):
+        """Copia los registros vivos de los packs con basura a packs nuevos.
+
+        Los packs cerrados no cambian, así que la copia se hace sin el
+        lock; después sólo se redirigen las entradas que siguen apuntando
+        al pack viejo (las reescritas mientras tanto ya viven en otro).
+        Si la copia falla, el pack nuevo a medias se descarta.
+        """
+        destino = None
+        try:
+            while True:
+                with self.lock:
+                    pack = self.pack_con_basura()
+                    if pack is None:
+                        return
+                    vivos = [(clave, e) for clave, e in self.indice.items() if e[0] == pack]
+                    # Las marcas de borrado siguen haciendo falta mientras la clave esté borrada
+                    tumbas = [(clave, t) for clave, t in self.tumbas.get(pack, {}).items()
+                              if clave not in self.indice]
+                    origen = self.mapa(pack, self.packs[pack]['total'])
+                    destino = max(self.packs) + 1
+                    self.packs[destino] = {'total': 0, 'vivos': 0}
+
+                nuevos = {}
+                tumbas_nuevas = {}
+                offset = 0
+                with open(self.ruta(destino), 'wb') as f:
+                    for clave, (_, inicio, tam, seq, _) in vivos:
+                        f.write(origen[inicio:inicio + tam])
+                        nuevos[clave] = offset
+                        offset += tam
+                    for clave, (inicio, seq) in tumbas:
+                        f.write(origen[inicio:inicio + CABECERA.size])
+                        tumbas_nuevas[clave] = (offset, seq)
+                        offset += CABECERA.size
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                with self.lock:
+                    self.packs[destino]['total'] = offset
+                    for clave, entrada in vivos:
+                        if self.indice.get(clave) is entrada:
+                            self.indice[clave] = (destino, nuevos[clave]) + entrada[2:]
+                            self.packs[destino]['vivos'] += entrada[2]
+                    if tumbas_nuevas:
+                        self.tumbas[destino] = tumbas_nuevas
+                    viejo = self.packs.pop(pack)
+                    self.bytes_disco += offset - viejo['total']
+                    self.bytes_vivos += self.packs[destino]['vivos'] - viejo['vivos']
+                    compactado, destino = destino, None
+                    self.tumbas.pop(pack, None)
+                    m = self.mapas.pop(pack, None)
+                    if m is not None:
+                        m.close()
+                    os.remove(self.ruta(pack))
+                print(f"🗜️ Pack {pack} compactado: {self.packs[compactado]['total'] // 1024} KB vivos")
+        except Exception as e:
+            print(f"Error compactando el caché: {e}")
+            if destino is not None:
+                # Copia a medias: nada apunta aún al pack nuevo
+                with self.lock:
+                    self.packs.pop(destino, None)
+                try:
+                    os.remove(self.ruta(destino))
+                except OSError:
+                    pass
+        finally:
+            self.compactando = False
+
+    # ------------------------------------------------------------------
+    # Estadísticas y cierre
+    # ------------------------------------------------------------------
+    def estadisticas(self):
+        with self.lock:
+            en_disco = self.bytes_disco
+            vivos = self.bytes_vivos
+            originales = self.bytes_originales
+            return {
+                'paginas': len(self.indice),
+                'packs': len(self.packs),
+                'bytes_disco': en_disco,
+                'bytes_basura': en_disco - vivos,
+                'bytes_originales': originales,
+                'ratio_compresion': round(originales / vivos, 2) if vivos else 0,
+                'compresion': 'zstd' if self.codec == ZSTD else 'zlib'
+            }
+
+    def cerrar(self):
+        with self.lock:
+            for m in self.mapas.values():
+                m.close()
+            self.mapas.clear()
+            if self.archivo:
+                self.archivo.close()
+                self.archivo = None
@@ -0,0 +1,284 @@
+"""Capa HTTP saliente compartida por el crawler y app.py.
+
+WebCrawler.session usaba los tamaños de pool por defecto de HTTPAdapter y
+los manejadores de app.py (/proxy, /proxy_recurso, /abrir_url,
+/buscar_en_internet) llamaban a requests.get / requests.head sueltos: sin
+pool, cada petición pagaba conexión TCP, TLS y resolución DNS. Además
+cada WebCrawler temporal de app.py abría sus propias conexiones.
+
+ClienteHTTP tiene un único HTTPAdapter (y con él los pools de urllib3)
+para todo el proceso:
+
+    - pool_hosts pools de host guardados y hasta pool_por_host conexiones
+      keep-alive por host (con SO_KEEPALIVE en el socket);
+    - sesion(cabeceras) da una requests.Session propia (cabeceras,
+      cookies) montada sobre el adaptador común, así que todas las
+      sesiones reutilizan las mismas conexiones;
+    - las conexiones nuevas resuelven el host con el CacheDNS del cliente,
+      que guarda las respuestas de getaddrinfo ttl_dns segundos (y las
+      olvida si no se puede conectar a ninguna dirección);
+    - estadisticas() cuenta peticiones, conexiones abiertas y
+      reutilizadas, por host, y aciertos del caché DNS.
+
+compartido() devuelve el cliente del proceso; get() y head() sustituyen a
+requests.get / requests.head en app.py con una única sesión que no guarda
+cookies. El modo async usa aiohttp,
+que tiene sus propios pools; toma de aquí el TTL del DNS.
+"""
+
+import socket
+import threading
+import time
+from collections import Counter
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+# Hosts con pool guardado y conexiones keep-alive por host
+POOL_HOSTS = 100
+POOL_POR_HOST = 16
+# Segundos que vale una resolución DNS, y un host que no existe
+TTL_DNS = 300
+TTL_DNS_FALLIDO = 30
+
+
+class CacheDNS:
+    """getaddrinfo con caché por (host, puerto) durante ttl segundos; los
+    errores de resolución se recuerdan TTL_DNS_FALLIDO segundos"""
+
+    def __init__(self, ttl=TTL_DNS):
+        self.ttl = ttl
+        self.entradas = {}
+        self.aciertos = 0
+        self.fallos = 0
+        self.lock = threading.Lock()
+
+    def resolver(self, host, puerto):
+        clave = (host, puerto)
+        ahora = time.monotonic()
+        with self.lock:
+            entrada = self.entradas.get(clave)
+            if entrada and entrada[0] > ahora:
+                self.aciertos += 1
+                if isinstance(entrada[1], socket.gaierror):
+                    raise entrada[1]
+                return entrada[1]
+            self.fallos += 1
+        try:
+            direcciones = socket.getaddrinfo(host, puerto, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            with self.lock:
+                self.entradas[clave] = (ahora + min(TTL_DNS_FALLIDO, self.ttl), e)
+            raise
+        with self.lock:
+            self.entradas[clave] = (ahora + self.ttl, direcciones)
+        return direcciones
+
+    def olvidar(self, host, puerto):
+        with self.lock:
+            self.entradas.pop((host, puerto), None)
+
+    def estadisticas(self):
+        consultas = self.aciertos + self.fallos
+        return {
+            'entries': len(self.entradas),
+            'hits': self.aciertos,
+            'misses': self.fallos,
+            'hit_ratio': round(self.aciertos / consultas * 100, 2) if consultas else 0,
+            'ttl_s': self.ttl
+        }
+
+
+class ContadorConexiones:
+    """Conexiones TCP abiertas por host de un cliente (las peticiones las cuenta el adaptador)"""
+
+    def __init__(self):
+        self.por_host = Counter()
+        self.lock = threading.Lock()
+
+    def anotar(self, host):
+        with self.lock:
+            self.por_host[host] += 1
+
+    def copia(self):
+        with self.lock:
+            return Counter(self.por_host)
+
+
+def conectar(dns, host, puerto, timeout, source_address, socket_options):
+    """urllib3.util.connection.create_connection con las direcciones del CacheDNS dns"""
+    error = None
+    for familia, tipo, protocolo, _, direccion in dns.resolver(host, puerto):
+        sock = None
+        try:
+            sock = socket.socket(familia, tipo, protocolo)
+            for opcion in socket_options or ():
+                sock.setsockopt(*opcion)
+            if isinstance(timeout, (int, float)):
+                sock.settimeout(timeout)
+            if source_address:
+                sock.bind(source_address)
+            sock.connect(direccion)
+            return sock
+        except OSError as e:
+            error = e
+            if sock is not None:
+                sock.close()
+    # Ninguna dirección responde: la próxima conexión vuelve a resolver
+    dns.olvidar(host, puerto)
+    raise error or OSError(f'getaddrinfo no devolvió direcciones para {host}')
+
+
+class ConexionDNS:
+    """_new_conn de urllib3 resolviendo con el CacheDNS dns y contando la conexión en conexiones"""
+
+    dns = None
+    conexiones = None
+
+    def _new_conn(self):
+        host = self._dns_host.strip('[]')
+        try:
+            sock = conectar(self.dns, host, self.port, self.timeout, self.source_address, self.socket_options)
+        except socket.timeout as e:
+            raise ConnectTimeoutError(
+                self, f'Connection to {self.host} timed out. (connect timeout={self.timeout})') from e
+        except OSError as e:
+            raise NewConnectionError(self, f'Failed to establish a new connection: {e}') from e
+        self.conexiones.anotar(self.host)
+        return sock
+
+
+class ConexionHTTP(ConexionDNS, HTTPConnection):
+    pass
+
+
+class ConexionHTTPS(ConexionDNS, HTTPSConnection):
+    pass
+
+
+class PoolHTTP(HTTPConnectionPool):
+    ConnectionCls = ConexionHTTP
+
+
+class PoolHTTPS(HTTPSConnectionPool):
+    ConnectionCls = ConexionHTTPS
+
+
+def clases_pool(dns, conexiones):
+    """PoolHTTP y PoolHTTPS cuyas conexiones resuelven con el CacheDNS dns y
+    se cuentan en el ContadorConexiones conexiones"""
+    atributos = {'dns': dns, 'conexiones': conexiones}
+    return {
+        'http': type('PoolHTTP', (PoolHTTP,), {
+            'ConnectionCls': type('ConexionHTTP', (ConexionHTTP,), atributos)}),
+        'https': type('PoolHTTPS', (PoolHTTPS,), {
+            'ConnectionCls': type('ConexionHTTPS', (ConexionHTTPS,), atributos)})
+    }
+
+
+class AdaptadorHTTP(HTTPAdapter):
+    """HTTPAdapter con los pools de PoolHTTP/PoolHTTPS que cuenta las peticiones por host"""
+
+    def __init__(self, *args, dns, conexiones, **kwargs):
+        self.dns = dns
+        self.conexiones = conexiones
+        self.peticiones = Counter()
+        self.lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = clases_pool(self.dns, self.conexiones)
+
+    def send(self, request, **kwargs):
+        host = urlsplit(request.url).hostname or ''
+        with self.lock:
+            self.peticiones[host] += 1
+        return super().send(request, **kwargs)
+
+
+class SinCookies(DefaultCookiePolicy):
+    """Política que no guarda cookies de las respuestas en la sesión"""
+
+    def set_ok(self, cookie, request):
+        return False
+
+
+class ClienteHTTP:
+    def __init__(self, pool_hosts=POOL_HOSTS, pool_por_host=POOL_POR_HOST, ttl_dns=TTL_DNS):
+        # Caché DNS propia: el TTL de un cliente no cambia el de los demás
+        self.dns = CacheDNS(ttl_dns)
+        # Y contador propio: las reutilizadas se calculan con las peticiones de este cliente
+        self.conexiones = ContadorConexiones()
+        self.pool_hosts = pool_hosts
+        self.pool_por_host = pool_por_host
+        # pool_block=False: por encima de pool_por_host se abre una conexión
+        # más y se cierra al devolverla, en vez de esperar
+        self.adaptador = AdaptadorHTTP(pool_connections=pool_hosts, pool_maxsize=pool_por_host,
+                                       dns=self.dns, conexiones=self.conexiones)
+        # Sesión de get() y head(): se crea una vez y, como no guarda
+        # cookies, cada llamada se comporta como un requests.get suelto
+        self.sesion_suelta = self.sesion()
+        self.sesion_suelta.cookies.set_policy(SinCookies())
+
+    def sesion(self, cabeceras=None):
+        """requests.Session con cabeceras y cookies propias sobre los pools comunes.
+
+        No hay que cerrarla: close() cerraría el adaptador de todas.
+        """
+        sesion = requests.Session()
+        sesion.mount('http://', self.adaptador)
+        sesion.mount('https://', self.adaptador)
+        if cabeceras:
+            sesion.headers.update(cabeceras)
+        return sesion
+
+    # Como requests.get/head (sin cookies de otras peticiones) pero con las
+    # conexiones del pool
+
+    def get(self, url, **kwargs):
+        return self.sesion_suelta.get(url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.sesion_suelta.head(url, **kwargs)
+
+    def estadisticas(self):
+        with self.adaptador.lock:
+            peticiones = Counter(self.adaptador.peticiones)
+        conexiones = self.conexiones.copia()
+        total_peticiones = sum(peticiones.values())
+        total_conexiones = sum(conexiones.values())
+        reutilizadas = max(total_peticiones - total_conexiones, 0)
+        return {
+            'pool_hosts': self.pool_hosts,
+            'pool_per_host': self.pool_por_host,
+            'requests': total_peticiones,
+            'connections_opened': total_conexiones,
+            'connections_reused': reutilizadas,
+            'reuse_ratio': round(reutilizadas / total_peticiones * 100, 2) if total_peticiones else 0,
+            'pools': len(self.adaptador.poolmanager.pools),
+            'top_hosts': [{'host': host, 'requests': n, 'connections': conexiones[host]}
+                          for host, n in peticiones.most_common(10)],
+            'dns': self.dns.estadisticas()
+        }
+
+
+_compartido = None
+_lock_compartido = threading.Lock()
+
+
+def compartido():
+    """El ClienteHTTP del proceso (se crea la primera vez)"""
+    global _compartido
+    with _lock_compartido:
+        if _compartido is None:
+            _compartido = ClienteHTTP()
+        return _compartido
@@ -1,19 +1,147 @@
-import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
-from collections import deque
+from collections import Counter, deque
+from bisect import bisect_left
 import time
-import random
-import re
 import threading
-from queue import Queue
 from datetime import datetime
 import hashlib
 import os
-import json
+from cache_metadatos import MetadatosCache
+from cache_paginas import abrir_almacen
+import cliente_http
+import descarga
+from descarga import cabecera
+import extraccion
+from duplicados import IndiceSimhash, simhash
+from filtro_urls import FiltroURLs
+from frontera import Frontera
+from recrawl import PlanificadorRecrawl
+from recuperacion import tokenizar
+from url_canonica import canonicalizar, clave as clave_url
+from visitados import crear_visitados, guardar as guardar_visitados, estadisticas as estadisticas_visitados
+
+# Días que una página del caché se usa sin preguntar al servidor si el
+# planificador de revisitas aún no la conoce
+DIAS_CACHE = 30
+# Días que se conserva una página caducada con ETag/Last-Modified para revalidarla
+DIAS_REVALIDABLE = 180
+# Segundos entre consultas al planificador de revisitas durante el rastreo
+PERIODO_REVISITAS = 30
+# Ajuste de prioridad en la frontera de las revisitas (por delante de las semillas)
+AJUSTE_REVISITA = -2.0
+# Las visitadas se guardan cada tantas páginas o segundos, lo que llegue antes
+CHECKPOINT_PAGINAS = 1000
+CHECKPOINT_SEGUNDOS = 300
+
+
+# Extracción de una página sin estado del crawler: el modo pipeline la
+# ejecuta en otros procesos (crawler_pipeline.py)
+
+def analizar_html(url, html, motor_html='lxml', datos=None):
+    """(page_info, hrefs) de un HTML; (None, None) si no se puede extraer
+    
+    Usa un único análisis con lxml (extraccion.py) y, si lxml no está o no
+    puede con el documento, el camino con BeautifulSoup. Los dos dan el
+    mismo page_info y los mismos href. datos es el resultado de
+    extraccion.analizar si ya se analizó mientras se descargaba.
+    """
+    if datos is None and motor_html == 'lxml':
+        datos = extraccion.analizar(html)
+    if datos is None:
+        soup = BeautifulSoup(html, 'html.parser')
+        page_info = extraer_info(url, soup)
+        if not page_info:
+            return None, None
+        # Después de extraer_info: los enlaces de nav, footer... ya no están
+        return page_info, [link['href'] for link in soup.find_all('a', href=True)]
+    
+    # Mismos casos que hacen fallar a extraer_info: <title> sin cadena
+    # única o meta encontrado sin atributo content
+    if datos['sin_cadena']:
+        return None, None
+    metas = datos['metas']
+    description = ""
+    for clave in ('description', 'og_description', 'twitter_description'):
+        if clave in metas:
+            description = metas[clave]
+            break
+    meta_keywords = metas.get('keywords', "")
+    if description is None or meta_keywords is None:
+        return None, None
+    
+    page_info = construir_page_info(url, datos['title'] or "Sin título", description,
+                                    meta_keywords, ' '.join(datos['textos']))
+    if not page_info:
+        return None, None
+    return page_info, datos['hrefs']
+
+
+def extraer_info(url, soup):
+    """Extrae información relevante de la página"""
+    try:
+        title = soup.title.string if soup.title else "Sin título"
+        
+        meta_desc = (soup.find('meta', attrs={'name': 'description'}) or 
+                    soup.find('meta', attrs={'property': 'og:description'}) or
+                    soup.find('meta', attrs={'name': 'twitter:description'}))
+        description = meta_desc['content'] if meta_desc else ""
+        
+        meta_keywords = soup.find('meta', attrs={'name': 'keywords'})
+        meta_keywords = meta_keywords['content'] if meta_keywords else ""
+        
+        for script in soup(["script", "style", "nav", "footer", "header", "aside", "form"]):
+            script.decompose()
+        
+        text = soup.get_text(separator=' ', strip=True)
+        return construir_page_info(url, title, description, meta_keywords, text)
+    except Exception as e:
+        return None
+
+
+def construir_page_info(url, title, description, meta_keywords, text):
+    """page_info a partir del título, las metas y el texto visible de la página"""
+    try:
+        title = ' '.join(title.split())[:150]
+        description = description[:300]
+        text = ' '.join(text.split())[:2000]
+        
+        words = tokenizar(title + " " + description + " " + meta_keywords + " " + text[:1000])
+        stop_words = {'el','la','los','las','un','una','unos','unas','y','e','o','u',
+                     'de','del','a','en','con','por','para','que','es','son','fue',
+                     'era','como','mas','pero','si','no','the','a','an','and','or',
+                     'of','to','in','on','at','this','that','with','from','by','for'}
+        
+        word_freq = {}
+        for word in words[:500]:
+            if len(word) > 3 and word not in stop_words:
+                word_freq[word] = word_freq.get(word, 0) + 1
+        
+        keywords = [k[0] for k in sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:20]]
+        # Huella del texto visible para detectar casi duplicados (duplicados.py)
+        huella = simhash(text)
+        
+        return {
+            'title': title,
+            'url': url,
+            'domain': urlparse(url).netloc,
+            'description': description,
+            'keywords': keywords,
+            'text_snippet': text[:500] + '...' if len(text) > 500 else text,
+            'crawled_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'from_cache': False,
+            'simhash': None if huella is None else f'{huella:016x}'
+        }
+    except Exception as e:
+        return None
+
 
 class WebCrawler:
-    def __init__(self, max_pages=500, timeout=10, user_agent_key='chrome', cache_dir='cache'):
+    def __init__(self, max_pages=500, timeout=10, user_agent_key='chrome', cache_dir='cache',
+                 retraso_host=1.0, concurrencia_host=2, frontera_disco=None,
+                 visitados='exacto', tasa_fp_visitados=0.001, ruta_visitados=None,
+                 reglas_urls=None, duplicados=True, presupuesto_recrawl=1000,
+                 streaming=True, max_bytes_pagina=descarga.MAX_BYTES, cliente=None):
         self.user_agent_key = user_agent_key
         self.user_agents = {
             'chrome': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -25,31 +153,76 @@ class WebCrawler:
             'bot': 'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)'
         }
         
-        self.url_queue = Queue()
-        self.visited = set()
+        # Frontera con subcolas por host: retraso_host segundos entre descargas
+        # y como mucho concurrencia_host descargas simultáneas por host. Con
+        # frontera_disco (ruta SQLite) sólo una ventana de URLs queda en memoria
+        self.url_queue = Frontera(retraso=retraso_host, concurrencia_host=concurrencia_host,
+                                  ruta_disco=frontera_disco)
+        # URLs visitadas: 'exacto' (set), 'bloom' o 'cuckoo' (huellas de 64 bits
+        # con tasa_fp_visitados de falsos positivos); ruta_visitados las conserva
+        self.visited = crear_visitados(visitados, tasa_fp_visitados, ruta=ruta_visitados)
+        self.ruta_visitados = ruta_visitados
+        # Los hilos de rastreo son daemon: sin checkpoints periódicos una
+        # salida brusca perdería todas las visitadas desde el arranque
+        self.lock_visitados = threading.Lock()
+        self.lock_guardado = threading.Lock()
+        self.paginas_checkpoint = 0
+        self.ultimo_checkpoint = time.time()
         self.index = {}
-        self.new_domains = set()
         
         self.timeout = timeout
         self.max_retries = 3
+        # Descarga por trozos (descarga.py): corta lo que no es HTML y las
+        # páginas de más de max_bytes_pagina bytes (None = sin límite)
+        self.streaming = streaming
+        self.max_bytes_pagina = max_bytes_pagina
+        self.descargas_abortadas = Counter()
+        self.descargas_truncadas = 0
+        self.bytes_evitados = 0
         self.crawling_active = False
         self.pages_crawled = 0
         self.domains_crawled = set()
+        self.start_time = None
+        # Instantes de las páginas del último minuto (páginas/minuto en get_status)
+        self.marcas_paginas = deque()
+        
+        # Modo de rastreo: 'secuencial' (una URL cada vez) o 'async' (MotorAsync)
+        self.modo = 'secuencial'
+        self.motor = None
+        
+        # Análisis HTML: 'lxml' (un solo recorrido, extraccion.py) o 'bs4' (html.parser)
+        self.motor_html = 'lxml' if extraccion.disponible() else 'bs4'
         
         # CONFIGURACIÓN DE CACHÉ
         self.cache_dir = cache_dir
         self.cache_metadata_file = os.path.join(cache_dir, 'cache_metadata.json')
-        self.cache_metadata = self.cargar_metadata_cache()
         self.cache_hits = 0
         self.cache_misses = 0
+        # Peticiones condicionales: enviadas, 304 (sin cambios) y bytes que no se descargaron
+        self.revalidaciones = 0
+        self.revalidaciones_304 = 0
+        self.bytes_revalidados = 0
+        # Enlaces reescritos a su forma canónica, descargas que eso evitó y
+        # bytes que no se guardaron por tener ya el mismo cuerpo
+        self.urls_canonicalizadas = 0
+        self.descargas_evitadas = 0
+        self.bytes_deduplicados = 0
         
         # Crear directorio de caché si no existe
         if not os.path.exists(cache_dir):
             os.makedirs(cache_dir)
+        self.cache_metadata = self.cargar_metadata_cache()
+        # El HTML va comprimido en archivos pack (cache/packs), compartidos por
+        # todos los crawlers del proceso que usen el mismo directorio
+        self.paginas = abrir_almacen(os.path.join(cache_dir, 'packs'))
+        for cuerpo in self.cache_metadata.migrar_claves(self.generar_cache_key):
+            self.paginas.borrar(cuerpo)
+        self.migrar_html_sueltos()
         
-        # Session con user agent seleccionado
-        self.session = requests.Session()
-        self.session.headers.update({
+        # Session con user agent seleccionado sobre los pools y el caché DNS
+        # compartidos del proceso (cliente_http.py)
+        self.cliente = cliente or cliente_http.compartido()
+        self.session = self.cliente.sesion({
             'User-Agent': self.user_agents.get(user_agent_key, self.user_agents['chrome']),
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
@@ -91,101 +264,87 @@ class WebCrawler:
             'https://www.nih.gov'
         ]
         
-        # Dominios bloqueados
-        self.blocked_domains = [
-            'youtube.com', 'youtu.be', 'facebook.com', 'instagram.com', 
-            'tiktok.com', 'twitch.tv', 'pinterest.com', 'flickr.com', 
-            'imgur.com', 'amazon.com', 'ebay.com', 'aliexpress.com',
-            'walmart.com', 'netflix.com', 'spotify.com', 'deviantart.com',
-            'vimeo.com', 'dailymotion.com', 'tumblr.com', 'snapchat.com',
-            'whatsapp.com', 'telegram.org', 'discord.com'
-        ]
+        # Dominios, extensiones y patrones bloqueados, compilados en FiltroURLs.
+        # reglas_urls es un JSON con las listas que sustituyen a las de filtro_urls.py
+        self.filtro_urls = FiltroURLs(ruta=reglas_urls)
         
-        # Extensiones de archivo a ignorar
-        self.blocked_extensions = [
-            '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.svg', '.webp',
-            '.mp3', '.mp4', '.avi', '.mov', '.wmv', '.flv', '.mkv',
-            '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx',
-            '.zip', '.rar', '.7z', '.tar', '.gz', '.bz2',
-            '.exe', '.msi', '.bin', '.dmg', '.iso', '.img'
-        ]
+        # Páginas casi duplicadas (SimHash): no se indexan ni se siguen sus enlaces
+        self.duplicados = IndiceSimhash() if duplicados else None
         
-        # Patrones de URL a ignorar
-        self.blocked_patterns = [
-            r'login', r'signup', r'register', r'password', r'auth',
-            r'cart', r'checkout', r'payment', r'order', r'invoice',
-            r'logout', r'session', r'forgot', r'recover',
-            r'captcha', r'bot', r'spider', r'crawler',
-            r'\.git', r'\.svn', r'\.hg', r'\.bzr',
-            r'wp-admin', r'wp-login', r'administrator',
-            r'phpmyadmin', r'mysql', r'phpPgAdmin',
-            r'calendar', r'events', r'print', r'pdf',
-            r'#', r'mailto:', r'tel:', r'javascript:'
-        ]
+        # Revisitas según la frecuencia de cambio observada (recrawl.py):
+        # presupuesto_recrawl revisitas al día; None vuelve al caducado fijo
+        self.recrawl = None
+        if presupuesto_recrawl:
+            self.recrawl = PlanificadorRecrawl(os.path.join(cache_dir, 'recrawl.db'), presupuesto_recrawl)
+        # URLs devueltas a la frontera por el planificador: pasan aunque estén en visited
+        self.revisitas = set()
+        self.ultimas_revisitas = 0.0
     
     def cargar_metadata_cache(self):
-        """Carga los metadatos del caché desde el archivo JSON"""
+        """Abre los metadatos del caché (SQLite); importa el JSON heredado si existe"""
+        metadatos = MetadatosCache(os.path.join(self.cache_dir, 'cache_metadata.db'))
         if os.path.exists(self.cache_metadata_file):
-            try:
-                with open(self.cache_metadata_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return {'urls': {}, 'stats': {'total_cached': 0, 'total_size': 0}}
-        return {'urls': {}, 'stats': {'total_cached': 0, 'total_size': 0}}
-    
-    def guardar_metadata_cache(self):
-        """Guarda los metadatos del caché en el archivo JSON"""
-        try:
-            # Calcular tamaño total del caché
-            total_size = 0
-            for url_data in self.cache_metadata['urls'].values():
-                total_size += url_data.get('size', 0)
-            
-            self.cache_metadata['stats'] = {
-                'total_cached': len(self.cache_metadata['urls']),
-                'total_size': total_size,
-                'cache_hits': getattr(self, 'cache_hits', 0),
-                'cache_misses': getattr(self, 'cache_misses', 0)
-            }
-            
-            with open(self.cache_metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(self.cache_metadata, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Error guardando metadatos de caché: {e}")
+            metadatos.importar_json(self.cache_metadata_file)
+        return metadatos
     
     def generar_cache_key(self, url):
-        """Genera una clave única para la URL (hash)"""
-        return hashlib.md5(url.encode()).hexdigest()
+        """Clave de la URL en el caché: hash de su forma canónica sin esquema"""
+        return hashlib.md5(clave_url(url).encode()).hexdigest()
+    
+    def clave_contenido(self, content):
+        """Clave del cuerpo en el almacén de páginas: hash del HTML"""
+        return hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+    
+    def migrar_html_sueltos(self):
+        """Mueve a los packs las páginas que aún están como cache/<md5>.html"""
+        migradas = 0
+        sueltos = [e.name for e in os.scandir(self.cache_dir) if e.name.endswith('.html')]
+        for nombre in sueltos:
+            cache_key = nombre[:-len('.html')]
+            cache_file = os.path.join(self.cache_dir, nombre)
+            try:
+                # Los .html sueltos son anteriores a los cuerpos por contenido:
+                # su nombre es la clave antigua de la URL, que migrar_claves
+                # dejó como clave del cuerpo
+                if not self.cache_metadata.referenciado(cache_key):
+                    continue
+                if cache_key not in self.paginas:
+                    with open(cache_file, 'r', encoding='utf-8') as f:
+                        self.paginas.guardar(cache_key, f.read())
+                os.remove(cache_file)
+                migradas += 1
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"Error migrando {cache_file}: {e}")
+        if migradas:
+            print(f"📦 {migradas} páginas del caché migradas a archivos pack")
     
     def obtener_del_cache(self, url):
         """Obtiene una página del caché si existe y no ha expirado"""
         cache_key = self.generar_cache_key(url)
         
-        if cache_key in self.cache_metadata['urls']:
-            metadata = self.cache_metadata['urls'][cache_key]
-            cache_file = os.path.join(self.cache_dir, f"{cache_key}.html")
-            
-            if os.path.exists(cache_file):
-                # Verificar si el caché ha expirado (30 días por defecto)
+        metadata = self.cache_metadata.obtener(cache_key)
+        if metadata:
+            if metadata['contenido'] in self.paginas:
+                # Verificar si el caché ha expirado: hasta la revisita que
+                # planifica self.recrawl o, si no la conoce, DIAS_CACHE días
                 cached_time = datetime.fromisoformat(metadata['cached_date'])
                 now = datetime.now()
                 days_diff = (now - cached_time).days
+                siguiente = self.recrawl.siguiente(cache_key) if self.recrawl else None
+                vigente = days_diff < DIAS_CACHE if siguiente is None else time.time() < siguiente
                 
-                # Si tiene menos de 30 días, usar caché
-                if days_diff < 30:
-                    try:
-                        with open(cache_file, 'r', encoding='utf-8') as f:
-                            content = f.read()
+                if vigente:
+                    content = self.paginas.leer(metadata['contenido'])
+                    if content is not None:
                         self.cache_hits += 1
                         return {
                             'content': content,
                             'metadata': metadata,
                             'from_cache': True
                         }
-                    except:
-                        pass
-                else:
-                    # Caché expirado, eliminar
+                elif days_diff >= DIAS_CACHE and not (metadata.get('etag') or metadata.get('last_modified')):
+                    # Caché expirado y sin validadores, eliminar; con ellos se
+                    # conserva para pedir la página de forma condicional
                     self.eliminar_del_cache(url)
         
         self.cache_misses += 1
@@ -194,28 +353,32 @@ class WebCrawler:
     def guardar_en_cache(self, url, content, headers=None):
         """Guarda una página en el caché"""
         cache_key = self.generar_cache_key(url)
-        cache_file = os.path.join(self.cache_dir, f"{cache_key}.html")
         
         try:
-            # Guardar contenido HTML
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            # Calcular tamaño
-            size = os.path.getsize(cache_file)
+            # El HTML comprimido se guarda una sola vez por contenido; size son
+            # los bytes sin comprimir
+            cuerpo = self.clave_contenido(content)
+            if cuerpo in self.paginas:
+                size = len(content.encode('utf-8', 'surrogatepass'))
+                self.bytes_deduplicados += size
+            else:
+                size, _ = self.paginas.guardar(cuerpo, content)
+            anterior = self.cache_metadata.obtener(cache_key)
             
             # Guardar metadatos
-            self.cache_metadata['urls'][cache_key] = {
+            self.cache_metadata.guardar(cache_key, {
                 'url': url,
                 'cached_date': datetime.now().isoformat(),
                 'last_accessed': datetime.now().isoformat(),
                 'headers': headers if headers else {},
                 'size': size,
-                'etag': headers.get('etag', '') if headers else '',
-                'last_modified': headers.get('last-modified', '') if headers else ''
-            }
-            
-            self.guardar_metadata_cache()
+                'etag': cabecera(headers, 'etag'),
+                'last_modified': cabecera(headers, 'last-modified'),
+                'contenido': cuerpo
+            })
+            if anterior and anterior['contenido'] != cuerpo and \
+                    not self.cache_metadata.referenciado(anterior['contenido']):
+                self.paginas.borrar(anterior['contenido'])
             return True
             
         except Exception as e:
@@ -225,47 +388,108 @@ class WebCrawler:
     def eliminar_del_cache(self, url):
         """Elimina una URL específica del caché"""
         cache_key = self.generar_cache_key(url)
-        cache_file = os.path.join(self.cache_dir, f"{cache_key}.html")
         
-        if cache_key in self.cache_metadata['urls']:
-            del self.cache_metadata['urls'][cache_key]
-            
-        if os.path.exists(cache_file):
-            os.remove(cache_file)
+        for cuerpo in self.cache_metadata.borrar([cache_key]):
+            self.paginas.borrar(cuerpo)
+    
+    def cabeceras_condicionales(self, url):
+        """If-None-Match / If-Modified-Since a partir de la página guardada ({} si no hay)"""
+        cache_key = self.generar_cache_key(url)
+        metadata = self.cache_metadata.obtener(cache_key)
+        if not metadata or metadata['contenido'] not in self.paginas:
+            return {}
+        condicionales = {}
+        if metadata.get('etag'):
+            condicionales['If-None-Match'] = metadata['etag']
+        if metadata.get('last_modified'):
+            condicionales['If-Modified-Since'] = metadata['last_modified']
+        return condicionales
+    
+    def revalidar_cache(self, url, headers=None, parsear=False):
+        """Respuesta 304: renueva la página guardada sin descargarla.
+        
+        Con parsear=True devuelve el resultado a partir del HTML guardado; si
+        no, uno sin page_info (la página no ha cambiado desde que se indexó).
+        """
+        cache_key = self.generar_cache_key(url)
+        metadata = self.cache_metadata.obtener(cache_key)
+        if metadata is None:
+            return {'success': False, 'error': '304 sin página en caché'}
+        
+        ahora = datetime.now().isoformat()
+        cambios = {'cached_date': ahora, 'last_accessed': ahora}
+        # El 304 puede traer validadores nuevos
+        for campo, nombre in (('etag', 'etag'), ('last_modified', 'last-modified')):
+            valor = cabecera(headers, nombre)
+            if valor:
+                cambios[campo] = valor
+        self.cache_metadata.actualizar(cache_key, **cambios)
+        if self.recrawl:
+            self.recrawl.registrar(cache_key, url)
+        self.revalidaciones_304 += 1
+        self.bytes_revalidados += metadata.get('size', 0)
+        print(f"♻️ 304 NOT MODIFIED: {url[:80]}...")
         
-        self.guardar_metadata_cache()
+        if parsear:
+            cached = self.leer_de_cache(url)
+            if cached:
+                return cached
+        return {
+            'success': True,
+            'page_info': None,
+            'links': [],
+            'not_modified': True,
+            'from_cache': True
+        }
     
-    def limpiar_cache_expirado(self, max_days=30):
-        """Limpia del caché las URLs más antiguas que max_days"""
-        now = datetime.now()
-        urls_a_eliminar = []
+    def limpiar_cache_expirado(self, max_days=DIAS_CACHE, conservar_revalidables=False):
+        """Limpia del caché las URLs más antiguas que max_days
         
-        for cache_key, metadata in self.cache_metadata['urls'].items():
-            cached_date = datetime.fromisoformat(metadata['cached_date'])
-            days_diff = (now - cached_date).days
-            
-            if days_diff > max_days:
-                urls_a_eliminar.append(cache_key)
-        
-        for cache_key in urls_a_eliminar:
-            cache_file = os.path.join(self.cache_dir, f"{cache_key}.html")
-            if cache_key in self.cache_metadata['urls']:
-                del self.cache_metadata['urls'][cache_key]
-            if os.path.exists(cache_file):
-                os.remove(cache_file)
+        Con conservar_revalidables las que tienen ETag o Last-Modified
+        aguantan hasta DIAS_REVALIDABLE para revalidarse con una petición
+        condicional. Las que el planificador de revisitas aún no da por
+        caducadas (páginas que casi no cambian) se conservan.
+        """
+        dias_revalidable = max(max_days, DIAS_REVALIDABLE) if conservar_revalidables else None
+        urls_a_eliminar = self.cache_metadata.expiradas(max_days, dias_revalidable)
+        if self.recrawl and urls_a_eliminar:
+            vigentes = self.recrawl.vigentes(urls_a_eliminar)
+            urls_a_eliminar = [clave for clave in urls_a_eliminar if clave not in vigentes]
+        
+        for cuerpo in self.cache_metadata.borrar(urls_a_eliminar):
+            self.paginas.borrar(cuerpo)
         
         if urls_a_eliminar:
-            self.guardar_metadata_cache()
             print(f"🧹 Limpiados {len(urls_a_eliminar)} elementos del caché (más de {max_days} días)")
     
     def obtener_estadisticas_cache(self):
         """Obtiene estadísticas del caché"""
+        packs = self.paginas.estadisticas()
+        total_cached, total_size = self.cache_metadata.totales()
+        # Página media para estimar lo que habrían costado las descargas evitadas
+        media = total_size / total_cached if total_cached else 0
         return {
-            'total_cached': self.cache_metadata['stats'].get('total_cached', 0),
-            'total_size_mb': round(self.cache_metadata['stats'].get('total_size', 0) / (1024 * 1024), 2),
+            'total_cached': total_cached,
+            'total_size_mb': round(total_size / (1024 * 1024), 2),
+            'disk_size_mb': round(packs['bytes_disco'] / (1024 * 1024), 2),
+            'garbage_mb': round(packs['bytes_basura'] / (1024 * 1024), 2),
+            'compression_ratio': packs['ratio_compresion'],
+            'compression': packs['compresion'],
+            'pack_files': packs['packs'],
             'cache_hits': self.cache_hits,
             'cache_misses': self.cache_misses,
-            'hit_ratio': round(self.cache_hits / (self.cache_hits + self.cache_misses) * 100, 2) if (self.cache_hits + self.cache_misses) > 0 else 0
+            'hit_ratio': round(self.cache_hits / (self.cache_hits + self.cache_misses) * 100, 2) if (self.cache_hits + self.cache_misses) > 0 else 0,
+            'revalidations': self.revalidaciones,
+            'revalidations_not_modified': self.revalidaciones_304,
+            'revalidation_hit_ratio': round(self.revalidaciones_304 / self.revalidaciones * 100, 2) if self.revalidaciones else 0,
+            'revalidation_saved_mb': round(self.bytes_revalidados / (1024 * 1024), 2),
+            'unique_bodies': packs['paginas'],
+            # URLs que comparten cuerpo: bytes sin comprimir que no están repetidos en disco
+            'content_dedup_saved_mb': round(max(total_size - packs['bytes_originales'], 0) / (1024 * 1024), 2),
+            'content_dedup_session_mb': round(self.bytes_deduplicados / (1024 * 1024), 2),
+            'urls_canonicalized': self.urls_canonicalizadas,
+            'fetches_avoided': self.descargas_evitadas,
+            'bandwidth_saved_mb_est': round(self.descargas_evitadas * media / (1024 * 1024), 2)
         }
     
     def is_valid_url(self, url):
@@ -282,47 +506,48 @@ class WebCrawler:
             if '#' in url:
                 return False
                 
-            domain = parsed.netloc.lower()
-            
-            for blocked in self.blocked_domains:
-                if blocked in domain:
-                    return False
-            
-            path = parsed.path.lower()
-            for ext in self.blocked_extensions:
-                if path.endswith(ext):
-                    return False
-            
-            for pattern in self.blocked_patterns:
-                if re.search(pattern, path, re.IGNORECASE):
-                    return False
-            
-            return True
+            return self.filtro_urls.motivo_rechazo(url, parsed) is None
         except:
             return False
     
+    def extraer_pagina(self, url, html, datos=None, base_url=None):
+        """(page_info, links) de un HTML; (None, None) si no se puede extraer.
+        
+        Los href se resuelven contra base_url (la URL que sirvió la página
+        tras las redirecciones) o, si no se conoce, contra url.
+        """
+        page_info, hrefs = analizar_html(url, html, self.motor_html, datos)
+        if not page_info:
+            return None, None
+        return page_info, self.filtrar_links(hrefs, base_url or url)
+    
     def extract_links(self, soup, base_url):
         """Extrae todos los enlaces válidos de una página"""
+        return self.filtrar_links((link['href'] for link in soup.find_all('a', href=True)), base_url)
+    
+    def filtrar_links(self, hrefs, base_url):
+        """Enlaces válidos y absolutos a partir de los href de una página"""
         links = set()
-        domain = urlparse(base_url).netloc
         
-        for link in soup.find_all('a', href=True):
-            href = link['href'].strip()
+        for href in hrefs:
+            href = href.strip()
             
             if not href or href.startswith('#') or href.startswith('javascript:'):
                 continue
                 
             try:
                 full_url = urljoin(base_url, href)
+                canonica = canonicalizar(full_url)
+                if canonica != full_url:
+                    self.urls_canonicalizadas += 1
+                    # Sin canonicalizar esta variante se habría descargado otra vez
+                    if canonica in links or canonica in self.visited:
+                        self.descargas_evitadas += 1
+                    full_url = canonica
                 
                 if self.is_valid_url(full_url):
                     links.add(full_url)
                     
-                    link_domain = urlparse(full_url).netloc
-                    if link_domain and link_domain != domain:
-                        if link_domain not in self.domains_crawled:
-                            self.new_domains.add(full_url)
-                            
             except:
                 continue
                 
@@ -330,97 +555,194 @@ class WebCrawler:
     
     def extract_info(self, url, soup):
         """Extrae información relevante de la página"""
-        try:
-            title = soup.title.string if soup.title else "Sin título"
-            title = ' '.join(title.split())[:150]
-            
-            meta_desc = (soup.find('meta', attrs={'name': 'description'}) or 
-                        soup.find('meta', attrs={'property': 'og:description'}) or
-                        soup.find('meta', attrs={'name': 'twitter:description'}))
-            description = meta_desc['content'] if meta_desc else ""
-            description = description[:300]
-            
-            meta_keywords = soup.find('meta', attrs={'name': 'keywords'})
-            meta_keywords = meta_keywords['content'] if meta_keywords else ""
-            
-            for script in soup(["script", "style", "nav", "footer", "header", "aside", "form"]):
-                script.decompose()
-            
-            text = soup.get_text(separator=' ', strip=True)
-            text = ' '.join(text.split())[:2000]
-            
-            words = (title + " " + description + " " + meta_keywords + " " + text[:1000]).lower().split()
-            stop_words = {'el','la','los','las','un','una','unos','unas','y','e','o','u',
-                         'de','del','a','en','con','por','para','que','es','son','fue',
-                         'era','como','mas','pero','si','no','the','a','an','and','or',
-                         'of','to','in','on','at','this','that','with','from','by','for'}
-            
-            word_freq = {}
-            for word in words[:500]:
-                if len(word) > 3 and word not in stop_words and word.isalnum():
-                    word_freq[word] = word_freq.get(word, 0) + 1
-            
-            keywords = [k[0] for k in sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:20]]
-            
-            return {
-                'title': title,
-                'url': url,
-                'domain': urlparse(url).netloc,
-                'description': description,
-                'keywords': keywords,
-                'text_snippet': text[:500] + '...' if len(text) > 500 else text,
-                'crawled_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        return extraer_info(url, soup)
+    
+    def construir_page_info(self, url, title, description, meta_keywords, text):
+        return construir_page_info(url, title, description, meta_keywords, text)
+    
+    def leer_de_cache(self, url):
+        """Resultado de crawl_page a partir del caché, o None si no está"""
+        cached = self.obtener_del_cache(url)
+        if cached:
+            print(f"📦 CACHE HIT: {url[:80]}...")
+            page_info, links = self.extraer_pagina(url, cached['content'])
+            if page_info:
+                page_info['from_cache'] = True
+                page_info['cached_date'] = cached['metadata']['cached_date']
+                
+                result = {
+                    'success': True,
+                    'page_info': page_info,
+                    'links': links,
+                    'from_cache': True
+                }
+                canonica = self.comprobar_duplicado(url, page_info)
+                if canonica:
+                    result['duplicate_of'] = canonica
+                return result
+        return None
+    
+    def procesar_html(self, url, html, headers=None, datos=None, base_url=None):
+        """Extrae información y enlaces de un HTML descargado y lo guarda en caché"""
+        page_info, links = self.extraer_pagina(url, html, datos, base_url)
+        
+        if page_info:
+            result = {
+                'success': True,
+                'page_info': page_info,
+                'links': links,
                 'from_cache': False
             }
-        except Exception as e:
+            canonica = self.comprobar_duplicado(url, page_info)
+            if canonica:
+                # Casi duplicada: no ocupa sitio en el caché
+                result['duplicate_of'] = canonica
+            else:
+                # GUARDAR EN CACHÉ
+                self.guardar_en_cache(url, html, headers)
+                self.anotar_visita(url, page_info, html)
+            
+            return result
+        return None
+    
+    def comprobar_duplicado(self, url, page_info):
+        """URL canónica si la página es casi duplicada de otra ya rastreada, o None"""
+        if self.duplicados is None or not page_info.get('simhash'):
+            return None
+        canonica = self.duplicados.comprobar(url, int(page_info['simhash'], 16))
+        if canonica:
+            print(f"🔁 CASI DUPLICADA: {url[:80]} -> {canonica[:80]}")
+        return canonica
+    
+    def anotar_visita(self, url, page_info, html):
+        """Huella de una página descargada para el planificador de revisitas"""
+        if not self.recrawl:
+            return
+        if page_info.get('simhash'):
+            huella = 's:' + page_info['simhash']
+        else:
+            huella = 'c:' + self.clave_contenido(html)
+        if self.recrawl.registrar(self.generar_cache_key(url), url, huella):
+            print(f"🔄 CAMBIADA: {url[:80]}...")
+    
+    def encolar_revisitas(self):
+        """Devuelve a la frontera las páginas cuya revisita toca (como mucho
+        cada PERIODO_REVISITAS segundos y dentro del presupuesto)"""
+        ahora = time.time()
+        if not self.recrawl or ahora - self.ultimas_revisitas < PERIODO_REVISITAS:
+            return 0
+        self.ultimas_revisitas = ahora
+        urls = self.recrawl.vencidas(ahora)
+        for url in urls:
+            self.revisitas.add(url)
+            self.url_queue.put(url, prioridad=AJUSTE_REVISITA)
+        if urls:
+            print(f"🔄 {len(urls)} revisitas encoladas")
+        return len(urls)
+    
+    def ya_visitada(self, url):
+        """Si la URL ya se rastreó y no es una revisita; si no, la marca como visitada"""
+        if url in self.revisitas:
+            self.revisitas.discard(url)
+            return False
+        # En curso cuando se cerró el rastreo anterior: no llegó a procesarse
+        if self.url_queue.reanudada(url):
+            return False
+        with self.lock_visitados:
+            if url in self.visited:
+                return True
+            self.visited.add(url)
+        return False
+    
+    def anotar_aborto(self, url, motivo, cabeceras, leidos=0):
+        """Cuenta una descarga cortada por motivo_aborto y los bytes que no se leyeron"""
+        self.descargas_abortadas[motivo] += 1
+        self.bytes_evitados += descarga.bytes_evitados(cabeceras, leidos)
+        print(f"✂️ DESCARTADA ({motivo}): {url[:80]}...")
+    
+    def anotar_truncada(self, url, cabeceras, leidos):
+        self.descargas_truncadas += 1
+        self.bytes_evitados += descarga.bytes_evitados(cabeceras, leidos)
+        print(f"✂️ TRUNCADA a {leidos} bytes: {url[:80]}...")
+    
+    def leer_respuesta(self, url, response):
+        """(html, datos) de una respuesta 200 pedida con stream=True, o None si
+        no es HTML o es demasiado grande.
+        
+        Con la codificación en Content-Type y lxml, cada trozo se decodifica
+        y se entrega al parser según llega (datos es entonces el análisis ya
+        hecho); si no, se decodifica al final como Response.text.
+        """
+        motivo = descarga.motivo_aborto(response.headers, self.max_bytes_pagina)
+        if motivo:
+            self.anotar_aborto(url, motivo, response.headers)
             return None
+        
+        decodificador = descarga.decodificador(response.headers)
+        analisis = None
+        textos = []
+        if decodificador is not None and self.motor_html == 'lxml':
+            analisis = extraccion.AnalisisIncremental()
+        
+        def al_recibir(trozo):
+            if decodificador is not None:
+                texto = decodificador.decode(trozo)
+                textos.append(texto)
+                if analisis:
+                    analisis.alimentar(texto)
+        
+        contenido, truncada = descarga.leer_trozos(response.iter_content(descarga.TAM_TROZO),
+                                                   self.max_bytes_pagina, al_recibir)
+        if truncada:
+            # Content-Length son bytes en la red (quizá comprimidos), como raw.tell()
+            self.anotar_truncada(url, response.headers, response.raw.tell())
+        if decodificador is None:
+            return descarga.decodificar(contenido, response.headers), None
+        al_final = decodificador.decode(b'', final=True)
+        textos.append(al_final)
+        if analisis:
+            analisis.alimentar(al_final)
+        return ''.join(textos), analisis.cerrar() if analisis else None
     
-    def crawl_page(self, url, force_refresh=False):
-        """Rastrea una página individual - AHORA CON CACHÉ"""
+    def crawl_page(self, url, force_refresh=False, parsear_304=False):
+        """Rastrea una página individual - AHORA CON CACHÉ
+        
+        Si la página caducada o forzada sigue en caché con ETag/Last-Modified
+        la petición es condicional; un 304 la renueva sin descargarla (ver
+        revalidar_cache para parsear_304).
+        """
         
         # Si no es forzar actualización, intentar obtener del caché
         if not force_refresh:
-            cached = self.obtener_del_cache(url)
+            cached = self.leer_de_cache(url)
             if cached:
-                print(f"📦 CACHE HIT: {url[:80]}...")
-                soup = BeautifulSoup(cached['content'], 'html.parser')
-                page_info = self.extract_info(url, soup)
-                if page_info:
-                    page_info['from_cache'] = True
-                    page_info['cached_date'] = cached['metadata']['cached_date']
-                    links = self.extract_links(soup, url)
-                    
-                    return {
-                        'success': True,
-                        'page_info': page_info,
-                        'links': links,
-                        'soup': soup,
-                        'from_cache': True
-                    }
+                return cached
+        
+        condicionales = self.cabeceras_condicionales(url)
+        if condicionales:
+            self.revalidaciones += 1
         
         for attempt in range(self.max_retries):
             try:
                 print(f"🌐 FETCHING: {url[:80]}...")
-                response = self.session.get(url, timeout=self.timeout, allow_redirects=True)
+                response = self.session.get(url, timeout=self.timeout, allow_redirects=True,
+                                            headers=condicionales, stream=self.streaming)
                 
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
+                with response:
+                    if response.status_code == 304 and condicionales:
+                        return self.revalidar_cache(url, response.headers, parsear_304)
                     
-                    page_info = self.extract_info(url, soup)
-                    
-                    if page_info:
-                        links = self.extract_links(soup, url)
-                        
-                        # GUARDAR EN CACHÉ
-                        self.guardar_en_cache(url, response.text, dict(response.headers))
-                        
-                        return {
-                            'success': True,
-                            'page_info': page_info,
-                            'links': links,
-                            'soup': soup,
-                            'from_cache': False
-                        }
+                    if response.status_code == 200:
+                        if self.streaming:
+                            leida = self.leer_respuesta(url, response)
+                            if leida is None:
+                                return {'success': False, 'error': 'Descarga descartada'}
+                            html, datos = leida
+                        else:
+                            html, datos = response.text, None
+                        result = self.procesar_html(url, html, dict(response.headers), datos, response.url)
+                        if result:
+                            return result
                 
                 break
                 
@@ -431,54 +753,87 @@ class WebCrawler:
         
         return {'success': False, 'error': 'Failed after retries'}
     
-    def start_infinite_crawl(self, indexador_callback=None):
-        """INICIA EL RASTREO INFINITO con caché"""
+    def registrar_pagina(self, url, result, indexador_callback=None):
+        """Registra una página rastreada con éxito; devuelve sus enlaces aún no visitados
+        
+        Una casi duplicada (result['duplicate_of']) no se indexa ni aporta enlaces.
+        """
+        if result.get('duplicate_of'):
+            return []
+        page_info = result['page_info']
+        self.index[url] = page_info
+        self.pages_crawled += 1
+        self.checkpoint_visitados()
+        
+        ahora = time.time()
+        self.marcas_paginas.append(ahora)
+        while self.marcas_paginas[0] < ahora - 60:
+            self.marcas_paginas.popleft()
+        
+        domain = page_info['domain']
+        self.domains_crawled.add(domain)
+        
+        if indexador_callback and page_info:
+            indexador_callback({url: page_info})
+        
+        return [link for link in result['links'] if link not in self.visited]
+    
+    def semillas(self, urls):
+        """Semillas válidas en su forma canónica, como los enlaces de filtrar_links"""
+        canonicas = [canonicalizar(url) for url in urls]
+        return [url for url in canonicas if self.is_valid_url(url)]
+    
+    def paginas_por_minuto(self):
+        """Páginas rastreadas en los últimos 60 segundos"""
+        marcas = list(self.marcas_paginas)
+        return len(marcas) - bisect_left(marcas, time.time() - 60)
+    
+    def preparar_rastreo(self, modo):
+        """Estado común al arrancar cualquier modo de rastreo"""
         self.crawling_active = True
         self.pages_crawled = 0
-        start_time = time.time()
+        self.start_time = time.time()
+        self.marcas_paginas.clear()
+        self.modo = modo
         
-        # Limpiar caché expirado al iniciar
-        self.limpiar_cache_expirado()
+        # Limpiar caché expirado al iniciar (lo revalidable se pide condicionalmente)
+        self.limpiar_cache_expirado(conservar_revalidables=True)
         
         print("=" * 80)
-        print(f"🚀 CRAWLER INFINITO INICIADO - User Agent: {self.user_agent_key}")
+        print(f"🚀 CRAWLER INFINITO INICIADO ({modo}) - User Agent: {self.user_agent_key}")
         print(f"📦 CACHÉ ACTIVADO - Directorio: {self.cache_dir}")
         print("=" * 80)
+    
+    def start_infinite_crawl(self, indexador_callback=None):
+        """INICIA EL RASTREO INFINITO con caché"""
+        self.preparar_rastreo('secuencial')
+        start_time = self.start_time
         
         # Añadir semillas
-        for seed in self.seed_urls:
-            if self.is_valid_url(seed):
-                self.url_queue.put(seed)
+        for seed in self.semillas(self.seed_urls):
+            self.url_queue.put(seed)
         
         last_stats_time = time.time()
         
         while self.crawling_active:
             try:
+                self.encolar_revisitas()
                 url = self.url_queue.get(timeout=5)
                 
-                if url in self.visited:
-                    continue
-                
-                self.visited.add(url)
-                result = self.crawl_page(url)
-                
-                if result['success'] and result['page_info']:
-                    page_info = result['page_info']
-                    self.index[url] = page_info
-                    self.pages_crawled += 1
-                    
-                    domain = page_info['domain']
-                    self.domains_crawled.add(domain)
+                try:
+                    if self.ya_visitada(url):
+                        continue
                     
-                    if indexador_callback and page_info:
-                        indexador_callback({url: page_info})
+                    result = self.crawl_page(url)
                     
-                    # Añadir nuevos enlaces
-                    for link in result['links']:
-                        if link not in self.visited:
-                            self.url_queue.put(link)
-                
-                self.url_queue.task_done()
+                    if result['success'] and result['page_info']:
+                        # Añadir nuevos enlaces un nivel más abajo que la página
+                        profundidad = self.url_queue.profundidad(url) + 1
+                        for link in self.registrar_pagina(url, result, indexador_callback):
+                            self.url_queue.put(link, profundidad)
+                finally:
+                    # Libera la plaza del host en la frontera
+                    self.url_queue.task_done(url)
                 
                 # Mostrar estadísticas cada 30 segundos
                 if time.time() - last_stats_time > 30:
@@ -491,40 +846,140 @@ class WebCrawler:
                     print(f"  ⚡ Páginas/minuto: {self.pages_crawled / (elapsed/60):.1f}")
                     last_stats_time = time.time()
                 
-                time.sleep(random.uniform(0.3, 1.0))
-                
             except Exception as e:
                 continue
         
+        self.cerrar_rastreo()
         print(f"✅ Crawler finalizado - Total páginas: {self.pages_crawled}")
     
+    def start_async_crawl(self, indexador_callback=None, concurrencia=200,
+                          semillas=None, max_paginas=None):
+        """Rastreo infinito con el motor asyncio: cientos de descargas en vuelo.
+        
+        Los límites por host son los de la frontera (retraso_host y
+        concurrencia_host). Termina al llamar a stop_crawl(), al llegar a max_paginas o cuando
+        no quedan URLs pendientes ni descargas en curso.
+        """
+        from crawler_async import MotorAsync
+        
+        self.preparar_rastreo('async')
+        self.motor = MotorAsync(self, concurrencia=concurrencia)
+        try:
+            self.motor.ejecutar(indexador_callback, semillas or self.seed_urls, max_paginas)
+        finally:
+            self.crawling_active = False
+            self.cerrar_rastreo()
+        
+        print(f"✅ Crawler finalizado - Total páginas: {self.pages_crawled}")
+    
+    def start_pipeline_crawl(self, indexador_callback=None, descargadores=16, analizadores=None,
+                             semillas=None, max_paginas=None):
+        """Rastreo infinito en etapas: hilos de descarga, procesos de análisis
+        (uno por núcleo por defecto) y un hilo de indexación, unidos por colas
+        acotadas (crawler_pipeline.py).
+        """
+        from crawler_pipeline import MotorPipeline
+        
+        self.preparar_rastreo('pipeline')
+        self.motor = MotorPipeline(self, descargadores=descargadores, analizadores=analizadores)
+        try:
+            self.motor.ejecutar(indexador_callback, semillas or self.seed_urls, max_paginas)
+        finally:
+            self.crawling_active = False
+            self.cerrar_rastreo()
+        
+        print(f"✅ Crawler finalizado - Total páginas: {self.pages_crawled}")
+    
+    def escribir_visitados(self):
+        """Guarda las visitadas en ruta_visitados (archivo temporal y rename)"""
+        with self.lock_guardado:
+            try:
+                guardar_visitados(self.visited, self.ruta_visitados, self.lock_visitados)
+            except OSError as e:
+                print(f"⚠️ No se pudieron guardar las URLs visitadas: {e}")
+    
+    def checkpoint_visitados(self):
+        """Guarda las visitadas en un hilo daemon cada CHECKPOINT_PAGINAS
+        páginas o CHECKPOINT_SEGUNDOS segundos"""
+        if not self.ruta_visitados:
+            return
+        ahora = time.time()
+        if (self.pages_crawled - self.paginas_checkpoint < CHECKPOINT_PAGINAS
+                and ahora - self.ultimo_checkpoint < CHECKPOINT_SEGUNDOS):
+            return
+        # Si el anterior aún se está escribiendo, se espera al siguiente
+        if self.lock_guardado.locked():
+            return
+        self.paginas_checkpoint = self.pages_crawled
+        self.ultimo_checkpoint = ahora
+        thread = threading.Thread(target=self.escribir_visitados)
+        thread.daemon = True
+        thread.start()
+    
+    def cerrar_rastreo(self):
+        """Guarda en disco la frontera y las visitadas para reanudar el rastreo"""
+        self.url_queue.cerrar()
+        if self.ruta_visitados:
+            self.escribir_visitados()
+    
     def stop_crawl(self):
         self.crawling_active = False
     
     def get_status(self):
         cache_stats = self.obtener_estadisticas_cache()
-        return {
+        elapsed = time.time() - self.start_time if self.start_time else 0
+        status = {
             'running': self.crawling_active,
+            'mode': self.modo,
             'pages_crawled': self.pages_crawled,
+            'pages_per_minute': self.paginas_por_minuto(),
+            'pages_per_minute_avg': round(self.pages_crawled / (elapsed / 60), 1) if elapsed else 0,
             'domains_discovered': len(self.domains_crawled),
             'queue_size': self.url_queue.qsize(),
+            'frontier': self.url_queue.estadisticas(),
             'unique_urls': len(self.visited),
+            'visited': estadisticas_visitados(self.visited),
+            'url_filter': self.filtro_urls.estadisticas(),
+            'dedup': self.duplicados.estadisticas() if self.duplicados else None,
+            'recrawl': self.recrawl.estadisticas() if self.recrawl else None,
+            'http': self.cliente.estadisticas(),
+            'fetch': {
+                'streaming': self.streaming,
+                'max_bytes': self.max_bytes_pagina,
+                'aborted': sum(self.descargas_abortadas.values()),
+                'aborted_by_reason': dict(self.descargas_abortadas.most_common(10)),
+                'truncated': self.descargas_truncadas,
+                'bytes_saved_mb': round(self.bytes_evitados / (1024 * 1024), 2)
+            },
             'index_size': len(self.index),
             'user_agent': self.user_agent_key,
             'cache': cache_stats
         }
+        if self.motor:
+            status['in_flight'] = self.motor.en_vuelo
+        if self.modo == 'pipeline':
+            status['pipeline'] = self.motor.estadisticas()
+        return status
 
 class CrawlerManager:
     def __init__(self):
         self.crawlers = []
         self.active_crawlers = 0
     
-    def start_crawler(self, indexador_callback=None, user_agent_key='chrome'):
-        crawler = WebCrawler(user_agent_key=user_agent_key)
+    def start_crawler(self, indexador_callback=None, user_agent_key='chrome', modo='secuencial',
+                      visitados='bloom'):
+        # Cada crawler guarda en disco su propia frontera y sus visitadas (se reanudan al reiniciar)
+        n = len(self.crawlers)
+        crawler = WebCrawler(user_agent_key=user_agent_key,
+                             frontera_disco=os.path.join('data', f'frontera_{n}.db'),
+                             visitados=visitados,
+                             ruta_visitados=os.path.join('data', f'visitados_{n}.bin'))
         self.crawlers.append(crawler)
         self.active_crawlers += 1
         
-        thread = threading.Thread(target=crawler.start_infinite_crawl, 
+        target = {'async': crawler.start_async_crawl,
+                  'pipeline': crawler.start_pipeline_crawl}.get(modo, crawler.start_infinite_crawl)
+        thread = threading.Thread(target=target, 
                                  args=(indexador_callback,))
         thread.daemon = True
         thread.start()
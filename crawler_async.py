@@ -0,0 +1,170 @@
+"""Motor de rastreo asíncrono para WebCrawler.
+
+Mantiene cientos de descargas en vuelo con aiohttp desde un solo hilo y
+reutiliza del WebCrawler la frontera, la validación de URLs, la
+extracción de información y enlaces y la caché. Cada trabajador pide a
+la frontera la siguiente URL cuyo host está listo, así que los límites
+por host no bloquean a los demás hosts. El análisis HTML (CPU) y la
+caché (disco) se ejecutan en un único hilo auxiliar para no bloquear el
+bucle de eventos; al ser uno solo, los métodos del crawler no necesitan
+locks.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty
+
+import aiohttp
+import requests
+
+import descarga
+
+# Espera máxima de un trabajador sin URL antes de volver a preguntar a la frontera
+ESPERA_MAXIMA = 0.2
+
+
+class MotorAsync:
+    """Descargas concurrentes sobre la frontera del crawler"""
+
+    def __init__(self, crawler, concurrencia=200):
+        self.crawler = crawler
+        self.frontera = crawler.url_queue
+        self.concurrencia = concurrencia
+        self.en_vuelo = 0
+        self.procesador = None
+
+    def ejecutar(self, indexador_callback=None, semillas=(), max_paginas=None):
+        """Corre el rastreo en un bucle de eventos propio hasta que termine"""
+        self.procesador = ThreadPoolExecutor(max_workers=1, thread_name_prefix='crawler-html')
+        try:
+            asyncio.run(self.rastrear(indexador_callback, semillas, max_paginas))
+        finally:
+            self.procesador.shutdown(wait=True)
+
+    async def rastrear(self, indexador_callback, semillas, max_paginas):
+        for semilla in self.crawler.semillas(semillas):
+            self.frontera.put(semilla)
+
+        conector = aiohttp.TCPConnector(limit=self.concurrencia,
+                                        limit_per_host=self.frontera.concurrencia_host,
+                                        ttl_dns_cache=self.crawler.cliente.dns.ttl)
+        timeout = aiohttp.ClientTimeout(total=self.crawler.timeout)
+        cabeceras = dict(self.crawler.session.headers)
+        async with aiohttp.ClientSession(connector=conector, timeout=timeout, headers=cabeceras) as sesion:
+            trabajadores = [asyncio.create_task(self.trabajador(sesion, indexador_callback, max_paginas))
+                            for _ in range(self.concurrencia)]
+            while self.crawler.crawling_active:
+                self.crawler.encolar_revisitas()
+                if self.frontera.empty() and self.en_vuelo == 0:
+                    print("🏁 No quedan URLs pendientes")
+                    break
+                await asyncio.sleep(0.2)
+            for tarea in trabajadores:
+                tarea.cancel()
+            await asyncio.gather(*trabajadores, return_exceptions=True)
+
+    async def trabajador(self, sesion, indexador_callback, max_paginas):
+        crawler = self.crawler
+        loop = asyncio.get_running_loop()
+        while crawler.crawling_active:
+            try:
+                url = self.frontera.get_nowait()
+            except Empty:
+                espera = self.frontera.espera()
+                await asyncio.sleep(ESPERA_MAXIMA if espera is None else min(max(espera, 0.005), ESPERA_MAXIMA))
+                continue
+
+            self.en_vuelo += 1
+            try:
+                if crawler.ya_visitada(url):
+                    continue
+                result = await self.rastrear_url(sesion, url)
+                if result and result['page_info']:
+                    await loop.run_in_executor(self.procesador, self.registrar,
+                                               url, result, indexador_callback, max_paginas)
+            except Exception as e:
+                print(f"Error rastreando {url[:80]}: {e}")
+            finally:
+                self.frontera.task_done(url)
+                self.en_vuelo -= 1
+
+    def registrar(self, url, result, indexador_callback, max_paginas):
+        """Registra la página y encola sus enlaces en el hilo auxiliar (límite de páginas exacto)"""
+        crawler = self.crawler
+        if not crawler.crawling_active:
+            return
+        profundidad = self.frontera.profundidad(url) + 1
+        for link in crawler.registrar_pagina(url, result, indexador_callback):
+            self.frontera.put(link, profundidad)
+        if max_paginas and crawler.pages_crawled >= max_paginas:
+            crawler.crawling_active = False
+
+    async def rastrear_url(self, sesion, url):
+        """Equivalente asíncrono de crawl_page"""
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self.procesador, self.crawler.leer_de_cache, url)
+        if result:
+            return result
+        condicionales = await loop.run_in_executor(self.procesador, self.crawler.cabeceras_condicionales, url)
+        if condicionales:
+            self.crawler.revalidaciones += 1
+        obtenida = await self.descargar(sesion, url, condicionales)
+        if obtenida is None:
+            return None
+        html, headers, final = obtenida
+        if html is None:
+            return await loop.run_in_executor(self.procesador, self.crawler.revalidar_cache, url, headers)
+        return await loop.run_in_executor(self.procesador, self.crawler.procesar_html,
+                                          url, html, headers, None, final)
+
+    async def leer(self, url, respuesta):
+        """HTML leído por trozos como WebCrawler.leer_respuesta, sin analizar:
+        el análisis va al hilo auxiliar. None si no es HTML"""
+        crawler = self.crawler
+        cabeceras = dict(respuesta.headers)
+        motivo = descarga.motivo_aborto(cabeceras, crawler.max_bytes_pagina)
+        if motivo:
+            crawler.anotar_aborto(url, motivo, cabeceras)
+            return None
+        partes = []
+        leidos = 0
+        async for trozo in respuesta.content.iter_chunked(descarga.TAM_TROZO):
+            partes.append(trozo)
+            leidos += len(trozo)
+            # Un byte de más basta para saber que la página pasa del límite
+            if crawler.max_bytes_pagina and leidos > crawler.max_bytes_pagina:
+                break
+        contenido, truncada = descarga.leer_trozos(partes, crawler.max_bytes_pagina)
+        if truncada:
+            crawler.anotar_truncada(url, cabeceras, leidos)
+        # Como respuesta.text(): charset de Content-Type o detección
+        codificacion = respuesta.charset or requests.compat.chardet.detect(contenido)['encoding'] or 'utf-8'
+        try:
+            return str(contenido, codificacion, errors='replace')
+        except LookupError:
+            return str(contenido, 'utf-8', errors='replace')
+    
+    async def descargar(self, sesion, url, condicionales=None):
+        """(html, cabeceras, URL final) de una respuesta 200, (None, cabeceras, None)
+        de un 304, o None; reintenta como crawl_page"""
+        for attempt in range(self.crawler.max_retries):
+            try:
+                print(f"🌐 FETCHING: {url[:80]}...")
+                async with sesion.get(url, allow_redirects=True, headers=condicionales) as respuesta:
+                    if respuesta.status == 304 and condicionales:
+                        return None, dict(respuesta.headers), None
+                    if respuesta.status != 200:
+                        return None
+                    if not self.crawler.streaming:
+                        html = await respuesta.text(errors='replace')
+                    else:
+                        html = await self.leer(url, respuesta)
+                        if html is None:
+                            return None
+                    # Los enlaces relativos se resuelven contra la URL servida (tras redirecciones)
+                    return html, dict(respuesta.headers), str(respuesta.url)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self.crawler.max_retries - 1:
+                    return None
+                await asyncio.sleep(1)
+        return None
@@ -0,0 +1,309 @@
+"""Motor de rastreo en etapas para WebCrawler.
+
+En el modo secuencial un solo hilo descarga, analiza, guarda en caché e
+indexa cada página, y el análisis HTML (CPU) no puede usar más de un
+núcleo por el GIL. Aquí el trabajo se reparte en tres etapas unidas por
+colas acotadas:
+
+    descarga   varios hilos: frontera -> caché o HTTP -> bytes sin decodificar
+    análisis   ProcessPoolExecutor: decodificación, extracción de page_info
+               y href (crawler.analizar_html), en paralelo de verdad
+    índice     un único hilo: caché, filtrado de enlaces, registro de la
+               página, indexador y frontera
+
+Cuando una cola se llena la etapa anterior espera (contrapresión): la
+memoria queda acotada y la etapa más lenta marca el ritmo. Como en el
+modo async, el estado del crawler (índice, contadores, frontera de
+salida) sólo lo toca el hilo del índice, así que no hacen falta locks.
+estadisticas() da, por etapa, páginas procesadas, páginas por segundo,
+ocupación y tiempo bloqueado por la cola siguiente.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from queue import Queue, Empty, Full
+
+import requests
+
+import descarga
+from crawler import analizar_html
+from descarga import decodificar
+
+# Espera máxima en una cola antes de volver a mirar si hay que parar
+ESPERA_MAXIMA = 0.2
+# El pipeline arranca desde un hilo de CrawlerManager dentro de Flask: un
+# fork con otros hilos vivos podría heredar locks tomados. forkserver (o
+# spawn donde no existe) crea los analizadores desde un intérprete limpio
+CONTEXTO = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+
+def analizar_pagina(url, contenido, cabeceras, motor_html):
+    """Tarea de la etapa de análisis (en otro proceso): (page_info, hrefs, html, segundos)
+
+    contenido son los bytes descargados o el texto del caché; html sólo se
+    devuelve si hubo que decodificarlo, para guardarlo en caché.
+    """
+    inicio = time.perf_counter()
+    descargado = isinstance(contenido, bytes)
+    html = decodificar(contenido, cabeceras) if descargado else contenido
+    page_info, hrefs = analizar_html(url, html, motor_html)
+    return page_info, hrefs, html if descargado and page_info else None, time.perf_counter() - inicio
+
+
+class Etapa:
+    """Contadores de una etapa del pipeline"""
+
+    def __init__(self, nombre, trabajadores, cola=None):
+        self.nombre = nombre
+        self.trabajadores = trabajadores
+        self.cola = cola
+        self.procesados = 0
+        self.ocupado = 0.0
+        self.bloqueado = 0.0
+        self.inicio = time.time()
+        self.lock = threading.Lock()
+
+    def anotar(self, segundos):
+        with self.lock:
+            self.procesados += 1
+            self.ocupado += segundos
+
+    def anotar_bloqueo(self, segundos):
+        with self.lock:
+            self.bloqueado += segundos
+
+    def estadisticas(self):
+        transcurrido = max(time.time() - self.inicio, 1e-9)
+        return {
+            'workers': self.trabajadores,
+            'processed': self.procesados,
+            'per_second': round(self.procesados / transcurrido, 2),
+            'busy_pct': round(self.ocupado / (transcurrido * self.trabajadores) * 100, 1),
+            'blocked_s': round(self.bloqueado, 2),
+            'queue': self.cola.qsize() if self.cola is not None else 0,
+            'queue_max': self.cola.maxsize if self.cola is not None else 0
+        }
+
+
+class MotorPipeline:
+    """Descarga, análisis e indexación en etapas sobre la frontera del crawler"""
+
+    def __init__(self, crawler, descargadores=16, analizadores=None, tam_cola=64):
+        self.crawler = crawler
+        self.frontera = crawler.url_queue
+        self.descargadores = descargadores
+        self.analizadores = analizadores or os.cpu_count() or 2
+        # Descargas terminadas esperando análisis y análisis lanzados esperando
+        # al índice; la segunda acota también las tareas en el pool
+        self.cola_analisis = Queue(maxsize=tam_cola)
+        self.cola_indice = Queue(maxsize=self.analizadores * 2)
+        self.etapas = {
+            'fetch': Etapa('fetch', descargadores, self.cola_analisis),
+            'parse': Etapa('parse', self.analizadores, self.cola_indice),
+            'index': Etapa('index', 1)
+        }
+        self.parar = threading.Event()
+        self.sesiones = threading.local()
+        self.lock = threading.Lock()
+        # URLs sacadas de la frontera que aún no han terminado (descarga a índice)
+        self.en_vuelo = 0
+        self.pool = None
+
+    def ejecutar(self, indexador_callback=None, semillas=(), max_paginas=None):
+        """Corre el rastreo hasta stop_crawl(), max_paginas o frontera agotada"""
+        crawler = self.crawler
+        for semilla in crawler.semillas(semillas):
+            self.frontera.put(semilla)
+
+        self.pool = ProcessPoolExecutor(max_workers=self.analizadores, mp_context=CONTEXTO)
+        # Arranca los procesos antes de medir las etapas
+        self.pool.submit(int).result()
+        for etapa in self.etapas.values():
+            etapa.inicio = time.time()
+
+        hilos = [threading.Thread(target=self.descargar, name=f'pipeline-fetch-{i}', daemon=True)
+                 for i in range(self.descargadores)]
+        hilos.append(threading.Thread(target=self.lanzar_analisis, name='pipeline-parse', daemon=True))
+        hilos.append(threading.Thread(target=self.indexar, args=(indexador_callback, max_paginas),
+                                      name='pipeline-index', daemon=True))
+        for hilo in hilos:
+            hilo.start()
+        try:
+            while crawler.crawling_active:
+                crawler.encolar_revisitas()
+                # en_curso cubre las URLs ya entregadas por get() que aún no suman en en_vuelo
+                with self.lock:
+                    terminado = self.en_vuelo == 0
+                terminado = terminado and self.frontera.empty() and not self.frontera.en_curso
+                if terminado:
+                    print("🏁 No quedan URLs pendientes")
+                    break
+                time.sleep(ESPERA_MAXIMA)
+        finally:
+            self.parar.set()
+            for hilo in hilos:
+                hilo.join()
+            self.pool.shutdown(wait=True, cancel_futures=True)
+
+    def terminar(self):
+        """Una URL sacada de la frontera ha terminado (o se ha descartado)"""
+        with self.lock:
+            self.en_vuelo -= 1
+
+    def poner(self, cola, elemento, etapa):
+        """put bloqueante que cuenta el tiempo de espera y se rinde al parar"""
+        inicio = time.perf_counter()
+        while not self.parar.is_set():
+            try:
+                cola.put(elemento, timeout=ESPERA_MAXIMA)
+                etapa.anotar_bloqueo(time.perf_counter() - inicio)
+                return True
+            except Full:
+                continue
+        return False
+
+    def sacar(self, cola):
+        """get que devuelve None al parar"""
+        while not self.parar.is_set():
+            try:
+                return cola.get(timeout=ESPERA_MAXIMA)
+            except Empty:
+                continue
+        return None
+
+    def sesion(self):
+        """Una requests.Session por hilo de descarga, con las cabeceras del crawler
+        y los pools compartidos de crawler.cliente"""
+        sesion = getattr(self.sesiones, 'sesion', None)
+        if sesion is None:
+            sesion = self.sesiones.sesion = self.crawler.cliente.sesion(self.crawler.session.headers)
+        return sesion
+
+    def descargar(self):
+        """Etapa de descarga: la página del caché o de la red, sin analizar"""
+        crawler = self.crawler
+        etapa = self.etapas['fetch']
+        while not self.parar.is_set():
+            try:
+                url = self.frontera.get(timeout=ESPERA_MAXIMA)
+            except Empty:
+                continue
+            with self.lock:
+                self.en_vuelo += 1
+            inicio = time.perf_counter()
+            try:
+                if crawler.ya_visitada(url):
+                    self.terminar()
+                    continue
+                # Profundidad de los enlaces de la página: la frontera la olvida en task_done
+                profundidad = self.frontera.profundidad(url) + 1
+                descarga = self.obtener(url)
+            except Exception as e:
+                print(f"Error descargando {url[:80]}: {e}")
+                descarga = None
+            finally:
+                # La plaza del host se libera al acabar la descarga, no el análisis
+                self.frontera.task_done(url)
+            etapa.anotar(time.perf_counter() - inicio)
+            if descarga is None or not self.poner(self.cola_analisis, (url, profundidad) + descarga, etapa):
+                self.terminar()
+
+    def obtener(self, url):
+        """(contenido, cabeceras, cached_date, URL base de los enlaces) de la URL, o
+        None; como crawl_page sin analizar"""
+        crawler = self.crawler
+        cached = crawler.obtener_del_cache(url)
+        if cached:
+            print(f"📦 CACHE HIT: {url[:80]}...")
+            return cached['content'], None, cached['metadata']['cached_date'], url
+
+        condicionales = crawler.cabeceras_condicionales(url)
+        if condicionales:
+            crawler.revalidaciones += 1
+        for attempt in range(crawler.max_retries):
+            try:
+                print(f"🌐 FETCHING: {url[:80]}...")
+                response = self.sesion().get(url, timeout=crawler.timeout, allow_redirects=True,
+                                             headers=condicionales, stream=crawler.streaming)
+                with response:
+                    if response.status_code == 304 and condicionales:
+                        # Sin cambios: la página ya está indexada, como crawl_page sin parsear_304
+                        crawler.revalidar_cache(url, response.headers)
+                        return None
+                    if response.status_code != 200:
+                        return None
+                    if not crawler.streaming:
+                        return response.content, dict(response.headers), None, response.url
+                    # Por trozos pero sin analizar: el análisis es de la etapa siguiente
+                    motivo = descarga.motivo_aborto(response.headers, crawler.max_bytes_pagina)
+                    if motivo:
+                        crawler.anotar_aborto(url, motivo, response.headers)
+                        return None
+                    contenido, truncada = descarga.leer_trozos(response.iter_content(descarga.TAM_TROZO),
+                                                               crawler.max_bytes_pagina)
+                    if truncada:
+                        crawler.anotar_truncada(url, response.headers, response.raw.tell())
+                    return contenido, dict(response.headers), None, response.url
+            except requests.RequestException:
+                if attempt == crawler.max_retries - 1:
+                    return None
+                time.sleep(1)
+        return None
+
+    def lanzar_analisis(self):
+        """Etapa de análisis: reparte las páginas entre los procesos del pool"""
+        motor_html = self.crawler.motor_html
+        etapa = self.etapas['parse']
+        while True:
+            elemento = self.sacar(self.cola_analisis)
+            if elemento is None:
+                return
+            url, profundidad, contenido, cabeceras, cached_date, base = elemento
+            futuro = self.pool.submit(analizar_pagina, url, contenido, cabeceras, motor_html)
+            if not self.poner(self.cola_indice, (url, profundidad, cabeceras, cached_date, base, futuro), etapa):
+                self.terminar()
+
+    def indexar(self, indexador_callback, max_paginas):
+        """Etapa de índice: un solo hilo que actualiza el crawler, como MotorAsync.registrar"""
+        crawler = self.crawler
+        etapa = self.etapas['index']
+        while True:
+            elemento = self.sacar(self.cola_indice)
+            if elemento is None:
+                return
+            url, profundidad, cabeceras, cached_date, base, futuro = elemento
+            try:
+                page_info, hrefs, html, segundos = futuro.result()
+                self.etapas['parse'].anotar(segundos)
+                inicio = time.perf_counter()
+                if page_info and crawler.crawling_active:
+                    if html is None:
+                        page_info['from_cache'] = True
+                        page_info['cached_date'] = cached_date
+                    canonica = crawler.comprobar_duplicado(url, page_info)
+                    if canonica:
+                        # Casi duplicada: ni caché ni enlaces
+                        result = {'success': True, 'page_info': page_info, 'links': [],
+                                  'from_cache': html is None, 'duplicate_of': canonica}
+                    else:
+                        if html is not None:
+                            crawler.guardar_en_cache(url, html, cabeceras)
+                            crawler.anotar_visita(url, page_info, html)
+                        result = {'success': True, 'page_info': page_info,
+                                  'links': crawler.filtrar_links(hrefs, base), 'from_cache': html is None}
+                    for link in crawler.registrar_pagina(url, result, indexador_callback):
+                        self.frontera.put(link, profundidad)
+                    if max_paginas and crawler.pages_crawled >= max_paginas:
+                        crawler.crawling_active = False
+                    etapa.anotar(time.perf_counter() - inicio)
+            except Exception as e:
+                print(f"Error indexando {url[:80]}: {e}")
+            finally:
+                self.terminar()
+
+    def estadisticas(self):
+        return {nombre: etapa.estadisticas() for nombre, etapa in self.etapas.items()}
@@ -0,0 +1,116 @@
+"""Lectura por trozos de las respuestas HTTP del crawler.
+
+Antes cada descarga leía response.text entero antes de mirar nada: un
+PDF, un vídeo o una página de varios megas que pasaban el filtro de
+extensiones se descargaban y decodificaban completos para tirarlos
+después. Ahora:
+
+    - motivo_aborto() mira Content-Type y Content-Length en las cabeceras
+      y corta antes de leer el cuerpo si no es HTML o si ya se sabe que
+      pasa de max_bytes;
+    - leer_trozos() lee el cuerpo de TAM_TROZO en TAM_TROZO hasta
+      max_bytes (la página se queda truncada) y entrega cada trozo a quien
+      lo vaya analizando;
+    - bytes_evitados() estima lo que no se ha descargado.
+
+Sin Content-Type se acepta la respuesta, como hacía el crawler.
+"""
+
+import codecs
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# Tipos que el crawler sabe analizar
+TIPOS_HTML = frozenset(('text/html', 'application/xhtml+xml'))
+# Bytes máximos por página (sin comprimir)
+MAX_BYTES = 5 * 1024 * 1024
+TAM_TROZO = 64 * 1024
+
+
+def cabecera(cabeceras, nombre):
+    """Valor de una cabecera sin distinguir mayúsculas ('' si no está)"""
+    if not cabeceras:
+        return ''
+    nombre = nombre.lower()
+    for clave, valor in cabeceras.items():
+        if clave.lower() == nombre:
+            return valor
+    return ''
+
+
+def longitud(cabeceras):
+    """Content-Length como entero, o None si no está o no es válido"""
+    try:
+        valor = int(cabecera(cabeceras, 'content-length'))
+    except ValueError:
+        return None
+    return valor if valor >= 0 else None
+
+
+def motivo_aborto(cabeceras, max_bytes=MAX_BYTES):
+    """'tipo:<mime>' si la respuesta no es HTML, 'tamano' si Content-Length
+    pasa de max_bytes, o None si hay que leerla"""
+    tipo = cabecera(cabeceras, 'content-type').split(';', 1)[0].strip().lower()
+    if tipo and tipo not in TIPOS_HTML:
+        return f'tipo:{tipo}'
+    total = longitud(cabeceras)
+    # Content-Length cuenta bytes comprimidos: sin compresión la comparación es exacta
+    if max_bytes and total is not None and total > max_bytes and not cabecera(cabeceras, 'content-encoding'):
+        return 'tamano'
+    return None
+
+
+def bytes_evitados(cabeceras, leidos):
+    """Bytes de Content-Length que no se llegaron a leer (0 si no se conoce)"""
+    total = longitud(cabeceras)
+    return max(total - leidos, 0) if total is not None else 0
+
+
+def leer_trozos(trozos, max_bytes=MAX_BYTES, al_recibir=None):
+    """(bytes, truncada) de un iterable de trozos, sin pasar de max_bytes;
+    al_recibir(trozo) se llama con cada trozo según llega"""
+    partes = []
+    leidos = 0
+    truncada = False
+    for trozo in trozos:
+        if not trozo:
+            continue
+        if max_bytes and leidos + len(trozo) > max_bytes:
+            trozo = trozo[:max_bytes - leidos]
+            truncada = True
+        partes.append(trozo)
+        leidos += len(trozo)
+        if al_recibir:
+            al_recibir(trozo)
+        if truncada:
+            break
+    return b''.join(partes), truncada
+
+
+def codificacion(cabeceras):
+    """Codificación de Content-Type como la usa Response.text (None si hay que detectarla)"""
+    return get_encoding_from_headers(CaseInsensitiveDict(cabeceras or {}))
+
+
+def decodificador(cabeceras):
+    """Decodificador incremental con la codificación de las cabeceras, o None"""
+    nombre = codificacion(cabeceras)
+    if nombre is None:
+        return None
+    try:
+        return codecs.getincrementaldecoder(nombre)(errors='replace')
+    except LookupError:
+        return None
+
+
+def decodificar(contenido, cabeceras):
+    """Texto de una respuesta como Response.text: charset de Content-Type o detección"""
+    nombre = codificacion(cabeceras)
+    if nombre is None:
+        nombre = requests.compat.chardet.detect(contenido)['encoding']
+    try:
+        return str(contenido, nombre or 'utf-8', errors='replace')
+    except (LookupError, TypeError):
+        return str(contenido, errors='replace')
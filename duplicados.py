@@ -0,0 +1,112 @@
+"""Detección de páginas casi duplicadas con SimHash.
+
+Espejos, versiones para imprimir, variantes con parámetros de
+seguimiento y páginas casi todo plantilla dan page_info casi iguales.
+Cada página lleva en page_info['simhash'] una huella de 64 bits de su
+texto visible (construir_page_info): cada shingle de TAM_SHINGLE
+palabras vota en cada bit según su hash, así que textos que comparten
+casi todos los shingles dan huellas a pocos bits de distancia.
+
+IndiceSimhash encuentra una huella a DISTANCIA bits o menos sin comparar
+con todas: parte las huellas en DISTANCIA + 1 bandas y, si dos huellas
+difieren en DISTANCIA bits como mucho, al menos una banda es idéntica.
+Cada banda es un dict valor -> huellas, así que sólo se comparan las que
+coinciden en alguna banda.
+"""
+
+import hashlib
+import threading
+
+BITS = 64
+TAM_SHINGLE = 3
+# Con menos shingles la huella es poco fiable y no se compara
+MIN_SHINGLES = 8
+DISTANCIA = 3
+
+# Los 8 bits de cada valor de byte como 8 bytes 0/1 (el más alto primero)
+BITS_BYTE = [bytes((valor >> (7 - k)) & 1 for k in range(8)) for valor in range(256)]
+
+
+def simhash(texto, tam_shingle=TAM_SHINGLE):
+    """Huella de 64 bits del texto, o None si es demasiado corto"""
+    palabras = texto.lower().split()
+    n = len(palabras) - tam_shingle + 1
+    if n < MIN_SHINGLES:
+        return None
+    # Votos por bit sin bucle por bit: cada hash se expande a 64 bytes 0/1 y
+    # se suman como enteros de 512 bits (un carril de 8 bits por bit), en
+    # tandas de 255 para que ningún carril se desborde
+    votos = [0] * BITS
+    for inicio in range(0, n, 255):
+        suma = sum(int.from_bytes(b''.join([BITS_BYTE[b] for b in hashlib.blake2b(
+                       ' '.join(palabras[i:i + tam_shingle]).encode('utf-8'), digest_size=8).digest()]), 'big')
+                   for i in range(inicio, min(inicio + 255, n)))
+        for bit, cuenta in enumerate(suma.to_bytes(BITS, 'big')):
+            votos[bit] += cuenta
+    return int(''.join('1' if cuenta * 2 > n else '0' for cuenta in votos), 2)
+
+
+def distancia(a, b):
+    return bin(a ^ b).count('1')
+
+
+class IndiceSimhash:
+    """Huellas de las páginas ya vistas y duplicada -> canónica"""
+
+    def __init__(self, distancia_maxima=DISTANCIA):
+        self.distancia_maxima = distancia_maxima
+        n_bandas = distancia_maxima + 1
+        ancho = BITS // n_bandas
+        # (desplazamiento, máscara) de cada banda; la última se queda los bits sobrantes
+        self.bandas = [(i * ancho, (1 << (ancho if i < n_bandas - 1 else BITS - i * ancho)) - 1)
+                       for i in range(n_bandas)]
+        self.tablas = [{} for _ in self.bandas]
+        self.urls = []
+        self.huellas = []
+        self.canonicas = {}
+        self.revisadas = 0
+        self.lock = threading.Lock()
+
+    def buscar(self, huella):
+        """Índice de una página a distancia_maxima bits o menos, o None"""
+        vistos = set()
+        for (desplazamiento, mascara), tabla in zip(self.bandas, self.tablas):
+            for i in tabla.get((huella >> desplazamiento) & mascara, ()):
+                if i not in vistos:
+                    vistos.add(i)
+                    if distancia(huella, self.huellas[i]) <= self.distancia_maxima:
+                        return i
+        return None
+
+    def comprobar(self, url, huella):
+        """URL canónica si la página es casi duplicada de otra ya vista; si no
+        la registra y devuelve None"""
+        with self.lock:
+            self.revisadas += 1
+            i = self.buscar(huella)
+            if i is not None:
+                if self.urls[i] == url:
+                    # La misma página vuelta a analizar (caché, 304)
+                    return None
+                self.canonicas[url] = self.urls[i]
+                return self.urls[i]
+            i = len(self.huellas)
+            self.huellas.append(huella)
+            self.urls.append(url)
+            for (desplazamiento, mascara), tabla in zip(self.bandas, self.tablas):
+                tabla.setdefault((huella >> desplazamiento) & mascara, []).append(i)
+            return None
+
+    def canonica(self, url):
+        """URL canónica de una página descartada como duplicada (o None)"""
+        return self.canonicas.get(url)
+
+    def estadisticas(self):
+        duplicadas = len(self.canonicas)
+        return {
+            'checked': self.revisadas,
+            'near_duplicates': duplicadas,
+            'dedup_rate': round(duplicadas / self.revisadas * 100, 2) if self.revisadas else 0,
+            'fingerprints': len(self.huellas),
+            'max_distance': self.distancia_maxima
+        }
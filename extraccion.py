@@ -0,0 +1,184 @@
+"""Extracción de una página HTML en un solo análisis con lxml.
+
+Reproduce lo que WebCrawler.extract_info y extract_links obtienen de un
+árbol BeautifulSoup('html.parser'), pero sin construir ese árbol ni
+recorrerlo varias veces: un único recorrido del árbol de lxml recoge el
+título, las meta description/keywords, los textos visibles y los href.
+
+Para que el resultado sea el mismo se respetan las reglas del camino
+antiguo:
+  - título y metas se buscan en todo el documento (antes de quitar nada);
+  - script, style, nav, footer, header, aside y form no aportan texto ni
+    enlaces, pero el texto que les sigue (tail) sí;
+  - cada nodo de texto cuenta por separado, como get_text(separator=' ');
+  - los comentarios y el contenido de <template> no aportan texto.
+
+La única diferencia conocida está en HTML mal formado: html.parser corta
+el texto en una etiqueta de cierre suelta ("tres</ul>cuatro" da dos
+textos) y lxml la ignora (uno), así que dos palabras pegadas a ella
+pueden quedar unidas.
+
+analizar() devuelve None si lxml no puede con el documento; el crawler
+usa entonces el camino con BeautifulSoup. AnalisisIncremental da el
+mismo resultado alimentando el parser por trozos mientras se descarga la
+página (crawl_page con streaming).
+"""
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# Elementos que extract_info elimina antes de sacar el texto
+ELIMINADAS = frozenset(('script', 'style', 'nav', 'footer', 'header', 'aside', 'form'))
+# BeautifulSoup guarda el texto de <template> como TemplateString y get_text lo omite
+SIN_TEXTO = 'template'
+
+# Metas que busca extract_info: (atributo, valor) -> clave del resultado
+METAS = {
+    ('name', 'description'): 'description',
+    ('property', 'og:description'): 'og_description',
+    ('name', 'twitter:description'): 'twitter_description',
+    ('name', 'keywords'): 'keywords',
+}
+
+# Caracteres mínimos por feed(): el parser incremental de libxml2 pierde
+# el documento si el primer trozo es muy pequeño
+MIN_TROZO = 4096
+
+_parser = None
+
+
+def disponible():
+    return etree is not None
+
+
+def cadena(elemento):
+    """Equivalente a Tag.string de BeautifulSoup: el texto si es el único hijo"""
+    while True:
+        hijos = len(elemento)
+        if hijos == 0:
+            return elemento.text or None
+        if hijos > 1 or elemento.text or elemento[0].tail:
+            return None
+        elemento = elemento[0]
+        if not isinstance(elemento.tag, str):
+            # Comentario como único hijo: BeautifulSoup también lo devuelve
+            return elemento.text
+
+
+def analizar(html):
+    """Datos en bruto de la página o None si lxml no la puede analizar.
+
+    Devuelve {'title': str | None (None = sin <title>), 'sin_cadena': bool,
+    'metas': {clave: contenido | None}, 'textos': [str], 'hrefs': [str]}.
+    Un meta encontrado sin atributo content queda como None.
+    """
+    global _parser
+    if etree is None:
+        return None
+    if _parser is None:
+        _parser = etree.HTMLParser(encoding='utf-8')
+    try:
+        # Con bytes lxml acepta también documentos con declaración XML de encoding
+        raiz = etree.fromstring(html.encode('utf-8', 'surrogatepass'), _parser)
+    except (etree.LxmlError, ValueError, UnicodeError):
+        return None
+    if raiz is None:
+        return None
+    return recorrer(raiz)
+
+
+class AnalisisIncremental:
+    """analizar() con el HTML por trozos: alimentar(texto) a medida que llega
+    y cerrar() devuelve lo mismo que analizar(''.join(trozos))"""
+
+    def __init__(self):
+        self.parser = etree.HTMLParser(encoding='utf-8')
+        self.pendiente = []
+        self.tam_pendiente = 0
+        self.fallido = False
+
+    def alimentar(self, texto, final=False):
+        self.pendiente.append(texto)
+        self.tam_pendiente += len(texto)
+        if self.fallido or (self.tam_pendiente < MIN_TROZO and not final):
+            return
+        texto = ''.join(self.pendiente)
+        self.pendiente = []
+        self.tam_pendiente = 0
+        if not texto:
+            return
+        try:
+            self.parser.feed(texto.encode('utf-8', 'surrogatepass'))
+        except (etree.LxmlError, ValueError, UnicodeError):
+            self.fallido = True
+
+    def cerrar(self):
+        self.alimentar('', final=True)
+        if self.fallido:
+            return None
+        try:
+            raiz = self.parser.close()
+        except (etree.LxmlError, ValueError, UnicodeError):
+            return None
+        if raiz is None:
+            return None
+        return recorrer(raiz)
+
+
+def recorrer(raiz):
+    """Un recorrido del árbol de lxml: el diccionario de analizar()"""
+    titulo = None
+    metas = {}
+    textos = []
+    hrefs = []
+    eliminado = 0
+    plantilla = 0
+    pila = [(raiz, False)]
+    while pila:
+        elemento, cierre = pila.pop()
+        tag = elemento.tag
+        if cierre:
+            if tag in ELIMINADAS:
+                eliminado -= 1
+            elif tag == SIN_TEXTO:
+                plantilla -= 1
+            if elemento.tail and not eliminado and not plantilla:
+                textos.append(elemento.tail)
+            continue
+        if not isinstance(tag, str):
+            # Comentario o instrucción de procesamiento: sólo cuenta lo que le sigue
+            if elemento.tail and not eliminado and not plantilla:
+                textos.append(elemento.tail)
+            continue
+
+        if tag == 'title':
+            if titulo is None:
+                titulo = elemento
+        elif tag == 'meta':
+            for (atributo, valor), clave in METAS.items():
+                if clave not in metas and elemento.get(atributo) == valor:
+                    metas[clave] = elemento.get('content')
+        elif tag == 'a' and not eliminado:
+            href = elemento.get('href')
+            if href is not None:
+                hrefs.append(href)
+
+        if tag in ELIMINADAS:
+            eliminado += 1
+        elif tag == SIN_TEXTO:
+            plantilla += 1
+        elif elemento.text and not eliminado and not plantilla:
+            textos.append(elemento.text)
+        pila.append((elemento, True))
+        if len(elemento):
+            pila.extend((hijo, False) for hijo in reversed(elemento))
+
+    return {
+        'title': None if titulo is None else cadena(titulo),
+        'sin_cadena': titulo is not None and cadena(titulo) is None,
+        'metas': metas,
+        'textos': textos,
+        'hrefs': hrefs,
+    }
@@ -0,0 +1,220 @@
+"""Filtro de URLs del crawler con las reglas compiladas.
+
+is_valid_url se llama por cada enlace extraído. Antes recorría las
+listas de dominios (subcadena), extensiones (endswith) y patrones
+(re.search sin compilar) en cada llamada; aquí las reglas se compilan
+una vez en:
+
+    dominios     trie de etiquetas invertidas (com -> youtube): bloquea el
+                 dominio y todos sus subdominios
+    extensiones  set con las extensiones del último segmento de la ruta
+    patrones     una sola expresión regular con todos los patrones
+
+Las reglas se leen de un JSON ({"dominios": [...], "extensiones": [...],
+"patrones": [...]}); si falta alguna lista se usa la de por defecto.
+cambiar_reglas() compila las nuevas reglas aparte y las cambia de una
+vez, así que se pueden sustituir con el crawler en marcha. Cada regla
+cuenta cuántas URLs ha rechazado (estadisticas) para poder ajustarlas.
+"""
+
+import json
+import re
+import threading
+from collections import Counter
+from urllib.parse import urlparse
+
+DOMINIOS = [
+    'youtube.com', 'youtu.be', 'facebook.com', 'instagram.com',
+    'tiktok.com', 'twitch.tv', 'pinterest.com', 'flickr.com',
+    'imgur.com', 'amazon.com', 'ebay.com', 'aliexpress.com',
+    'walmart.com', 'netflix.com', 'spotify.com', 'deviantart.com',
+    'vimeo.com', 'dailymotion.com', 'tumblr.com', 'snapchat.com',
+    'whatsapp.com', 'telegram.org', 'discord.com'
+]
+
+EXTENSIONES = [
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.svg', '.webp',
+    '.mp3', '.mp4', '.avi', '.mov', '.wmv', '.flv', '.mkv',
+    '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx',
+    '.zip', '.rar', '.7z', '.tar', '.gz', '.bz2',
+    '.exe', '.msi', '.bin', '.dmg', '.iso', '.img'
+]
+
+PATRONES = [
+    r'login', r'signup', r'register', r'password', r'auth',
+    r'cart', r'checkout', r'payment', r'order', r'invoice',
+    r'logout', r'session', r'forgot', r'recover',
+    r'captcha', r'bot', r'spider', r'crawler',
+    r'\.git', r'\.svn', r'\.hg', r'\.bzr',
+    r'wp-admin', r'wp-login', r'administrator',
+    r'phpmyadmin', r'mysql', r'phpPgAdmin',
+    r'calendar', r'events', r'print', r'pdf',
+    r'#', r'mailto:', r'tel:', r'javascript:'
+]
+
+# Marca de fin de dominio en el trie (ninguna etiqueta DNS puede ser '')
+FIN = ''
+
+# Caracteres con significado en re; escapados con '\\' son literales
+ESPECIALES = frozenset('.^$*+?{}[]|()\\')
+
+
+def literal_patron(patron):
+    """Texto que busca el patrón si es un literal ('\\.git' -> '.git'), si no None"""
+    texto = []
+    i = 0
+    while i < len(patron):
+        caracter = patron[i]
+        if caracter == '\\':
+            i += 1
+            if i == len(patron) or patron[i].isalnum():
+                return None
+            caracter = patron[i]
+        elif caracter in ESPECIALES:
+            return None
+        texto.append(caracter)
+        i += 1
+    return ''.join(texto)
+
+
+class ReglasCompiladas:
+    """Reglas inmutables ya compiladas; FiltroURLs sustituye el objeto entero"""
+
+    def __init__(self, dominios=None, extensiones=None, patrones=None):
+        self.dominios = list(DOMINIOS if dominios is None else dominios)
+        self.extensiones = list(EXTENSIONES if extensiones is None else extensiones)
+        self.patrones = list(PATRONES if patrones is None else patrones)
+
+        self.trie = {}
+        for dominio in self.dominios:
+            nodo = self.trie
+            for etiqueta in reversed(dominio.lower().strip('.').split('.')):
+                nodo = nodo.setdefault(etiqueta, {})
+            nodo[FIN] = dominio
+
+        self.conjunto_extensiones = {ext.lower() for ext in self.extensiones}
+        self.puntos_extension = max((ext.count('.') for ext in self.conjunto_extensiones), default=0)
+
+        # Una sola expresión sobre la ruta en minúsculas. Con re.IGNORECASE el
+        # motor de re no puede buscar por prefijo literal y es ~7 veces más
+        # lento, así que los patrones literales ('login', '\\.git') se pasan a
+        # minúsculas y sólo los que usan sintaxis de re llevan (?i:...)
+        self.compilados = [re.compile(patron, re.IGNORECASE) for patron in self.patrones]
+        partes = []
+        for patron in self.patrones:
+            literal = literal_patron(patron)
+            partes.append(re.escape(literal.lower()) if literal is not None else f'(?i:{patron})')
+        self.regex = re.compile('|'.join(partes)) if partes else None
+
+    def dominio_bloqueado(self, host):
+        """Regla de dominio que bloquea host (o None)"""
+        nodo = self.trie
+        for etiqueta in reversed(host.split('.')):
+            nodo = nodo.get(etiqueta)
+            if nodo is None:
+                return None
+            if FIN in nodo:
+                return nodo[FIN]
+        return None
+
+    def extension_bloqueada(self, ruta):
+        """Extensión bloqueada al final de la ruta (o None); ruta ya en minúsculas"""
+        ultimo = ruta[ruta.rfind('/') + 1:]
+        inicio = len(ultimo)
+        # Prueba '.gz', luego '.tar.gz'... hasta el mayor número de puntos de una regla
+        for _ in range(self.puntos_extension):
+            inicio = ultimo.rfind('.', 0, inicio)
+            if inicio < 0:
+                return None
+            if ultimo[inicio:] in self.conjunto_extensiones:
+                return ultimo[inicio:]
+        return None
+
+    def patron_bloqueado(self, ruta, ruta_minusculas):
+        if self.regex is None or self.regex.search(ruta_minusculas) is None:
+            return None
+        # Sólo al rechazar: la regla que se cuenta es la primera de la lista, como antes
+        for patron, compilado in zip(self.patrones, self.compilados):
+            if compilado.search(ruta):
+                return patron
+        return None
+
+
+class FiltroURLs:
+    def __init__(self, dominios=None, extensiones=None, patrones=None, ruta=None):
+        self.ruta = ruta
+        self.aciertos = Counter()
+        self.revisadas = 0
+        self.lock = threading.Lock()
+        if ruta:
+            self.reglas = self.leer_archivo(ruta)
+        else:
+            self.reglas = ReglasCompiladas(dominios, extensiones, patrones)
+
+    @staticmethod
+    def leer_archivo(ruta):
+        with open(ruta, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+        return ReglasCompiladas(datos.get('dominios'), datos.get('extensiones'), datos.get('patrones'))
+
+    def cambiar_reglas(self, dominios=None, extensiones=None, patrones=None):
+        """Sustituye las reglas en caliente; las listas que falten se conservan"""
+        actuales = self.reglas
+        nuevas = ReglasCompiladas(actuales.dominios if dominios is None else dominios,
+                                  actuales.extensiones if extensiones is None else extensiones,
+                                  actuales.patrones if patrones is None else patrones)
+        with self.lock:
+            self.reglas = nuevas
+            self.aciertos.clear()
+
+    def recargar(self, ruta=None):
+        """Vuelve a leer las reglas del archivo (el de origen si no se indica otro)"""
+        ruta = ruta or self.ruta
+        nuevas = self.leer_archivo(ruta)
+        with self.lock:
+            self.ruta = ruta
+            self.reglas = nuevas
+            self.aciertos.clear()
+
+    def guardar(self, ruta):
+        reglas = self.reglas
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({'dominios': reglas.dominios, 'extensiones': reglas.extensiones,
+                       'patrones': reglas.patrones}, f, ensure_ascii=False, indent=2)
+
+    def motivo_rechazo(self, url, parsed=None):
+        """Regla que rechaza la URL ('dominio:...', 'extension:...', 'patron:...') o None.
+        parsed evita volver a analizar una URL que ya pasó por urlparse"""
+        self.revisadas += 1
+        if parsed is None:
+            parsed = urlparse(url)
+        reglas = self.reglas
+        host = (parsed.hostname or '').rstrip('.')
+        regla = reglas.dominio_bloqueado(host)
+        if regla:
+            return self.contar('dominio:' + regla)
+        ruta = parsed.path.lower()
+        regla = reglas.extension_bloqueada(ruta)
+        if regla:
+            return self.contar('extension:' + regla)
+        regla = reglas.patron_bloqueado(parsed.path, ruta)
+        if regla:
+            return self.contar('patron:' + regla)
+        return None
+
+    def contar(self, regla):
+        with self.lock:
+            self.aciertos[regla] += 1
+        return regla
+
+    def estadisticas(self):
+        with self.lock:
+            reglas = self.reglas
+            aciertos = Counter(self.aciertos)
+        return {
+            'revisadas': self.revisadas,
+            'rechazadas': sum(aciertos.values()),
+            'reglas': {'dominios': len(reglas.dominios), 'extensiones': len(reglas.extensiones),
+                       'patrones': len(reglas.patrones)},
+            'aciertos': dict(aciertos.most_common())
+        }
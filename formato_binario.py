@@ -0,0 +1,546 @@
+"""Formato binario de segmento del índice, pensado para abrirse con mmap.
+
+Un segmento cubre un rango contiguo de doc_id [base, base + n_docs) y es
+inmutable. Todas las tablas son arrays nativos alineados a 8 bytes que se
+leen como memoryview sobre el mmap, así que abrir un segmento sólo lee la
+cabecera y la tabla de dominios; el resto se pagina bajo demanda.
+
+    cabecera            MAGIC, contadores y tabla de offsets de secciones
+    longitudes          u32[n_docs]       longitud de cada documento
+    campos_idx/campos   u64[n_docs+1] + JSON de cada página (campos guardados)
+    urls_idx/urls       u64[n_docs+1] + URL de cada página en UTF-8
+    hash_claves/docs    u64[cap] + u32[cap]  tabla hash URL -> doc local
+    term_idx/terminos   u32[n_terms+1] + términos UTF-8 ordenados por bytes
+    bloque_inicio       u32[n_terms]      primer bloque de postings de cada término
+    df/max_tf/min_len   u32[n_terms]      estadísticas por término (WAND)
+    bloque_primero/     u32[bloques]      tabla de saltos: primer y último doc_id
+      bloque_ultimo                       absoluto de cada bloque
+    bloque_offset       u64[bloques]      posición de cada bloque en post_datos
+    bloque_max_tf/      u32[bloques]      tf máximo y longitud mínima de cada
+      bloque_min_len                      bloque (block-max WAND)
+    bloque_max_peso     f64[bloques]      mayor peso BM25 del bloque con la
+                                          longitud media del segmento
+    post_datos          bloques comprimidos de postings (ver postings.py)
+    dominios            JSON {dominio: [páginas, último rastreo]}
+
+La versión 1 guardaba las postings sin comprimir (post_inicio u64[n_terms]
+y post_docs/post_tfs u32[total]) y la 2 no tenía las cotas por bloque;
+se siguen pudiendo leer y las fusiones las reescriben en la versión
+actual.
+"""
+
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from itertools import groupby
+
+from postings import TAM_BLOQUE, ListaArray, ListaBloques, codificar_lista
+from recuperacion import calcular_frecuencias
+
+MAGIC = b'BSCSEG01'
+VERSION = 3
+VACIO = 0xFFFFFFFF
+
+SECCIONES = ('longitudes', 'campos_idx', 'campos', 'urls_idx', 'urls',
+             'hash_claves', 'hash_docs', 'term_idx', 'terminos', 'bloque_inicio',
+             'df', 'max_tf', 'min_len', 'bloque_primero', 'bloque_ultimo',
+             'bloque_offset', 'bloque_max_tf', 'bloque_min_len', 'bloque_max_peso',
+             'post_datos', 'dominios')
+
+SECCIONES_V2 = ('longitudes', 'campos_idx', 'campos', 'urls_idx', 'urls',
+                'hash_claves', 'hash_docs', 'term_idx', 'terminos', 'bloque_inicio',
+                'df', 'max_tf', 'min_len', 'bloque_primero', 'bloque_ultimo',
+                'bloque_offset', 'post_datos', 'dominios')
+
+SECCIONES_V1 = ('longitudes', 'campos_idx', 'campos', 'urls_idx', 'urls',
+                'hash_claves', 'hash_docs', 'term_idx', 'terminos', 'post_inicio',
+                'df', 'max_tf', 'min_len', 'post_docs', 'post_tfs', 'dominios')
+
+# magic, little-endian, versión, base, n_docs, n_terms, términos nuevos,
+# longitud total, capacidad hash y (offset, tamaño) por sección
+PREFIJO = '<8sBxxxIIIIIQI4x'
+CABECERA = struct.Struct(PREFIJO + 'QQ' * len(SECCIONES))
+CABECERAS = {1: (struct.Struct(PREFIJO + 'QQ' * len(SECCIONES_V1)), SECCIONES_V1),
+             2: (struct.Struct(PREFIJO + 'QQ' * len(SECCIONES_V2)), SECCIONES_V2),
+             VERSION: (CABECERA, SECCIONES)}
+
+
+def hash_url(url):
+    """Hash estable de 64 bits (hash() de Python cambia entre procesos)"""
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def capacidad_hash(n_docs):
+    """Capacidad de la tabla hash: potencia de 2 >= 2 * n_docs"""
+    cap = 1
+    while cap < max(2 * n_docs, 1):
+        cap *= 2
+    return cap
+
+
+def tabla_hash(pares, cap):
+    """Tabla hash con direccionamiento abierto (sondeo lineal) de pares (hash, doc local)"""
+    hash_claves = array('Q', [0] * cap)
+    hash_docs = array('I', [VACIO] * cap)
+    for h, local in pares:
+        i = h & (cap - 1)
+        while hash_docs[i] != VACIO:
+            i = (i + 1) & (cap - 1)
+        hash_claves[i] = h
+        hash_docs[i] = local
+    return hash_claves, hash_docs
+
+
+def indice(partes):
+    """Offsets acumulados (u64[n+1]) de una lista de bytes"""
+    idx = array('Q', [0])
+    total = 0
+    for parte in partes:
+        total += len(parte)
+        idx.append(total)
+    return idx
+
+
+class TablasPostings:
+    """Diccionario de términos y tablas de saltos que se van llenando término a término.
+
+    codificar() recibe los términos en orden y devuelve los trozos de
+    post_datos según los comprime, así que nunca hay más de una lista de
+    postings descomprimida en memoria.
+    """
+
+    def __init__(self, longitud_media):
+        self.longitud_media = longitud_media
+        self.n_terms = 0
+        self.tam_datos = 0
+        self.term_idx = array('I', [0])
+        self.terminos = bytearray()
+        self.bloque_inicio = array('I')
+        self.df = array('I')
+        self.max_tf = array('I')
+        self.min_len = array('I')
+        self.bloque_primero = array('I')
+        self.bloque_ultimo = array('I')
+        self.bloque_offset = array('Q')
+        self.bloque_max_tf = array('I')
+        self.bloque_min_len = array('I')
+        self.bloque_max_peso = array('d')
+
+    def codificar(self, terminos):
+        """Trozos de post_datos de (término en bytes, docs, tfs, longitudes) ordenados por término"""
+        for termino, docs, tfs, longitudes in terminos:
+            self.n_terms += 1
+            self.terminos += termino
+            self.term_idx.append(len(self.terminos))
+            self.bloque_inicio.append(len(self.bloque_primero))
+            self.df.append(len(docs))
+            self.max_tf.append(max(tfs))
+            self.min_len.append(min(longitudes))
+            primeros, ultimos, offsets, max_tfs, min_lens, max_pesos, datos = codificar_lista(
+                docs, tfs, longitudes, self.longitud_media)
+            self.bloque_primero.extend(primeros)
+            self.bloque_ultimo.extend(ultimos)
+            self.bloque_offset.extend(self.tam_datos + o for o in offsets)
+            self.bloque_max_tf.extend(max_tfs)
+            self.bloque_min_len.extend(min_lens)
+            self.bloque_max_peso.extend(max_pesos)
+            self.tam_datos += len(datos)
+            yield datos
+
+    def secciones(self):
+        return {
+            'term_idx': self.term_idx.tobytes(),
+            'terminos': bytes(self.terminos),
+            'bloque_inicio': self.bloque_inicio.tobytes(),
+            'df': self.df.tobytes(),
+            'max_tf': self.max_tf.tobytes(),
+            'min_len': self.min_len.tobytes(),
+            'bloque_primero': self.bloque_primero.tobytes(),
+            'bloque_ultimo': self.bloque_ultimo.tobytes(),
+            'bloque_offset': self.bloque_offset.tobytes(),
+            'bloque_max_tf': self.bloque_max_tf.tobytes(),
+            'bloque_min_len': self.bloque_min_len.tobytes(),
+            'bloque_max_peso': self.bloque_max_peso.tobytes(),
+        }
+
+
+class EscritorSegmento:
+    """Escribe las secciones de un segmento en ruta.tmp según llegan.
+
+    La cabecera guarda el offset de cada sección, así que pueden
+    escribirse en cualquier orden y cada una puede ser bytes o un
+    iterable de trozos (que se vuelcan sin juntarlos en memoria).
+    cerrar() escribe la cabecera al principio y renombra el archivo.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.tmp = ruta + '.tmp'
+        self.f = open(self.tmp, 'wb')
+        self.f.write(b'\0' * CABECERA.size)
+        self.offsets = {}
+
+    def seccion(self, nombre, contenido):
+        self.f.write(b'\0' * (-self.f.tell() % 8))
+        inicio = self.f.tell()
+        if isinstance(contenido, (bytes, bytearray, memoryview)):
+            self.f.write(contenido)
+        else:
+            for trozo in contenido:
+                self.f.write(trozo)
+        self.offsets[nombre] = (inicio, self.f.tell() - inicio)
+
+    def cerrar(self, base, n_docs, n_terms, terminos_nuevos, longitud_total, cap):
+        offsets = [valor for nombre in SECCIONES for valor in self.offsets[nombre]]
+        self.f.seek(0)
+        self.f.write(CABECERA.pack(MAGIC, 1 if sys.byteorder == 'little' else 0, VERSION,
+                                   base, n_docs, n_terms, terminos_nuevos,
+                                   longitud_total, cap, *offsets))
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.f.close()
+        os.replace(self.tmp, self.ruta)
+
+    def descartar(self):
+        self.f.close()
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
+
+def escribir_segmento(ruta, registros, base=None, terminos_nuevos=None):
+    """Escribe un segmento binario a partir de registros de página con doc_id.
+
+    terminos_nuevos es cuántos términos de este segmento no aparecen en
+    segmentos anteriores (para contar el vocabulario sin recorrerlo); por
+    defecto se asume que son todos.
+    """
+    registros = sorted(registros, key=lambda r: r['doc_id'])
+    if base is None:
+        base = registros[0]['doc_id'] if registros else 0
+    n_docs = registros[-1]['doc_id'] - base + 1 if registros else 0
+
+    longitudes = array('I', [0] * n_docs)
+    campos = [b''] * n_docs
+    urls = [b''] * n_docs
+    postings = {}
+    dominios = {}
+    longitud_total = 0
+
+    for info in registros:
+        local = info['doc_id'] - base
+        campos[local] = json.dumps(info, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        urls[local] = info['url'].encode('utf-8')
+        frecuencias, longitud = calcular_frecuencias(info)
+        longitudes[local] = longitud
+        longitud_total += longitud
+        for termino, tf in frecuencias.items():
+            postings.setdefault(termino.encode('utf-8'), []).append((info['doc_id'], tf, longitud))
+        entrada = dominios.setdefault(info['domain'], [0, info['crawled_date']])
+        entrada[0] += 1
+        entrada[1] = info['crawled_date']
+
+    cap = capacidad_hash(n_docs)
+    hash_claves, hash_docs = tabla_hash(
+        ((hash_url(url.decode('utf-8')), local) for local, url in enumerate(urls) if url), cap)
+
+    tablas = TablasPostings(longitud_total / n_docs if n_docs else 1.0)
+    terminos = ((termino, [d for d, _, _ in postings[termino]], [tf for _, tf, _ in postings[termino]],
+                 [l for _, _, l in postings[termino]]) for termino in sorted(postings))
+
+    escritor = EscritorSegmento(ruta)
+    try:
+        escritor.seccion('longitudes', longitudes.tobytes())
+        escritor.seccion('campos_idx', indice(campos).tobytes())
+        escritor.seccion('campos', b''.join(campos))
+        escritor.seccion('urls_idx', indice(urls).tobytes())
+        escritor.seccion('urls', b''.join(urls))
+        escritor.seccion('hash_claves', hash_claves.tobytes())
+        escritor.seccion('hash_docs', hash_docs.tobytes())
+        escritor.seccion('post_datos', tablas.codificar(terminos))
+        for nombre, contenido in tablas.secciones().items():
+            escritor.seccion(nombre, contenido)
+        escritor.seccion('dominios', json.dumps(dominios, ensure_ascii=False).encode('utf-8'))
+        if terminos_nuevos is None:
+            terminos_nuevos = tablas.n_terms
+        escritor.cerrar(base, n_docs, tablas.n_terms, terminos_nuevos, longitud_total, cap)
+    except BaseException:
+        escritor.descartar()
+        raise
+
+
+class SegmentoBinario:
+    """Lector de un segmento binario abierto con mmap (sólo lectura)"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.nombre = os.path.basename(ruta)
+        with open(ruta, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, little, version = struct.unpack_from('<8sBxxxI', self.mm, 0)
+        if magic != MAGIC or version not in CABECERAS:
+            raise ValueError(f"{ruta} no es un segmento válido")
+        cabecera, nombres = CABECERAS[version]
+        campos = cabecera.unpack_from(self.mm, 0)
+        self.version = version
+        if little != (1 if sys.byteorder == 'little' else 0):
+            raise ValueError(f"{ruta} se escribió con otro orden de bytes")
+        (self.base, self.n_docs, self.n_terms, self.terminos_nuevos,
+         self.longitud_total, self.cap_hash) = campos[3:9]
+
+        vista = memoryview(self.mm)
+        secciones = {}
+        for i, nombre in enumerate(nombres):
+            offset, tam = campos[9 + 2 * i], campos[10 + 2 * i]
+            secciones[nombre] = vista[offset:offset + tam]
+
+        self.longitudes = secciones['longitudes'].cast('I')
+        self.campos_idx = secciones['campos_idx'].cast('Q')
+        self.campos = secciones['campos']
+        self.urls_idx = secciones['urls_idx'].cast('Q')
+        self.urls = secciones['urls']
+        self.hash_claves = secciones['hash_claves'].cast('Q')
+        self.hash_docs = secciones['hash_docs'].cast('I')
+        self.term_idx = secciones['term_idx'].cast('I')
+        self.terminos = secciones['terminos']
+        self.df = secciones['df'].cast('I')
+        self.max_tf = secciones['max_tf'].cast('I')
+        self.min_len = secciones['min_len'].cast('I')
+        if version == 1:
+            self.post_inicio = secciones['post_inicio'].cast('Q')
+            self.post_docs = secciones['post_docs'].cast('I')
+            self.post_tfs = secciones['post_tfs'].cast('I')
+        else:
+            self.bloque_inicio = secciones['bloque_inicio'].cast('I')
+            self.bloque_primero = secciones['bloque_primero'].cast('I')
+            self.bloque_ultimo = secciones['bloque_ultimo'].cast('I')
+            self.bloque_offset = secciones['bloque_offset'].cast('Q')
+            self.post_datos = secciones['post_datos']
+            if version >= 3:
+                self.bloque_max_tf = secciones['bloque_max_tf'].cast('I')
+                self.bloque_min_len = secciones['bloque_min_len'].cast('I')
+                self.bloque_max_peso = secciones['bloque_max_peso'].cast('d')
+        self.dominios = json.loads(bytes(secciones['dominios']) or b'{}')
+
+    def documento(self, doc_id):
+        """Campos guardados de un doc_id, o None si no está en este segmento"""
+        local = doc_id - self.base
+        if local < 0 or local >= self.n_docs:
+            return None
+        inicio, fin = self.campos_idx[local], self.campos_idx[local + 1]
+        if inicio == fin:
+            return None
+        return json.loads(bytes(self.campos[inicio:fin]))
+
+    def url(self, doc_id):
+        local = doc_id - self.base
+        return bytes(self.urls[self.urls_idx[local]:self.urls_idx[local + 1]]).decode('utf-8')
+
+    def buscar_url(self, url):
+        """doc_id de una URL vía la tabla hash persistente, o None"""
+        if self.n_docs == 0:
+            return None
+        h = hash_url(url)
+        url_bytes = url.encode('utf-8')
+        mascara = self.cap_hash - 1
+        i = h & mascara
+        while True:
+            local = self.hash_docs[i]
+            if local == VACIO:
+                return None
+            if self.hash_claves[i] == h and \
+                    self.urls[self.urls_idx[local]:self.urls_idx[local + 1]] == url_bytes:
+                return self.base + local
+            i = (i + 1) & mascara
+
+    def termino(self, i):
+        return bytes(self.terminos[self.term_idx[i]:self.term_idx[i + 1]])
+
+    def posicion_termino(self, termino):
+        """Búsqueda binaria en el diccionario de términos; -1 si no está"""
+        clave = termino.encode('utf-8')
+        bajo, alto = 0, self.n_terms
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            actual = self.termino(medio)
+            if actual < clave:
+                bajo = medio + 1
+            elif actual > clave:
+                alto = medio
+            else:
+                return medio
+        return -1
+
+    def postings(self, termino):
+        """(lista de postings, tf máximo, longitud mínima) del término, o None.
+
+        La lista no se descomprime aquí: sus cursores decodifican cada
+        bloque cuando lo necesitan.
+        """
+        i = self.posicion_termino(termino)
+        if i < 0:
+            return None
+        return self.lista(i), self.max_tf[i], self.min_len[i]
+
+    def lista(self, i):
+        """Lista de postings del término i del diccionario"""
+        df = self.df[i]
+        if self.version == 1:
+            inicio = self.post_inicio[i]
+            lista = ListaArray(self.post_docs[inicio:inicio + df], self.post_tfs[inicio:inicio + df])
+        else:
+            inicio = self.bloque_inicio[i]
+            fin = inicio + (df + TAM_BLOQUE - 1) // TAM_BLOQUE
+            cotas = {}
+            if self.version >= 3:
+                # La misma media con la que escribir_segmento calculó los pesos
+                cotas = dict(max_tfs=self.bloque_max_tf[inicio:fin],
+                             min_lens=self.bloque_min_len[inicio:fin],
+                             max_pesos=self.bloque_max_peso[inicio:fin],
+                             longitud_segmento=self.longitud_total / self.n_docs)
+            lista = ListaBloques(self.post_datos, self.bloque_primero[inicio:fin],
+                                 self.bloque_ultimo[inicio:fin], self.bloque_offset[inicio:fin], df,
+                                 **cotas)
+        return lista
+
+    def frecuencia_documental(self, termino):
+        i = self.posicion_termino(termino)
+        return self.df[i] if i >= 0 else 0
+
+    def registros(self):
+        """Todas las páginas guardadas, en orden de doc_id (para fusionar)"""
+        for local in range(self.n_docs):
+            info = self.documento(self.base + local)
+            if info is not None:
+                yield info
+
+
+def documentos_segmento(ruta):
+    """n_docs de un segmento leyendo sólo su cabecera"""
+    with open(ruta, 'rb') as f:
+        return struct.unpack_from(PREFIJO, f.read(struct.calcsize(PREFIJO)))[4]
+
+
+def leer_registros(ruta):
+    return list(SegmentoBinario(ruta).registros())
+
+
+def terminos_de(n, segmento):
+    for i in range(segmento.n_terms):
+        yield segmento.termino(i), n, i
+
+
+def fusionar_segmentos(ruta, rutas):
+    """Fusiona segmentos de doc_id consecutivos en uno solo sin pasar por los registros.
+
+    Campos, URLs y longitudes se copian tal cual desplazando sus índices,
+    la tabla hash se rehace con los hashes ya guardados y los
+    diccionarios de términos se mezclan en orden con heapq.merge: cada
+    término se descomprime y se vuelve a comprimir de una vez, así que no
+    hace falta tener las páginas en memoria. Cada término cuenta como
+    nuevo en el primer segmento donde aparece, así que terminos_nuevos es
+    la suma de los de los segmentos fusionados.
+    """
+    lectores = [SegmentoBinario(r) for r in rutas]
+    base = lectores[0].base
+    n_docs = lectores[-1].base + lectores[-1].n_docs - base
+
+    longitudes = array('I')
+    campos_idx = array('Q', [0])
+    urls_idx = array('Q', [0])
+    desplazamientos = []
+    dominios = {}
+    for seg in lectores:
+        # Documentos perdidos entre un segmento y el siguiente
+        hueco = seg.base - base - len(longitudes)
+        longitudes.extend([0] * hueco)
+        campos_idx.extend([campos_idx[-1]] * hueco)
+        urls_idx.extend([urls_idx[-1]] * hueco)
+
+        desplazamientos.append(len(longitudes))
+        longitudes.frombytes(seg.longitudes.cast('B'))
+        inicio = campos_idx[-1]
+        campos_idx.extend(inicio + offset for offset in seg.campos_idx[1:])
+        inicio = urls_idx[-1]
+        urls_idx.extend(inicio + offset for offset in seg.urls_idx[1:])
+        for domain, (paginas, ultimo) in seg.dominios.items():
+            entrada = dominios.setdefault(domain, [0, ultimo])
+            entrada[0] += paginas
+            entrada[1] = ultimo
+    longitud_total = sum(seg.longitud_total for seg in lectores)
+
+    cap = capacidad_hash(n_docs)
+    hash_claves, hash_docs = tabla_hash(
+        ((seg.hash_claves[i], seg.hash_docs[i] + desplazamiento)
+         for seg, desplazamiento in zip(lectores, desplazamientos)
+         for i in range(seg.cap_hash) if seg.hash_docs[i] != VACIO), cap)
+
+    def terminos():
+        # Los segmentos van en orden de doc_id: a igual término, el orden
+        # de heapq.merge deja las postings ordenadas
+        mezcla = heapq.merge(*(terminos_de(n, seg) for n, seg in enumerate(lectores)))
+        for termino, grupo in groupby(mezcla, key=lambda t: t[0]):
+            docs = []
+            tfs = []
+            for _, n, i in grupo:
+                docs_seg, tfs_seg = lectores[n].lista(i).completa()
+                docs += docs_seg
+                tfs += tfs_seg
+            yield termino, docs, tfs, [longitudes[d - base] for d in docs]
+
+    tablas = TablasPostings(longitud_total / n_docs if n_docs else 1.0)
+    escritor = EscritorSegmento(ruta)
+    try:
+        escritor.seccion('longitudes', longitudes.tobytes())
+        escritor.seccion('campos_idx', campos_idx.tobytes())
+        escritor.seccion('campos', (seg.campos for seg in lectores))
+        escritor.seccion('urls_idx', urls_idx.tobytes())
+        escritor.seccion('urls', (seg.urls for seg in lectores))
+        escritor.seccion('hash_claves', hash_claves.tobytes())
+        escritor.seccion('hash_docs', hash_docs.tobytes())
+        escritor.seccion('post_datos', tablas.codificar(terminos()))
+        for nombre, contenido in tablas.secciones().items():
+            escritor.seccion(nombre, contenido)
+        escritor.seccion('dominios', json.dumps(dominios, ensure_ascii=False).encode('utf-8'))
+        escritor.cerrar(base, n_docs, tablas.n_terms, sum(seg.terminos_nuevos for seg in lectores),
+                        longitud_total, cap)
+    except BaseException:
+        escritor.descartar()
+        raise
+
+
+def convertir_json(json_path, directorio):
+    """Convierte un data/index.json del formato antiguo en un almacén binario"""
+    from almacenamiento import AlmacenSegmentos
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        legacy = json.load(f)
+    registros = []
+    urls_vistas = set()
+    for info in legacy.get('paginas', []):
+        if info.get('url') in urls_vistas:
+            continue
+        urls_vistas.add(info.get('url'))
+        registros.append(dict(info, doc_id=len(registros)))
+
+    almacen = AlmacenSegmentos(directorio)
+    if almacen.existe():
+        raise ValueError(f"{directorio} ya contiene un índice")
+    almacen.abrir()
+    almacen.importar(registros, legacy.get('stats', {}).get('created'))
+    return len(registros)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Uso: python formato_binario.py data/index.json [directorio_destino]")
+        sys.exit(1)
+    origen = sys.argv[1]
+    destino = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(origen)[0]
+    total = convertir_json(origen, destino)
+    print(f"✅ {total} páginas convertidas a {destino}")
@@ -0,0 +1,455 @@
+"""Frontera de rastreo con cortesía por host.
+
+Sustituye a la cola FIFO global: cada host tiene su propia subcola
+ordenada por prioridad y un heap de "listo en" decide qué host puede
+servir la siguiente URL. Un host está listo cuando tiene URLs pendientes,
+no ha llegado a su límite de descargas simultáneas y ha pasado su
+retraso desde la última descarga. get() siempre devuelve la mejor URL
+del primer host listo, así que un host lento o saturado no bloquea al
+resto.
+
+Prioridad (menor = antes): profundidad desde la semilla, menos un bono
+por cada enlace entrante visto mientras la URL estaba pendiente, más un
+ajuste libre del llamador (por ejemplo, frescura).
+
+Con ruta_disco la memoria queda acotada: sólo una ventana caliente de
+max_memoria URLs vive en las subcolas y el resto se guarda en una tabla
+SQLite ordenada por prioridad (ColaDisco). Las altas nuevas se acumulan
+en un búfer y se vuelcan en lote; cuando la ventana baja a la mitad se
+leen por adelantado las tam_lote mejores URLs de disco. Un enlace
+entrante a una URL que está en disco suma en la propia tabla, así que la
+prioridad se mantiene igual que en memoria salvo por el orden entre la
+ventana y el disco. cerrar() devuelve la ventana al disco para poder
+reanudar el rastreo.
+
+Las URLs en curso al cerrar ya están en las visitadas del crawler, así
+que cerrar() las apunta además como reanudadas: al volver a abrir,
+reanudada(url) dice que hay que descargarlas aunque consten como
+visitadas, hasta que su task_done() las borra de la tabla.
+
+Interfaz compatible con queue.Queue (put, get, get_nowait, qsize,
+empty), salvo que task_done(url) necesita la URL para liberar su host.
+"""
+
+import heapq
+import math
+import os
+import sqlite3
+import threading
+import time
+from itertools import count
+from queue import Empty
+from urllib.parse import urlparse
+
+# Cuánto adelanta una URL cada duplicación de sus enlaces entrantes
+PESO_ENLACES = 0.5
+
+
+def puntuacion(profundidad, enlaces, ajuste):
+    return profundidad + ajuste - PESO_ENLACES * math.log2(enlaces)
+
+
+class ColaDisco:
+    """URLs pendientes fuera de la ventana en memoria, en SQLite ordenadas por puntuación.
+
+    No es segura entre hilos por sí misma: la usa Frontera con su
+    lock_disco, sin tener tomado el lock de la frontera.
+    """
+
+    def __init__(self, ruta, tam_lote=1000):
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self.tam_lote = tam_lote
+        # url -> [profundidad, enlaces, ajuste] aún sin volcar
+        self.buffer = {}
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self.conexion.create_function('log2', 1, math.log2, deterministic=True)
+        self.conexion.executescript('''
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS frontera (
+                url TEXT PRIMARY KEY,
+                profundidad INTEGER NOT NULL,
+                enlaces INTEGER NOT NULL,
+                ajuste REAL NOT NULL,
+                puntuacion REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS frontera_puntuacion ON frontera (puntuacion);
+            CREATE TABLE IF NOT EXISTS contador (filas INTEGER NOT NULL);
+            INSERT INTO contador SELECT COUNT(*) FROM frontera
+                WHERE NOT EXISTS (SELECT 1 FROM contador);
+            CREATE TRIGGER IF NOT EXISTS frontera_alta AFTER INSERT ON frontera
+                BEGIN UPDATE contador SET filas = filas + 1; END;
+            CREATE TRIGGER IF NOT EXISTS frontera_baja AFTER DELETE ON frontera
+                BEGIN UPDATE contador SET filas = filas - 1; END;
+            CREATE TABLE IF NOT EXISTS reanudadas (url TEXT PRIMARY KEY);
+        ''')
+        self.filas = self.contar()
+
+    def contar(self):
+        return self.conexion.execute('SELECT filas FROM contador').fetchone()[0]
+
+    def pendientes(self):
+        """URLs en disco más las del búfer (alguna puede estar en los dos)"""
+        return self.filas + len(self.buffer)
+
+    def agregar(self, url, profundidad, enlaces, ajuste):
+        entrada = self.buffer.get(url)
+        if entrada is None:
+            self.buffer[url] = [profundidad, enlaces, ajuste]
+        else:
+            entrada[0] = min(entrada[0], profundidad)
+            entrada[1] += enlaces
+            entrada[2] = min(entrada[2], ajuste)
+        if len(self.buffer) >= self.tam_lote:
+            self.volcar()
+
+    def volcar(self):
+        """Escribe el búfer en un lote; si la URL ya estaba suma sus enlaces"""
+        if not self.buffer:
+            return
+        filas = [(url, p, e, a, puntuacion(p, e, a)) for url, (p, e, a) in self.buffer.items()]
+        with self.conexion:
+            self.conexion.executemany(f'''
+                INSERT INTO frontera (url, profundidad, enlaces, ajuste, puntuacion)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    profundidad = min(profundidad, excluded.profundidad),
+                    enlaces = enlaces + excluded.enlaces,
+                    ajuste = min(ajuste, excluded.ajuste),
+                    puntuacion = min(profundidad, excluded.profundidad)
+                        + min(ajuste, excluded.ajuste)
+                        - {PESO_ENLACES} * log2(enlaces + excluded.enlaces)
+            ''', filas)
+        self.buffer.clear()
+        self.filas = self.contar()
+
+    def sacar(self, cantidad):
+        """Quita y devuelve las mejores URLs: [(url, profundidad, enlaces, ajuste)]"""
+        self.volcar()
+        filas = self.conexion.execute(
+            'SELECT url, profundidad, enlaces, ajuste FROM frontera ORDER BY puntuacion LIMIT ?',
+            (cantidad,)).fetchall()
+        if filas:
+            with self.conexion:
+                self.conexion.executemany('DELETE FROM frontera WHERE url = ?',
+                                          [(fila[0],) for fila in filas])
+            self.filas = self.contar()
+        return filas
+
+    def reanudadas(self):
+        """URLs que estaban en curso la última vez que se cerró la frontera"""
+        return {fila[0] for fila in self.conexion.execute('SELECT url FROM reanudadas')}
+
+    def marcar_reanudadas(self, urls):
+        with self.conexion:
+            self.conexion.executemany('INSERT OR IGNORE INTO reanudadas (url) VALUES (?)',
+                                      [(url,) for url in urls])
+
+    def quitar_reanudada(self, url):
+        with self.conexion:
+            self.conexion.execute('DELETE FROM reanudadas WHERE url = ?', (url,))
+
+    def cerrar(self):
+        self.volcar()
+        self.conexion.close()
+
+
+class EstadoHost:
+    """Subcola y contadores de cortesía de un host"""
+
+    def __init__(self, retraso, concurrencia):
+        self.cola = []
+        # URLs pendientes del host: el resto de entradas de cola son viejas
+        self.vivas = 0
+        self.retraso = retraso
+        self.concurrencia = concurrencia
+        self.activos = 0
+        self.listo_en = 0.0
+        self.en_heap = False
+
+
+class Frontera:
+    def __init__(self, retraso=1.0, concurrencia_host=2, max_urls=None,
+                 ruta_disco=None, max_memoria=10000, tam_lote=1000):
+        self.retraso = retraso
+        self.concurrencia_host = concurrencia_host
+        self.max_urls = max_urls
+        # Sin ruta_disco todo vive en memoria y max_memoria no se aplica
+        self.disco = ColaDisco(ruta_disco, tam_lote) if ruta_disco else None
+        # SQLite se usa con lock_disco y sin el lock de la frontera, así
+        # que get() y put() no esperan a la E/S de otros hilos. Orden: lock
+        # antes que lock_disco, nunca al revés
+        self.lock_disco = threading.Lock()
+        self.leyendo = False
+        self.max_memoria = max_memoria
+        self.tam_lote = tam_lote
+        self.hosts = {}
+        self.configuracion = {}
+        self.listos = []
+        self.pendientes = {}
+        self.en_curso = {}
+        # En curso al cerrar la vez anterior: se descargan aunque estén visitadas
+        self.reanudadas = self.disco.reanudadas() if self.disco else set()
+        self.secuencia = count()
+        self.lock = threading.Lock()
+        self.hay_cambios = threading.Condition(self.lock)
+        self.descartadas = 0
+
+    @staticmethod
+    def host_de(url):
+        return urlparse(url).netloc.lower()
+
+    def configurar_host(self, host, retraso=None, concurrencia=None):
+        """Retraso y concurrencia propios de un host (p. ej. Crawl-delay de robots.txt)"""
+        with self.lock:
+            actual = self.configuracion.get(host, (self.retraso, self.concurrencia_host))
+            config = (actual[0] if retraso is None else retraso,
+                      actual[1] if concurrencia is None else concurrencia)
+            self.configuracion[host] = config
+            estado = self.hosts.get(host)
+            if estado:
+                estado.retraso, estado.concurrencia = config
+                self.programar(estado, host)
+                self.hay_cambios.notify_all()
+
+    def put(self, url, profundidad=0, prioridad=0.0, block=True, timeout=None):
+        """Añade una URL; si ya estaba pendiente cuenta un enlace entrante más.
+
+        Devuelve False si la frontera está llena (max_urls) y la URL se descarta.
+        """
+        with self.lock:
+            entrada = self.pendientes.get(url)
+            if entrada is None:
+                if self.max_urls and self.total_pendientes() >= self.max_urls:
+                    self.descartadas += 1
+                    return False
+                # Con la ventana llena (o URLs mejores esperando en disco) va a disco
+                a_disco = self.disco and (len(self.pendientes) >= self.max_memoria or self.disco.pendientes())
+                if not a_disco:
+                    # [profundidad, enlaces, ajuste, puntuación, secuencia vigente]
+                    entrada = [profundidad, 1, prioridad, 0.0, None]
+            else:
+                a_disco = False
+                entrada[0] = min(entrada[0], profundidad)
+                entrada[1] += 1
+                entrada[2] = min(entrada[2], prioridad)
+            if not a_disco:
+                if self.encolar(url, entrada):
+                    self.hay_cambios.notify()
+                return True
+        with self.lock_disco:
+            # cerrar() pudo cerrar la cola mientras tanto
+            if self.disco is None:
+                return False
+            self.disco.agregar(url, profundidad, 1, prioridad)
+        return True
+
+    def encolar(self, url, entrada):
+        """Mete o recoloca una URL en la subcola de su host (con el lock).
+
+        Una URL ya pendiente sólo se vuelve a meter en el heap si su
+        puntuación baja (sube su prioridad); las entradas viejas se
+        descartan al salir o al rehacer el heap cuando pasan de las vivas.
+        """
+        host = self.host_de(url)
+        puntos = puntuacion(entrada[0], entrada[1], entrada[2])
+        nueva = entrada[4] is None
+        if not nueva and puntos >= entrada[3]:
+            return False
+        entrada[3] = puntos
+        entrada[4] = next(self.secuencia)
+        self.pendientes[url] = entrada
+
+        estado = self.hosts.get(host)
+        if estado is None:
+            retraso, concurrencia = self.configuracion.get(
+                host, (self.retraso, self.concurrencia_host))
+            estado = self.hosts[host] = EstadoHost(retraso, concurrencia)
+        if nueva:
+            estado.vivas += 1
+        heapq.heappush(estado.cola, (entrada[3], entrada[4], url))
+        if len(estado.cola) > 2 * estado.vivas + 16:
+            self.rehacer_cola(estado)
+        return self.programar(estado, host)
+
+    def rehacer_cola(self, estado):
+        """Deja en el heap del host sólo las entradas vigentes (con el lock)"""
+        vigentes = []
+        for elemento in estado.cola:
+            entrada = self.pendientes.get(elemento[2])
+            if entrada is not None and entrada[4] == elemento[1]:
+                vigentes.append(elemento)
+        heapq.heapify(vigentes)
+        estado.cola = vigentes
+
+    def leer_adelantado(self):
+        """Trae de disco un lote cuando la ventana baja a la mitad.
+
+        Se llama con el lock; lo suelta mientras lee de SQLite y junta el
+        lote con la ventana al recuperarlo. Sólo lee un hilo cada vez.
+        """
+        if self.leyendo or not self.disco or len(self.pendientes) > self.max_memoria // 2 \
+                or not self.disco.pendientes():
+            return
+        cantidad = min(self.tam_lote, self.max_memoria - len(self.pendientes))
+        self.leyendo = True
+        self.lock.release()
+        try:
+            with self.lock_disco:
+                filas = self.disco.sacar(cantidad) if self.disco else []
+        finally:
+            self.lock.acquire()
+            self.leyendo = False
+            # cerrar() espera a que termine la lectura
+            self.hay_cambios.notify_all()
+        for url, profundidad, enlaces, ajuste in filas:
+            if url in self.en_curso:
+                continue
+            entrada = self.pendientes.get(url)
+            if entrada is None:
+                self.encolar(url, [profundidad, enlaces, ajuste, 0.0, None])
+            else:
+                entrada[0] = min(entrada[0], profundidad)
+                entrada[1] += enlaces
+                entrada[2] = min(entrada[2], ajuste)
+                self.encolar(url, entrada)
+        if filas:
+            self.hay_cambios.notify_all()
+
+    def total_pendientes(self):
+        return len(self.pendientes) + (self.disco.pendientes() if self.disco else 0)
+
+    def programar(self, estado, host):
+        """Mete el host en el heap de listos si puede servir URLs (con el lock)"""
+        if estado.en_heap or not estado.cola or estado.activos >= estado.concurrencia:
+            return False
+        heapq.heappush(self.listos, (estado.listo_en, host))
+        estado.en_heap = True
+        return True
+
+    def siguiente(self, ahora):
+        """URL del primer host listo, o None (con el lock)"""
+        while self.listos and self.listos[0][0] <= ahora:
+            _, host = heapq.heappop(self.listos)
+            estado = self.hosts[host]
+            estado.en_heap = False
+            url = None
+            while estado.cola:
+                _, secuencia, candidata = heapq.heappop(estado.cola)
+                entrada = self.pendientes.get(candidata)
+                if entrada is not None and entrada[4] == secuencia:
+                    url = candidata
+                    break
+            if url is None:
+                if not estado.activos:
+                    del self.hosts[host]
+                continue
+
+            self.en_curso[url] = self.pendientes.pop(url)
+            estado.vivas -= 1
+            estado.activos += 1
+            estado.listo_en = ahora + estado.retraso
+            self.programar(estado, host)
+            return url
+        return None
+
+    def get(self, block=True, timeout=None):
+        """Siguiente URL cuyo host está listo; espera si no hay ninguno (como Queue.get)"""
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            while True:
+                self.leer_adelantado()
+                ahora = time.monotonic()
+                url = self.siguiente(ahora)
+                if url is not None:
+                    return url
+                if not block:
+                    raise Empty
+                espera = self.listos[0][0] - ahora if self.listos else None
+                if limite is not None:
+                    restante = limite - ahora
+                    if restante <= 0:
+                        raise Empty
+                    espera = restante if espera is None else min(espera, restante)
+                self.hay_cambios.wait(espera)
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def espera(self):
+        """Segundos hasta que algún host esté listo (None si no hay ninguno programado)"""
+        with self.lock:
+            if not self.listos:
+                return None
+            return max(self.listos[0][0] - time.monotonic(), 0.0)
+
+    def profundidad(self, url):
+        """Profundidad de una URL entregada por get() y aún sin task_done()"""
+        with self.lock:
+            entrada = self.en_curso.get(url)
+        return entrada[0] if entrada else 0
+
+    def reanudada(self, url):
+        """Si la URL estaba en curso cuando se cerró la frontera y aún no se ha procesado"""
+        return url in self.reanudadas
+
+    def task_done(self, url):
+        """Marca la URL como procesada y libera su plaza en el host"""
+        host = self.host_de(url)
+        with self.lock:
+            self.en_curso.pop(url, None)
+            reanudada = url in self.reanudadas
+            self.reanudadas.discard(url)
+            estado = self.hosts.get(host)
+            if estado is not None:
+                estado.activos -= 1
+                if self.programar(estado, host):
+                    self.hay_cambios.notify()
+                elif not estado.cola and not estado.activos and not estado.en_heap:
+                    # Host inactivo: siguiente() lo borra cuando pase su retraso
+                    heapq.heappush(self.listos, (estado.listo_en, host))
+                    estado.en_heap = True
+        if reanudada:
+            with self.lock_disco:
+                if self.disco:
+                    self.disco.quitar_reanudada(url)
+
+    def qsize(self):
+        return self.total_pendientes()
+
+    def empty(self):
+        return not self.total_pendientes()
+
+    def cerrar(self):
+        """Devuelve al disco la ventana en memoria (y las URLs en curso) para reanudar después"""
+        with self.lock:
+            # Un lote a medio leer de disco tiene que volver a la ventana
+            while self.leyendo:
+                self.hay_cambios.wait()
+            if not self.disco:
+                return
+            with self.lock_disco:
+                for url, entrada in list(self.pendientes.items()) + list(self.en_curso.items()):
+                    self.disco.agregar(url, entrada[0], entrada[1], entrada[2])
+                # Ya están en visited: sin la marca se saltarían al reanudar
+                self.disco.marcar_reanudadas(self.en_curso)
+                self.pendientes.clear()
+                self.hosts.clear()
+                self.listos.clear()
+                self.disco.cerrar()
+                self.disco = None
+
+    def estadisticas(self):
+        with self.lock:
+            ahora = time.monotonic()
+            return {
+                'pendientes': self.total_pendientes(),
+                'en_memoria': len(self.pendientes),
+                'en_disco': self.disco.pendientes() if self.disco else 0,
+                'en_curso': len(self.en_curso),
+                'hosts': len(self.hosts),
+                'hosts_listos': sum(1 for listo_en, _ in self.listos if listo_en <= ahora),
+                'descartadas': self.descartadas
+            }
@@ -1,143 +1,532 @@
 import json
 import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
 from datetime import datetime
-from collections import defaultdict
+from almacenamiento import AlmacenSegmentos
+from cache_consultas import CacheResultados
+from formato_binario import SegmentoBinario
+from ingesta import ColaIngesta
+from postings import ListaArray
+from recuperacion import (MARGEN_COTA, top_k_wand, puntuar_exhaustivo, estimar_total,
+                          idf_bm25, peso_bm25, tokenizar, calcular_frecuencias)
+
+class SegmentoMemoria:
+    """Páginas del WAL todavía no selladas en un segmento binario.
+    
+    Ofrece la misma interfaz de lectura que SegmentoBinario, pero con
+    estructuras mutables: doc_ids[url] -> doc_id, keywords[término] ->
+    (array de doc_id, array de tf) y cotas[término] -> [tf máximo,
+    longitud mínima]. Los doc_id llegan en orden creciente, así que
+    añadir al final mantiene las postings ordenadas.
+    
+    Sólo el escritor lo modifica y nunca reescribe lo ya añadido, así que
+    un lector puede recorrerlo a la vez limitándose a los documentos que
+    había cuando tomó su instantánea.
+    """
+    
+    def __init__(self, base, existe_en_segmentos):
+        self.base = base
+        self.paginas = []
+        self.doc_ids = {}
+        self.keywords = {}
+        self.cotas = {}
+        self.longitudes = array('I')
+        self.longitud_total = 0
+        self.dominios = {}
+        # Términos que no existen en ningún segmento sellado (para contar el vocabulario)
+        self.terminos_nuevos = 0
+        self.existe_en_segmentos = existe_en_segmentos
+    
+    @property
+    def n_docs(self):
+        return len(self.paginas)
+    
+    def aplicar_lote(self, infos):
+        """Aplica un lote de páginas en una sola pasada"""
+        for info in infos:
+            url = info['url']
+            if url in self.doc_ids:
+                continue
+            doc_id = info.get('doc_id', self.base + len(self.paginas))
+            # Los doc_id son densos; un hueco (registro perdido) queda como None
+            while self.base + len(self.paginas) < doc_id:
+                self.paginas.append(None)
+                self.longitudes.append(0)
+            self.paginas.append(info)
+            self.doc_ids[url] = doc_id
+            
+            # Actualizar keywords (postings con frecuencia de término)
+            frecuencias, longitud = calcular_frecuencias(info)
+            for keyword, tf in frecuencias.items():
+                postings = self.keywords.get(keyword)
+                if postings is None:
+                    # La cota antes que la lista: quien ve la lista ya encuentra su cota
+                    self.cotas[keyword] = [tf, longitud]
+                    postings = self.keywords[keyword] = (array('I'), array('I'))
+                    if not self.existe_en_segmentos(keyword):
+                        self.terminos_nuevos += 1
+                postings[0].append(doc_id)
+                postings[1].append(tf)
+                cota = self.cotas[keyword]
+                if tf > cota[0]:
+                    cota[0] = tf
+                if longitud < cota[1]:
+                    cota[1] = longitud
+            self.longitudes.append(longitud)
+            self.longitud_total += longitud
+            
+            entrada = self.dominios.setdefault(info['domain'], [0, info['crawled_date']])
+            entrada[0] += 1
+            entrada[1] = info['crawled_date']
+    
+    def documento(self, doc_id):
+        local = doc_id - self.base
+        if 0 <= local < len(self.paginas):
+            return self.paginas[local]
+        return None
+    
+    def buscar_url(self, url):
+        return self.doc_ids.get(url)
+    
+    def postings(self, termino, limite=None):
+        """Postings del término; con limite, sólo las de los limite primeros documentos"""
+        postings = self.keywords.get(termino)
+        if not postings:
+            return None
+        docs, tfs = postings
+        fin = len(docs) if limite is None else bisect_left(docs, self.base + limite)
+        if not fin:
+            return None
+        # Las cotas sólo crecen, así que una más reciente sigue siendo válida para WAND
+        max_tf, min_longitud = self.cotas[termino]
+        return ListaArray(docs, tfs, fin), max_tf, min_longitud
+
+
+class Instantanea:
+    """Estado del índice que ven los lectores; no cambia una vez publicado.
+    
+    El escritor publica una nueva con una sola asignación después de cada
+    commit, sellado o fusión. Un lector toma la actual al empezar y trabaja
+    sólo con ella: nunca ve un lote a medias ni espera al escritor.
+    """
+    
+    def __init__(self, segmentos, memoria, dominios_segmentos, generacion, stats):
+        self.segmentos = tuple(segmentos)
+        self.bases = [seg.base for seg in self.segmentos]
+        self.memoria = memoria
+        # El segmento en memoria sigue creciendo; esta instantánea sólo ve estos documentos
+        self.n_memoria = memoria.n_docs
+        self.longitud_total = sum(seg.longitud_total for seg in self.segmentos) + memoria.longitud_total
+        self.total_keywords = sum(seg.terminos_nuevos for seg in self.segmentos) + memoria.terminos_nuevos
+        self.dominios_segmentos = dominios_segmentos
+        self.dominios_memoria = {d: tuple(v) for d, v in memoria.dominios.items()}
+        self.generacion = generacion
+        self.stats = dict(stats)
+    
+    def total_docs(self):
+        return self.memoria.base + self.n_memoria
+    
+    def documento(self, doc_id):
+        """Campos guardados de un doc_id (del segmento que lo contiene)"""
+        if doc_id >= self.memoria.base:
+            return self.memoria.documento(doc_id) if doc_id < self.total_docs() else None
+        i = bisect_right(self.bases, doc_id) - 1
+        return self.segmentos[i].documento(doc_id) if i >= 0 else None
+    
+    def buscar_doc_id(self, url):
+        """doc_id de una URL: dict del WAL o tabla hash de cada segmento"""
+        doc_id = self.memoria.buscar_url(url)
+        if doc_id is not None:
+            return doc_id if doc_id < self.total_docs() else None
+        for seg in self.segmentos:
+            doc_id = seg.buscar_url(url)
+            if doc_id is not None:
+                return doc_id
+        return None
+    
+    def postings(self, termino):
+        """[(segmento, postings)] de los segmentos que contienen el término"""
+        partes = []
+        for seg in self.segmentos:
+            postings = seg.postings(termino)
+            if postings:
+                partes.append((seg, postings))
+        postings = self.memoria.postings(termino, self.n_memoria)
+        if postings:
+            partes.append((self.memoria, postings))
+        return partes
+
 
 class Indexador:
-    def __init__(self, json_path='data/index.json'):
+    def __init__(self, json_path='data/index.json', max_wal=1000, max_segmentos=8,
+                 max_buffer=10000, tam_lote=500, intervalo_flush=1.0,
+                 cache_max_bytes=16 * 1024 * 1024, cache_ttl=300):
         self.json_path = json_path
-        self.index_data = self.cargar_index()
+        # Los segmentos viven en data/index/ junto al JSON heredado
+        self.almacen = AlmacenSegmentos(os.path.splitext(json_path)[0],
+                                        max_wal=max_wal, max_segmentos=max_segmentos,
+                                        al_cambiar=self.recargar_segmentos)
+        # Sólo lo toma el escritor; los lectores usan self.instantanea
+        self.lock_escritura = threading.Lock()
+        self.lectores = {}
+        self.segmentos = []
+        self.dominios_segmentos = {}
+        self.stats = {}
+        
+        # Caché de resultados; cada commit incrementa la generación y la invalida
+        self.generacion = 0
+        self.cache = CacheResultados(max_bytes=cache_max_bytes, ttl=cache_ttl)
+        self.cargar_index()
+        
+        # Ingesta por lotes: un solo escritor aplica lo que encolan los productores
+        self.lock_pendientes = threading.Lock()
+        self.pendientes = set()
+        self.ingesta = ColaIngesta(self.confirmar_lote, max_buffer=max_buffer,
+                                   tam_lote=tam_lote, intervalo=intervalo_flush)
     
     def cargar_index(self):
-        """Carga el índice desde JSON"""
-        if os.path.exists(self.json_path):
+        """Abre los segmentos con mmap y reconstruye en memoria sólo el WAL"""
+        migrar = not self.almacen.existe() and os.path.exists(self.json_path)
+        wal = self.almacen.abrir()
+        
+        if migrar:
+            # Primera ejecución con el formato nuevo: convertir el JSON completo
             try:
                 with open(self.json_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return self.crear_estructura_base()
-        return self.crear_estructura_base()
-    
-    def crear_estructura_base(self):
-        """Crea la estructura base del índice"""
-        return {
-            'paginas': [],
-            'keywords': {},
-            'domains': {},
-            'stats': {
-                'total_paginas': 0,
-                'total_keywords': 0,
-                'total_domains': 0,
-                'last_update': None,
-                'created': datetime.now().isoformat()
-            }
+                    legacy = json.load(f)
+                registros = []
+                urls_vistas = set()
+                for info in legacy.get('paginas', []):
+                    if info.get('url') in urls_vistas:
+                        continue
+                    urls_vistas.add(info.get('url'))
+                    registros.append(dict(info, doc_id=len(registros)))
+                self.almacen.importar(registros, legacy.get('stats', {}).get('created'))
+                print(f"📁 Índice migrado a formato binario: {len(registros)} páginas")
+            except Exception as e:
+                print(f"Error migrando {self.json_path}: {e}")
+        
+        self.cargar_lectores()
+        self.memoria = SegmentoMemoria(self.total_segmentos(), self.existe_en_segmentos)
+        self.memoria.aplicar_lote(wal)
+        self.stats = {
+            'created': self.almacen.manifest.get('created'),
+            'last_update': self.almacen.ultima_modificacion() if self.memoria.base + self.memoria.n_docs else None
         }
+        self.publicar()
     
-    def guardar_index(self):
-        """Guarda el índice en JSON"""
-        os.makedirs(os.path.dirname(self.json_path), exist_ok=True)
+    def cargar_lectores(self):
+        """Sincroniza los lectores mmap con los segmentos del manifest"""
+        nombres = self.almacen.segmentos()
+        lectores = {}
+        for nombre in nombres:
+            lectores[nombre] = self.lectores.get(nombre) or SegmentoBinario(self.almacen.ruta(nombre))
         
-        # Actualizar estadísticas
-        self.index_data['stats']['total_paginas'] = len(self.index_data['paginas'])
-        self.index_data['stats']['total_keywords'] = len(self.index_data['keywords'])
-        self.index_data['stats']['total_domains'] = len(self.index_data['domains'])
-        self.index_data['stats']['last_update'] = datetime.now().isoformat()
+        dominios = {}
+        for nombre in nombres:
+            for domain, (paginas, ultimo) in lectores[nombre].dominios.items():
+                entrada = dominios.setdefault(domain, [0, ultimo])
+                entrada[0] += paginas
+                entrada[1] = ultimo
         
-        with open(self.json_path, 'w', encoding='utf-8') as f:
-            json.dump(self.index_data, f, ensure_ascii=False, indent=2)
+        self.lectores = lectores
+        self.dominios_segmentos = dominios
+        self.segmentos = [lectores[n] for n in nombres]
+    
+    def recargar_segmentos(self):
+        """Recarga los segmentos tras una fusión y publica una instantánea nueva"""
+        with self.lock_escritura:
+            self.cargar_lectores()
+            self.publicar()
+    
+    def publicar(self):
+        """Sustituye la instantánea de los lectores por el estado actual (con lock_escritura)"""
+        self.instantanea = Instantanea(self.segmentos, self.memoria, self.dominios_segmentos,
+                                       self.generacion, self.stats)
+    
+    def total_segmentos(self):
+        """Documentos (doc_id) cubiertos por los segmentos sellados"""
+        if not self.segmentos:
+            return 0
+        ultimo = self.segmentos[-1]
+        return ultimo.base + ultimo.n_docs
+    
+    def total_docs(self):
+        return self.instantanea.total_docs()
+    
+    def existe_en_segmentos(self, termino):
+        return any(seg.posicion_termino(termino) >= 0 for seg in self.segmentos)
+    
+    def documento(self, doc_id):
+        """Campos guardados de un doc_id en la instantánea actual"""
+        return self.instantanea.documento(doc_id)
+    
+    def guardar_index(self):
+        """Checkpoint: confirma lo encolado y sella el WAL en un segmento inmutable"""
+        self.flush()
+        with self.lock_escritura:
+            self.sellar_memoria()
+            self.publicar()
+    
+    def sellar_memoria(self):
+        """Convierte el segmento en memoria en un segmento binario (con lock_escritura).
+        
+        No modifica nada que pueda estar leyendo una instantánea publicada:
+        el segmento en memoria se sustituye y los dominios se copian.
+        """
+        nombre = self.almacen.sellar(terminos_nuevos=self.memoria.terminos_nuevos)
+        if nombre is None:
+            return
+        lector = SegmentoBinario(self.almacen.ruta(nombre))
+        self.lectores[nombre] = lector
+        dominios = dict(self.dominios_segmentos)
+        for domain, (paginas, ultimo) in lector.dominios.items():
+            anteriores = dominios.get(domain, (0, ultimo))[0]
+            dominios[domain] = (anteriores + paginas, ultimo)
+        self.dominios_segmentos = dominios
+        self.segmentos = self.segmentos + [lector]
+        self.memoria = SegmentoMemoria(lector.base + lector.n_docs, self.existe_en_segmentos)
     
     def agregar_paginas(self, nuevas_paginas):
-        """Agrega nuevas páginas al índice"""
-        urls_existentes = {p['url'] for p in self.index_data['paginas']}
-        added = 0
-        
-        for url, info in nuevas_paginas.items():
-            if url not in urls_existentes:
-                self.index_data['paginas'].append(info)
-                added += 1
-                
-                # Actualizar dominios
-                domain = info['domain']
-                if domain not in self.index_data['domains']:
-                    self.index_data['domains'][domain] = {
-                        'urls': [],
-                        'pages_count': 0,
-                        'last_crawled': info['crawled_date']
-                    }
-                self.index_data['domains'][domain]['urls'].append(url)
-                self.index_data['domains'][domain]['pages_count'] += 1
-                self.index_data['domains'][domain]['last_crawled'] = info['crawled_date']
-                
-                # Actualizar keywords
-                for keyword in info['keywords']:
-                    if keyword not in self.index_data['keywords']:
-                        self.index_data['keywords'][keyword] = []
-                    if url not in self.index_data['keywords'][keyword]:
-                        self.index_data['keywords'][keyword].append(url)
-        
-        if added > 0:
-            self.guardar_index()
-        
-        return added
-    
-    def buscar(self, query, page=1, per_page=10):
-        """Busca páginas por palabras clave"""
-        palabras = query.lower().split()
-        puntajes = defaultdict(float)
-        
-        if not palabras:
-            return [], 0
+        """Encola nuevas páginas para el escritor; devuelve cuántas se aceptaron.
+        
+        Las páginas quedan visibles en búsquedas tras el siguiente commit
+        (por tamaño de lote o por tiempo); flush() fuerza y espera el commit.
+        """
+        aceptadas = []
+        with self.lock_pendientes:
+            for url, info in nuevas_paginas.items():
+                if url in self.pendientes or self.buscar_doc_id(url) is not None:
+                    continue
+                self.pendientes.add(url)
+                aceptadas.append((url, info))
+        
+        for url, info in aceptadas:
+            self.ingesta.poner(url, info)
+        return len(aceptadas)
+    
+    def confirmar_lote(self, lote):
+        """Commit de un lote: un append al WAL, una pasada sobre el índice y una publicación.
+        
+        Los lectores siguen con la instantánea anterior hasta que el lote
+        está aplicado entero.
+        """
+        with self.lock_escritura:
+            siguiente_id = self.memoria.base + self.memoria.n_docs
+            nuevas = []
+            urls_lote = set()
+            
+            for url, info in lote:
+                if url not in urls_lote and self.buscar_doc_id(url) is None:
+                    urls_lote.add(url)
+                    nuevas.append(dict(info, url=url, doc_id=siguiente_id))
+                    siguiente_id += 1
+            
+            try:
+                if nuevas:
+                    # Primero al WAL: si hay crash después, el replay lo recupera
+                    self.almacen.agregar(nuevas)
+                    self.memoria.aplicar_lote(nuevas)
+                    self.generacion += 1
+                    self.stats['last_update'] = datetime.now().isoformat()
+                    if self.almacen.necesita_sellar():
+                        self.sellar_memoria()
+                    self.publicar()
+            finally:
+                with self.lock_pendientes:
+                    self.pendientes.difference_update(url for url, _ in lote)
+    
+    def flush(self, timeout=None):
+        """Confirma todo lo encolado hasta ahora"""
+        return self.ingesta.flush(timeout)
+    
+    def buscar_doc_id(self, url):
+        return self.instantanea.buscar_doc_id(url)
+    
+    def crear_cursores(self, palabras, instantanea, globales=None):
+        """Un cursor por término y segmento, con idf global y cota BM25 del segmento.
+        
+        globales (de estadisticas_consulta sumadas entre índices) sustituye
+        el número de documentos, la longitud total y los df locales, para
+        que los puntajes de varios shards sean comparables.
         
-        for palabra in palabras:
-            if palabra in self.index_data['keywords']:
-                for url in self.index_data['keywords'][palabra]:
-                    puntajes[url] += 1
+        Devuelve también las listas de doc_id agrupadas por término para
+        contar el total de resultados.
+        """
+        n_docs = instantanea.total_docs()
+        longitud_total = instantanea.longitud_total
+        if globales:
+            n_docs = globales['n_docs']
+            longitud_total = globales['longitud_total']
+        longitud_media = longitud_total / n_docs if n_docs else 0
+        cursores = []
+        grupos = []
+        for palabra in dict.fromkeys(palabras):
+            partes = instantanea.postings(palabra)
+            if not partes:
+                continue
+            df = sum(len(p[0]) for _, p in partes)
+            if globales:
+                df = globales['df'].get(palabra, df)
+            idf = idf_bm25(n_docs, df)
+            grupo = []
+            for seg, (lista, max_tf, min_longitud) in partes:
+                cota = idf * peso_bm25(max_tf, min_longitud, longitud_media) * MARGEN_COTA
+                cursores.append(lista.crear_cursor(idf, cota, seg.longitudes, seg.base))
+                grupo.append(lista)
+            grupos.append(grupo)
+        return cursores, grupos, longitud_media
+    
+    def buscar(self, query, page=1, per_page=10, exhaustivo=False):
+        """Busca páginas por palabras clave, ordenadas por BM25.
+        
+        Por defecto recupera sólo el top page*per_page con poda WAND; el
+        total es exacto con pocas postings y estimado con listas enormes.
+        exhaustivo=True puntúa y ordena todos los documentos.
+        """
+        palabras = tokenizar(query)
+        instantanea = self.instantanea
+        
+        if not palabras or not instantanea.total_docs():
+            return [], 0
         
-        urls_ordenadas = sorted(puntajes.keys(), key=lambda x: puntajes[x], reverse=True)
+        # BM25 no depende del orden ni de repeticiones de los términos
+        clave = (' '.join(sorted(set(palabras))), page, per_page, exhaustivo)
+        cacheado = self.cache.obtener(clave, instantanea.generacion)
+        if cacheado is not None:
+            return cacheado
         
-        total_resultados = len(urls_ordenadas)
         start = (page - 1) * per_page
         end = start + per_page
-        urls_pagina = urls_ordenadas[start:end]
         
+        mejores, total_resultados = self.puntuar(palabras, instantanea, end, exhaustivo)
+        
+        resultados = []
+        for puntaje, doc_id in mejores[start:end]:
+            pagina = instantanea.documento(doc_id)
+            if pagina is not None:
+                resultados.append(self.formatear_resultado(pagina, puntaje))
+        
+        self.cache.guardar(clave, (resultados, total_resultados), instantanea.generacion)
+        return resultados, total_resultados
+    
+    def puntuar(self, palabras, instantanea, k, exhaustivo, globales=None):
+        """([(puntaje, doc_id)] del top k, o de todos con exhaustivo, total de resultados)"""
+        cursores, grupos, longitud_media = self.crear_cursores(palabras, instantanea, globales)
+        if exhaustivo:
+            puntajes = puntuar_exhaustivo(cursores, longitud_media)
+            mejores = sorted(((p, d) for d, p in puntajes.items()), key=lambda x: (-x[0], x[1]))
+            return mejores, len(mejores)
+        return top_k_wand(cursores, k, longitud_media), estimar_total(grupos, instantanea.total_docs())
+    
+    def estadisticas_consulta(self, query):
+        """Documentos, longitud total y df de cada término de la consulta.
+        
+        Primera fase de la búsqueda distribuida: el coordinador suma las
+        de todos los shards y se las pasa a buscar_global.
+        """
+        instantanea = self.instantanea
+        df = {}
+        for palabra in dict.fromkeys(tokenizar(query)):
+            df[palabra] = sum(len(p[0]) for _, p in instantanea.postings(palabra))
+        return {'n_docs': instantanea.total_docs(), 'longitud_total': instantanea.longitud_total, 'df': df}
+    
+    def buscar_global(self, query, k, globales, exhaustivo=False):
+        """Top k con las estadísticas de todos los shards (segunda fase).
+        
+        Devuelve ([(puntaje, doc_id, resultado)], total) con el puntaje sin
+        redondear para que el coordinador pueda mezclar y desempatar.
+        """
+        palabras = tokenizar(query)
+        instantanea = self.instantanea
+        if not palabras or not instantanea.total_docs():
+            return [], 0
+        
+        df = globales['df']
+        clave = ('global', ' '.join(sorted(set(palabras))), k, exhaustivo, globales['n_docs'],
+                 globales['longitud_total'], tuple(sorted(df.items())))
+        cacheado = self.cache.obtener(clave, instantanea.generacion)
+        if cacheado is not None:
+            return cacheado
+        
+        mejores, total_resultados = self.puntuar(palabras, instantanea, k, exhaustivo, globales)
         resultados = []
-        for url in urls_pagina:
-            for pagina in self.index_data['paginas']:
-                if pagina['url'] == url:
-                    resultados.append({
-                        'title': pagina['title'],
-                        'url': pagina['url'],
-                        'description': pagina.get('description', pagina['text_snippet'][:160]),
-                        'domain': pagina['domain'],
-                        'relevance': puntajes[url],
-                        'from_cache': pagina.get('from_cache', False),
-                        'cached_date': pagina.get('cached_date', pagina['crawled_date'])
-                    })
-                    break
+        for puntaje, doc_id in mejores[:k]:
+            pagina = instantanea.documento(doc_id)
+            if pagina is not None:
+                resultados.append((puntaje, doc_id, self.formatear_resultado(pagina, puntaje)))
         
+        self.cache.guardar(clave, (resultados, total_resultados), instantanea.generacion)
         return resultados, total_resultados
     
+    def formatear_resultado(self, pagina, puntaje):
+        """Convierte una página almacenada en un resultado de búsqueda"""
+        return {
+            'title': pagina['title'],
+            'url': pagina['url'],
+            'description': pagina.get('description', pagina['text_snippet'][:160]),
+            'domain': pagina['domain'],
+            'relevance': round(puntaje, 3),
+            'from_cache': pagina.get('from_cache', False),
+            'cached_date': pagina.get('cached_date', pagina['crawled_date'])
+        }
+    
     def obtener_estadisticas(self):
         """Obtiene estadísticas del índice"""
-        return self.index_data['stats']
+        instantanea = self.instantanea
+        dominios_nuevos = sum(1 for d in instantanea.dominios_memoria
+                              if d not in instantanea.dominios_segmentos)
+        stats = {
+            'total_paginas': instantanea.total_docs(),
+            'total_keywords': instantanea.total_keywords,
+            'total_domains': len(instantanea.dominios_segmentos) + dominios_nuevos,
+            'last_update': instantanea.stats.get('last_update'),
+            'created': instantanea.stats.get('created')
+        }
+        stats.update(self.almacen.estadisticas())
+        stats['ingesta'] = self.ingesta.metricas()
+        stats['cache_consultas'] = self.cache.estadisticas()
+        return stats
     
     def limpiar_index(self):
         """Limpia todo el índice"""
-        self.index_data = self.crear_estructura_base()
-        self.guardar_index()
+        self.flush()
+        with self.lock_escritura:
+            self.almacen.limpiar()
+            self.lectores = {}
+            self.segmentos = []
+            self.dominios_segmentos = {}
+            self.memoria = SegmentoMemoria(0, self.existe_en_segmentos)
+            self.generacion += 1
+            self.cache.limpiar()
+            self.stats = {'created': self.almacen.manifest['created'], 'last_update': None}
+            self.publicar()
     
     def obtener_paginas_recientes(self, limit=20):
         """Obtiene las páginas más recientes"""
-        paginas = self.index_data['paginas'][-limit:]
-        return reversed(paginas)
+        instantanea = self.instantanea
+        paginas = []
+        doc_id = instantanea.total_docs() - 1
+        while doc_id >= 0 and len(paginas) < limit:
+            pagina = instantanea.documento(doc_id)
+            if pagina is not None:
+                paginas.append(pagina)
+            doc_id -= 1
+        return paginas
     
     def obtener_domains(self):
         """Obtiene todos los dominios indexados"""
-        return self.index_data['domains']
+        instantanea = self.instantanea
+        dominios = {}
+        for fuente in (instantanea.dominios_segmentos, instantanea.dominios_memoria):
+            for domain, (paginas, ultimo) in fuente.items():
+                entrada = dominios.setdefault(domain, {'pages_count': 0, 'last_crawled': ultimo})
+                entrada['pages_count'] += paginas
+                entrada['last_crawled'] = ultimo
+        return dominios
     
     def url_esta_indexada(self, url):
-        """Verifica si una URL ya está indexada"""
-        for pagina in self.index_data['paginas']:
-            if pagina['url'] == url:
-                return True
-        return False
+        """Verifica si una URL ya está indexada (o encolada para indexar)"""
+        return url in self.pendientes or self.buscar_doc_id(url) is not None
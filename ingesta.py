@@ -0,0 +1,134 @@
+import atexit
+import threading
+import time
+from queue import Queue, Empty
+
+
+class ColaIngesta:
+    """Buffer acotado de páginas con un único escritor (group commit).
+
+    Muchos productores (hilos del crawler, tareas de Flask) llaman a
+    poner(); un hilo escritor junta lo que llega y llama a commit(lote)
+    cuando el lote alcanza tam_lote o pasan `intervalo` segundos desde su
+    primer elemento. Si el buffer se llena, poner() bloquea (backpressure).
+    """
+
+    def __init__(self, commit, max_buffer=10000, tam_lote=500, intervalo=1.0):
+        self.commit = commit
+        self.cola = Queue(maxsize=max_buffer)
+        self.tam_lote = tam_lote
+        self.intervalo = intervalo
+        self.activo = True
+
+        # Métricas
+        self.lock_metricas = threading.Lock()
+        self.commits = 0
+        self.paginas_commit = 0
+        self.latencia_total = 0.0
+        self.latencia_max = 0.0
+        self.latencia_ultima = 0.0
+        self.errores = 0
+
+        self.hilo = threading.Thread(target=self.ejecutar)
+        self.hilo.daemon = True
+        self.hilo.start()
+        atexit.register(self.cerrar)
+
+    def poner(self, url, info):
+        """Encola una página; bloquea si el buffer está lleno"""
+        self.cola.put((url, info))
+
+    def flush(self, timeout=None):
+        """Espera a que todo lo encolado hasta ahora esté confirmado"""
+        if not self.hilo.is_alive():
+            self.vaciar()
+            return True
+        marca = threading.Event()
+        self.cola.put(marca)
+        return marca.wait(timeout)
+
+    def ejecutar(self):
+        """Bucle del escritor"""
+        while self.activo:
+            try:
+                item = self.cola.get(timeout=self.intervalo)
+            except Empty:
+                continue
+
+            lote = []
+            marcas = []
+            self.clasificar(item, lote, marcas)
+            limite = time.time() + self.intervalo
+
+            # Juntar más páginas hasta llenar el lote, agotar el tiempo o recibir un flush
+            while len(lote) < self.tam_lote and not marcas:
+                restante = limite - time.time()
+                if restante <= 0:
+                    break
+                try:
+                    item = self.cola.get(timeout=restante)
+                except Empty:
+                    break
+                self.clasificar(item, lote, marcas)
+
+            self.confirmar(lote)
+            for marca in marcas:
+                marca.set()
+
+    def clasificar(self, item, lote, marcas):
+        if isinstance(item, threading.Event):
+            marcas.append(item)
+        else:
+            lote.append(item)
+
+    def confirmar(self, lote):
+        """Aplica un lote y registra la latencia del commit"""
+        if not lote:
+            return
+        inicio = time.time()
+        try:
+            self.commit(lote)
+        except Exception as e:
+            self.errores += 1
+            print(f"Error confirmando lote de {len(lote)} páginas: {e}")
+            return
+        latencia = time.time() - inicio
+        with self.lock_metricas:
+            self.commits += 1
+            self.paginas_commit += len(lote)
+            self.latencia_total += latencia
+            self.latencia_ultima = latencia
+            self.latencia_max = max(self.latencia_max, latencia)
+
+    def vaciar(self):
+        """Confirma en el hilo actual todo lo que quede en la cola"""
+        lote = []
+        marcas = []
+        while True:
+            try:
+                self.clasificar(self.cola.get_nowait(), lote, marcas)
+            except Empty:
+                break
+        self.confirmar(lote)
+        for marca in marcas:
+            marca.set()
+
+    def cerrar(self):
+        """Detiene el escritor confirmando lo pendiente"""
+        if self.activo:
+            self.flush(timeout=30)
+            self.activo = False
+
+    def metricas(self):
+        with self.lock_metricas:
+            return {
+                'profundidad_cola': self.cola.qsize(),
+                'capacidad_cola': self.cola.maxsize,
+                'commits': self.commits,
+                'paginas_confirmadas': self.paginas_commit,
+                'lote_medio': round(self.paginas_commit / self.commits, 1) if self.commits else 0,
+                'latencia_commit_ms': round(self.latencia_ultima * 1000, 2),
+                'latencia_media_ms': round(self.latencia_total / self.commits * 1000, 2) if self.commits else 0,
+                'latencia_max_ms': round(self.latencia_max * 1000, 2),
+                'errores': self.errores
+            }
@@ -0,0 +1,276 @@
+"""Listas de postings comprimidas por bloques.
+
+Cada lista (doc_ids crecientes + tf) se parte en bloques de TAM_BLOQUE
+postings. Por bloque se guardan en la tabla de saltos el primer y el
+último doc_id, el offset de sus datos y las cotas del bloque para WAND:
+tf máximo, longitud de documento mínima y el mayor peso BM25 del bloque
+con la longitud media del segmento. Los datos son un byte de cabecera
+con el ancho elegido (1, 2 o 4 bytes) para los deltas de doc_id y para
+los tf, seguido de los deltas (sin el primero, que está en la tabla de
+saltos) y los tf empaquetados con ese ancho fijo.
+
+Los bloques se decodifican bajo demanda con array.frombytes +
+itertools.accumulate (en C), y saltar_a() usa la tabla de saltos para no
+tocar los bloques que WAND descarta. cota_bloque() da la cota BM25 del
+bloque donde caería un doc_id sin decodificarlo, para que top_k_wand se
+salte bloques enteros que no pueden superar el umbral.
+
+peso(max_tf, min_len) sola es una cota floja (el tf máximo y la longitud
+mínima suelen ser de documentos distintos), así que se guarda también el
+peso exacto del mejor posting con la longitud media m_s del segmento.
+Con otra media m el denominador de BM25 cambia como mucho en m / m_s, así
+que peso_max * max(1, m / m_s) sigue siendo una cota válida.
+"""
+
+from array import array
+from bisect import bisect_left
+from itertools import accumulate, islice
+
+from recuperacion import MARGEN_COTA, CursorPostings, peso_bm25, puntuar_tramo
+
+TAM_BLOQUE = 128
+
+# Código de ancho en la cabecera -> typecode de array
+TIPOS = ('B', 'H', 'I')
+ANCHOS = tuple(array(t).itemsize for t in TIPOS)
+
+
+def codigo_ancho(maximo):
+    if maximo < 1 << 8:
+        return 0
+    if maximo < 1 << 16:
+        return 1
+    return 2
+
+
+def codificar_lista(docs, tfs, longitudes, longitud_media):
+    """Codifica una lista de postings; devuelve (primeros, ultimos, offsets,
+    max_tfs, min_lens, max_pesos, datos).
+
+    longitudes es la longitud del documento de cada posting y
+    longitud_media la del segmento. Los offsets son relativos al inicio
+    de datos.
+    """
+    primeros = array('I')
+    ultimos = array('I')
+    offsets = array('Q')
+    max_tfs = array('I')
+    min_lens = array('I')
+    max_pesos = array('d')
+    datos = bytearray()
+    for inicio in range(0, len(docs), TAM_BLOQUE):
+        bloque_docs = docs[inicio:inicio + TAM_BLOQUE]
+        bloque_tfs = tfs[inicio:inicio + TAM_BLOQUE]
+        bloque_longitudes = longitudes[inicio:inicio + TAM_BLOQUE]
+        deltas = [b - a for a, b in zip(bloque_docs, bloque_docs[1:])]
+        cod_docs = codigo_ancho(max(deltas, default=0))
+        cod_tfs = codigo_ancho(max(bloque_tfs))
+
+        primeros.append(bloque_docs[0])
+        ultimos.append(bloque_docs[-1])
+        offsets.append(len(datos))
+        max_tfs.append(max(bloque_tfs))
+        min_lens.append(min(bloque_longitudes))
+        max_pesos.append(max(peso_bm25(tf, longitud, longitud_media)
+                             for tf, longitud in zip(bloque_tfs, bloque_longitudes)))
+        datos.append(cod_docs << 4 | cod_tfs)
+        datos += array(TIPOS[cod_docs], deltas).tobytes()
+        datos += array(TIPOS[cod_tfs], bloque_tfs).tobytes()
+    return primeros, ultimos, offsets, max_tfs, min_lens, max_pesos, bytes(datos)
+
+
+class ListaArray:
+    """Postings sin comprimir en arrays paralelos, opcionalmente limitadas a las fin primeras"""
+
+    def __init__(self, docs, tfs, fin=None):
+        self.docs = docs
+        self.tfs = tfs
+        self.fin = len(docs) if fin is None else fin
+
+    def __len__(self):
+        return self.fin
+
+    def __iter__(self):
+        return islice(self.docs, self.fin)
+
+    def completa(self):
+        """(docs, tfs) de toda la lista"""
+        return list(islice(self.docs, self.fin)), list(islice(self.tfs, self.fin))
+
+    def crear_cursor(self, idf, cota, longitudes, base):
+        return CursorPostings(self.docs, self.tfs, idf, cota, longitudes, base, self.fin)
+
+
+class ListaBloques:
+    """Postings comprimidas de un término dentro de un segmento mmap.
+
+    max_tfs, min_lens y max_pesos son las cotas por bloque y
+    longitud_segmento la media con la que se calcularon los pesos; los
+    segmentos de la versión 2 no las tienen y todos los bloques usan la
+    cota del término.
+    """
+
+    def __init__(self, datos, primeros, ultimos, offsets, df,
+                 max_tfs=None, min_lens=None, max_pesos=None, longitud_segmento=None):
+        self.datos = datos
+        self.primeros = primeros
+        self.ultimos = ultimos
+        self.offsets = offsets
+        self.df = df
+        self.max_tfs = max_tfs
+        self.min_lens = min_lens
+        self.max_pesos = max_pesos
+        self.longitud_segmento = longitud_segmento
+
+    def __len__(self):
+        return self.df
+
+    def __iter__(self):
+        for b in range(len(self.primeros)):
+            yield from self.decodificar(b)[0]
+
+    def completa(self):
+        """(docs, tfs) de toda la lista, decodificando todos los bloques"""
+        docs = []
+        tfs = []
+        for b in range(len(self.primeros)):
+            docs_bloque, tfs_bloque = self.decodificar(b)
+            docs += docs_bloque
+            tfs += tfs_bloque
+        return docs, tfs
+
+    def decodificar(self, b):
+        """(docs, tfs) del bloque b"""
+        n = min(TAM_BLOQUE, self.df - b * TAM_BLOQUE)
+        offset = self.offsets[b]
+        cabecera = self.datos[offset]
+        tipo_docs, tipo_tfs = TIPOS[cabecera >> 4], TIPOS[cabecera & 0x0f]
+        inicio = offset + 1
+        fin = inicio + (n - 1) * ANCHOS[cabecera >> 4]
+
+        deltas = array(tipo_docs)
+        deltas.frombytes(self.datos[inicio:fin])
+        tfs = array(tipo_tfs)
+        tfs.frombytes(self.datos[fin:fin + n * ANCHOS[cabecera & 0x0f]])
+        return list(accumulate(deltas, initial=self.primeros[b])), tfs
+
+    def crear_cursor(self, idf, cota, longitudes, base):
+        return CursorBloques(self, idf, cota, longitudes, base)
+
+
+class CursorBloques:
+    """Cursor con la misma interfaz que CursorPostings que descomprime bloque a bloque.
+
+    Al entrar en un bloque el documento actual es su primer doc_id, que
+    está en la tabla de saltos: el bloque sólo se decodifica cuando hace
+    falta un tf o un posting posterior, así que los bloques que WAND
+    salta enteros nunca se descomprimen.
+    """
+
+    def __init__(self, lista, idf, cota, longitudes, base):
+        self.lista = lista
+        self.idf = idf
+        self.cota = cota
+        self.longitudes = longitudes
+        self.base = base
+        self.n_bloques = len(lista.primeros)
+        # Cota BM25 de cada bloque, calculada la primera vez que se pide
+        self.cotas = None
+        self.escala = 1.0
+        self.cargar(0)
+
+    def cargar(self, b):
+        """Se coloca al principio del bloque b sin decodificarlo"""
+        self.bloque = b
+        self.pos = 0
+        self.docs = self.tfs = None
+        if b < self.n_bloques:
+            self.fin = min(TAM_BLOQUE, self.lista.df - b * TAM_BLOQUE)
+            self.doc = self.lista.primeros[b]
+        else:
+            self.fin = 0
+            self.doc = None
+
+    def decodificar(self):
+        self.docs, self.tfs = self.lista.decodificar(self.bloque)
+
+    def puntaje(self, longitud_media):
+        if self.docs is None:
+            self.decodificar()
+        return self.idf * peso_bm25(self.tfs[self.pos], self.longitudes[self.doc - self.base], longitud_media)
+
+    def avanzar(self):
+        self.pos += 1
+        if self.pos >= self.fin:
+            if self.bloque < self.n_bloques:
+                self.cargar(self.bloque + 1)
+            return
+        if self.docs is None:
+            self.decodificar()
+        self.doc = self.docs[self.pos]
+
+    def puntuar_hasta(self, limite, longitud_media):
+        """Puntajes de los postings del bloque actual con doc < limite; el cursor queda en el siguiente"""
+        if self.docs is None:
+            self.decodificar()
+        fin = bisect_left(self.docs, limite, self.pos, self.fin)
+        puntajes = puntuar_tramo(self.docs[self.pos:fin], self.tfs[self.pos:fin], self.idf,
+                                 self.longitudes, self.base, longitud_media)
+        if fin >= self.fin:
+            self.cargar(self.bloque + 1)
+        else:
+            self.pos = fin
+            self.doc = self.docs[fin]
+        return puntajes
+
+    def saltar_a(self, doc_id):
+        """Avanza hasta el primer posting con doc >= doc_id sin decodificar bloques intermedios"""
+        if self.doc is None or self.doc >= doc_id:
+            return
+        if self.lista.ultimos[self.bloque] < doc_id:
+            self.cargar(bisect_left(self.lista.ultimos, doc_id, self.bloque + 1, self.n_bloques))
+            if self.doc is None or self.doc >= doc_id:
+                return
+        # doc_id cae dentro del bloque actual
+        if self.docs is None:
+            self.decodificar()
+        self.pos = bisect_left(self.docs, doc_id, self.pos, self.fin)
+        self.doc = self.docs[self.pos]
+
+    def cota_bloque(self, doc_id, longitud_media):
+        """(cota, último doc_id) del bloque que contendría doc_id, sin decodificarlo.
+
+        Ningún documento del cursor entre doc_id y ese último doc_id puede
+        puntuar más que la cota. doc_id no puede ser menor que doc.
+        """
+        b = self.bloque
+        if self.lista.ultimos[b] < doc_id:
+            b = bisect_left(self.lista.ultimos, doc_id, b + 1, self.n_bloques)
+            if b == self.n_bloques:
+                # No quedan postings desde doc_id
+                return 0.0, doc_id
+        return self.cota_de(b, longitud_media), self.lista.ultimos[b]
+
+    def cota_de(self, b, longitud_media):
+        if self.lista.max_tfs is None:
+            return self.cota
+        if self.cotas is None:
+            self.cotas = [None] * self.n_bloques
+            # Los pesos guardados usan la media del segmento (ver el docstring del módulo)
+            self.escala = max(1.0, longitud_media / self.lista.longitud_segmento)
+        cota = self.cotas[b]
+        if cota is None:
+            peso = min(peso_bm25(self.lista.max_tfs[b], self.lista.min_lens[b], longitud_media),
+                       self.lista.max_pesos[b] * self.escala)
+            cota = self.cotas[b] = min(self.cota, self.idf * peso * MARGEN_COTA)
+        return cota
+
+    def saltar_bloques(self, umbral, limite, longitud_media):
+        """Salta el bloque actual y los siguientes cuya cota no supera el umbral, sin pasar de limite"""
+        b = self.bloque
+        ultimos = self.lista.ultimos
+        while b + 1 < self.n_bloques and (limite is None or ultimos[b] + 1 < limite) and \
+                self.cota_de(b + 1, longitud_media) <= umbral:
+            b += 1
+        destino = ultimos[b] + 1
+        self.saltar_a(destino if limite is None else min(destino, limite))
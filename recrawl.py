@@ -0,0 +1,293 @@
+"""Planificador de revisitas según la frecuencia de cambio de cada página.
+
+Con un caducado fijo de DIAS_CACHE días una portada de noticias pasa
+semanas desactualizada y una página de documentación estática se vuelve
+a descargar sin haber cambiado. PlanificadorRecrawl guarda en SQLite,
+junto al caché, una huella del contenido de cada descarga (el SimHash
+del texto o, si es demasiado corto, el hash del cuerpo) y cuenta en
+cuántas visitas había cambiado. Un 304 cuenta como visita sin cambios.
+
+Tasa de cambio: con n comparaciones separadas I días de media y X de
+ellas con cambios, el estimador de Cho y Garcia-Molina para cambios de
+Poisson es
+
+    tasa = -ln((n - X + 0.5) / (n + 0.5)) / I
+
+que, a diferencia de X / (n I), no se queda corto cuando hubo cambios en
+todas las visitas (varios cambios entre dos visitas cuentan como uno).
+
+Intervalo de revisita: con presupuesto visitas al día para todas las
+páginas, la frecuencia que maximiza la frescura media (fracción del
+tiempo en que la copia coincide con la página) cumple para cada página
+
+    1 - (1 + r) e^-r = mu * tasa,    r = tasa / frecuencia
+
+con el mismo multiplicador mu para todas. recalcular() busca mu por
+bisección sobre un histograma de tasas (SQL GROUP BY por cubetas de un
+cuarto de octava), así que cuesta lo mismo con cien páginas que con un
+millón. Las páginas que cambian tan deprisa que no compensa seguirlas
+(mu * tasa >= 1) y las que casi no cambian quedan entre INTERVALO_MINIMO
+e INTERVALO_MAXIMO. El intervalo nuevo se aplica en la siguiente visita
+de cada página.
+
+siguiente(clave) es la fecha hasta la que el caché vale para esa URL, y
+vencidas() da las URLs cuya revisita ya toca, repartidas a lo largo del
+día por un cubo de fichas con el presupuesto.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+
+from duplicados import DISTANCIA, distancia
+
+DIA = 86400.0
+# Cambios por día supuestos para una página visitada una sola vez
+TASA_INICIAL = 1 / 7
+# Tasa mínima: sin cambios observados el estimador daría 0
+TASA_MINIMA = 1 / 365
+INTERVALO_MINIMO = 1 / 24
+INTERVALO_MAXIMO = 90.0
+# Días hasta volver a encolar una revisita que no llegó a completarse
+REINTENTO = 1.0
+# Cubetas por octava del histograma de tasas
+CUBETAS_OCTAVA = 4
+# Segundos entre recálculos del multiplicador
+RECALCULO = 600
+
+ESQUEMA = '''
+    CREATE TABLE IF NOT EXISTS visitas (
+        clave TEXT PRIMARY KEY,
+        url TEXT NOT NULL,
+        huella TEXT NOT NULL,
+        primera REAL NOT NULL,
+        ultima REAL NOT NULL,
+        comparaciones INTEGER NOT NULL DEFAULT 0,
+        cambios INTEGER NOT NULL DEFAULT 0,
+        tasa REAL NOT NULL,
+        cubeta INTEGER NOT NULL,
+        siguiente REAL NOT NULL,
+        reintento REAL NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS visitas_siguiente ON visitas (siguiente);
+'''
+
+# h(r) = 1 - (1 + r) e^-r tabulada para invertirla con bisect
+TABLA_R = [10 ** (-4 + k * 6 / 2000) for k in range(2001)]
+TABLA_H = [1 - (1 + r) * math.exp(-r) for r in TABLA_R]
+
+
+def estimar_tasa(comparaciones, cambios, dias):
+    """Cambios por día a partir de las visitas (estimador de Cho y Garcia-Molina)"""
+    if comparaciones == 0 or dias <= 0:
+        return TASA_INICIAL
+    intervalo = dias / comparaciones
+    return max(-math.log((comparaciones - cambios + 0.5) / (comparaciones + 0.5)) / intervalo, TASA_MINIMA)
+
+
+def inversa_h(x):
+    """r con 1 - (1 + r) e^-r = x, para 0 <= x < 1"""
+    if x <= TABLA_H[0]:
+        # h(r) ~ r^2 / 2 cerca de 0
+        return math.sqrt(2 * x)
+    i = bisect_left(TABLA_H, x)
+    if i >= len(TABLA_H):
+        return TABLA_R[-1]
+    h0, h1 = TABLA_H[i - 1], TABLA_H[i]
+    return TABLA_R[i - 1] + (TABLA_R[i] - TABLA_R[i - 1]) * (x - h0) / (h1 - h0)
+
+
+def frecuencia(tasa, mu):
+    """Visitas por día de una página con esa tasa de cambio para el multiplicador mu"""
+    if mu is None:
+        # Sin histograma aún: una visita por cambio esperado
+        visitas = tasa
+    elif mu * tasa >= 1:
+        visitas = 0.0
+    else:
+        visitas = tasa / max(inversa_h(mu * tasa), 1e-12)
+    return min(max(visitas, 1 / INTERVALO_MAXIMO), 1 / INTERVALO_MINIMO)
+
+
+def frescura(tasa, frecuencia):
+    """Fracción esperada del tiempo en que la copia está al día"""
+    r = tasa / frecuencia
+    return (1 - math.exp(-r)) / r
+
+
+def cubeta(tasa):
+    return round(math.log2(tasa) * CUBETAS_OCTAVA)
+
+
+def huella_distinta(a, b):
+    """Si dos huellas indican un cambio: las SimHash ('s:') toleran DISTANCIA bits
+    (fechas, contadores), los hashes del cuerpo ('c:') tienen que ser iguales"""
+    if a[:2] != b[:2]:
+        return True
+    if a.startswith('s:'):
+        return distancia(int(a[2:], 16), int(b[2:], 16)) > DISTANCIA
+    return a != b
+
+
+class PlanificadorRecrawl:
+    def __init__(self, ruta, presupuesto=1000):
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self.ruta = ruta
+        # Revisitas al día entre todas las páginas
+        self.presupuesto = presupuesto
+        self.lock = threading.Lock()
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self.conexion.execute('PRAGMA journal_mode=WAL')
+        self.conexion.execute('PRAGMA synchronous=NORMAL')
+        self.conexion.executescript(ESQUEMA)
+        self.mu = None
+        self.frescura_esperada = None
+        self.planificadas_dia = 0.0
+        self.recalculado = 0.0
+        # Cubo de fichas de vencidas(): revisitas que se pueden encolar ya
+        self.fichas = 0.0
+        self.ultimo_cupo = time.time()
+        self.visitas = 0
+        self.cambios = 0
+        self.encoladas = 0
+        self.recalcular()
+
+    def recalcular(self):
+        """Busca el multiplicador mu que reparte el presupuesto entre las tasas observadas"""
+        with self.lock:
+            filas = self.conexion.execute('SELECT cubeta, COUNT(*) FROM visitas GROUP BY cubeta').fetchall()
+            self.recalculado = time.time()
+        cubetas = [(2 ** (c / CUBETAS_OCTAVA), n) for c, n in filas]
+        if not cubetas:
+            return None
+
+        def visitas_dia(mu):
+            return sum(n * frecuencia(tasa, mu) for tasa, n in cubetas)
+
+        # visitas_dia decrece con mu: en alto todas quedan en INTERVALO_MAXIMO
+        bajo, alto = 1e-9, 1 / min(tasa for tasa, _ in cubetas)
+        if visitas_dia(alto) >= self.presupuesto:
+            mu = alto
+        elif visitas_dia(bajo) <= self.presupuesto:
+            mu = bajo
+        else:
+            for _ in range(60):
+                medio = math.sqrt(bajo * alto)
+                if visitas_dia(medio) > self.presupuesto:
+                    bajo = medio
+                else:
+                    alto = medio
+            mu = alto
+        total = sum(n for _, n in cubetas)
+        self.mu = mu
+        self.planificadas_dia = visitas_dia(mu)
+        self.frescura_esperada = sum(n * frescura(tasa, frecuencia(tasa, mu)) for tasa, n in cubetas) / total
+        return mu
+
+    def registrar(self, clave, url, huella=None, ahora=None):
+        """Anota una visita; huella None es una revisita sin cambios (304).
+        Devuelve si la página había cambiado"""
+        ahora = ahora or time.time()
+        if self.mu is None or self.recalculado < ahora - RECALCULO:
+            self.recalcular()
+        with self.lock:
+            fila = self.conexion.execute(
+                'SELECT huella, primera, comparaciones, cambios FROM visitas WHERE clave = ?', (clave,)).fetchone()
+            if fila is None:
+                if huella is None:
+                    return False
+                anterior, primera, comparaciones, cambios = huella, ahora, 0, 0
+                cambio = False
+            else:
+                anterior, primera, comparaciones, cambios = fila
+                cambio = huella is not None and huella_distinta(anterior, huella)
+                comparaciones += 1
+                cambios += cambio
+            tasa = estimar_tasa(comparaciones, cambios, (ahora - primera) / DIA)
+            siguiente = ahora + DIA / frecuencia(tasa, self.mu)
+            with self.conexion:
+                self.conexion.execute(
+                    'INSERT INTO visitas (clave, url, huella, primera, ultima, comparaciones, cambios, '
+                    'tasa, cubeta, siguiente, reintento) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0) '
+                    'ON CONFLICT (clave) DO UPDATE SET url = excluded.url, huella = excluded.huella, '
+                    'ultima = excluded.ultima, comparaciones = excluded.comparaciones, '
+                    'cambios = excluded.cambios, tasa = excluded.tasa, cubeta = excluded.cubeta, '
+                    'siguiente = excluded.siguiente, reintento = 0',
+                    (clave, url, huella or anterior, primera, ahora, comparaciones, cambios,
+                     tasa, cubeta(tasa), siguiente))
+            self.visitas += 1
+            self.cambios += cambio
+            return cambio
+
+    def siguiente(self, clave):
+        """Fecha (time.time()) de la próxima revisita de la URL, o None si no se ha visto"""
+        with self.lock:
+            fila = self.conexion.execute('SELECT siguiente FROM visitas WHERE clave = ?', (clave,)).fetchone()
+        return fila[0] if fila else None
+
+    def vigentes(self, claves, ahora=None):
+        """Las claves cuya revisita aún no toca"""
+        ahora = ahora or time.time()
+        vigentes = set()
+        with self.lock:
+            for inicio in range(0, len(claves), 500):
+                lote = claves[inicio:inicio + 500]
+                vigentes.update(fila[0] for fila in self.conexion.execute(
+                    f'SELECT clave FROM visitas WHERE siguiente > ? AND clave IN ({", ".join("?" * len(lote))})',
+                    [ahora] + list(lote)))
+        return vigentes
+
+    def cupo(self, ahora):
+        """Revisitas que el presupuesto permite encolar desde la última llamada
+        (como mucho una hora de presupuesto acumulado)"""
+        self.fichas = min(self.fichas + self.presupuesto * (ahora - self.ultimo_cupo) / DIA,
+                          max(self.presupuesto / 24, 1))
+        self.ultimo_cupo = ahora
+        cupo = int(self.fichas)
+        self.fichas -= cupo
+        return cupo
+
+    def vencidas(self, ahora=None):
+        """URLs cuya revisita toca, de la más atrasada a la menos, dentro del cupo.
+        No se vuelven a dar hasta REINTENTO días después si no se registra la visita"""
+        ahora = ahora or time.time()
+        if self.mu is None or self.recalculado < ahora - RECALCULO:
+            self.recalcular()
+        with self.lock:
+            cupo = self.cupo(ahora)
+            if not cupo:
+                return []
+            filas = self.conexion.execute(
+                'SELECT clave, url FROM visitas WHERE siguiente <= ? AND reintento <= ? '
+                'ORDER BY siguiente LIMIT ?', (ahora, ahora, cupo)).fetchall()
+            with self.conexion:
+                self.conexion.executemany('UPDATE visitas SET reintento = ? WHERE clave = ?',
+                                          [(ahora + REINTENTO * DIA, clave) for clave, _ in filas])
+            self.encoladas += len(filas)
+        return [url for _, url in filas]
+
+    def estadisticas(self):
+        ahora = time.time()
+        with self.lock:
+            seguidas, vencidas, tasa_media = self.conexion.execute(
+                'SELECT COUNT(*), COALESCE(SUM(siguiente <= ?), 0), AVG(tasa) FROM visitas', (ahora,)).fetchone()
+        return {
+            'tracked': seguidas,
+            'due': vencidas,
+            'budget_per_day': self.presupuesto,
+            'scheduled_per_day': round(self.planificadas_dia, 1),
+            'expected_freshness': round(self.frescura_esperada, 4) if self.frescura_esperada is not None else None,
+            'mean_changes_per_day': round(tasa_media, 4) if tasa_media is not None else None,
+            'visits': self.visitas,
+            'changes_detected': self.cambios,
+            'revisits_queued': self.encoladas
+        }
+
+    def cerrar(self):
+        with self.lock:
+            self.conexion.close()
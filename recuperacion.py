@@ -0,0 +1,250 @@
+import heapq
+import math
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import repeat
+
+# Parámetros BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Margen mínimo para que el redondeo no deje una cota por debajo del puntaje real
+MARGEN_COTA = 1 + 1e-9
+
+# Por encima de esta suma de df el total de resultados se estima en vez de
+# contarse: la unión exacta decodifica todas las postings en cada consulta
+LIMITE_CONTEO_EXACTO = 5000
+
+# Un término es una racha de letras y dígitos (lo que acepta str.isalnum)
+TERMINO = re.compile(r'[^\W_]+')
+
+
+def tokenizar(texto):
+    """Términos en minúsculas de un texto; la puntuación separa y no cuenta
+    ('python,' y 'python.' son 'python'). Igual en consultas e indexación"""
+    return TERMINO.findall(texto.lower()) if texto else []
+
+
+def calcular_frecuencias(info):
+    """Frecuencia de cada keyword en el texto de la página y longitud del documento.
+
+    Sólo se indexan las keywords que eligió el crawler; el texto visible
+    (título, descripción y snippet) aporta las repeticiones.
+    """
+    tokens = tokenizar(info.get('title', '')) + \
+             tokenizar(info.get('description', '')) + \
+             tokenizar(info.get('text_snippet', ''))
+    conteo = defaultdict(int)
+    for token in tokens:
+        conteo[token] += 1
+
+    frecuencias = {}
+    for keyword in info['keywords']:
+        keyword = keyword.lower()
+        # +1 por aparecer en la lista de keywords
+        frecuencias[keyword] = conteo.get(keyword, 0) + 1
+    return frecuencias, max(len(tokens), 1)
+
+
+def idf_bm25(n_docs, df):
+    """IDF de BM25 (siempre positivo)"""
+    return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+
+def peso_bm25(tf, longitud, longitud_media):
+    """Componente de frecuencia de BM25 (sin el idf)"""
+    norma = BM25_K1 * (1 - BM25_B + BM25_B * longitud / longitud_media)
+    return tf * (BM25_K1 + 1) / (tf + norma)
+
+
+def puntuar_tramo(docs, tfs, idf, longitudes, base, longitud_media):
+    """[(puntaje, doc_id)] BM25 de un tramo de postings de un término"""
+    pesos = map(peso_bm25, tfs, [longitudes[doc - base] for doc in docs], repeat(longitud_media))
+    return [(idf * peso, doc) for peso, doc in zip(pesos, docs)]
+
+
+class CursorPostings:
+    """Recorre la lista de postings de un término dentro de un segmento.
+
+    docs y tfs son secuencias paralelas ordenadas por doc_id (listas,
+    arrays o memoryviews sobre un mmap); longitudes es la tabla de
+    longitudes del segmento, indexada por doc_id - base. cota es el máximo
+    puntaje que puede aportar el término a cualquier documento (para WAND).
+    fin limita el recorrido a un prefijo de las listas (las del segmento
+    en memoria pueden seguir creciendo mientras se leen).
+    """
+
+    def __init__(self, docs, tfs, idf, cota, longitudes, base, fin=None):
+        self.docs = docs
+        self.tfs = tfs
+        self.idf = idf
+        self.cota = cota
+        self.longitudes = longitudes
+        self.base = base
+        self.pos = 0
+        self.fin = len(docs) if fin is None else fin
+
+    @property
+    def doc(self):
+        return self.docs[self.pos] if self.pos < self.fin else None
+
+    def puntaje(self, longitud_media):
+        """Puntaje BM25 del término para el documento actual"""
+        doc = self.docs[self.pos]
+        return self.idf * peso_bm25(self.tfs[self.pos], self.longitudes[doc - self.base], longitud_media)
+
+    def avanzar(self):
+        self.pos += 1
+
+    def saltar_a(self, doc_id):
+        """Avanza hasta el primer posting con doc >= doc_id"""
+        if self.pos < self.fin and self.docs[self.pos] < doc_id:
+            self.pos = bisect_left(self.docs, doc_id, self.pos + 1, self.fin)
+
+    def puntuar_hasta(self, limite, longitud_media):
+        """Puntajes de los postings con doc < limite; el cursor queda en el siguiente"""
+        fin = bisect_left(self.docs, limite, self.pos, self.fin)
+        puntajes = puntuar_tramo(self.docs[self.pos:fin], self.tfs[self.pos:fin], self.idf,
+                                 self.longitudes, self.base, longitud_media)
+        self.pos = fin
+        return puntajes
+
+    def cota_bloque(self, doc_id, longitud_media):
+        """(cota, último doc_id) del tramo que contendría doc_id: sin bloques, toda la lista"""
+        return self.cota, self.docs[self.fin - 1]
+
+    def saltar_bloques(self, umbral, limite, longitud_media):
+        """Sin bloques no hay nada que saltar por cota: va hasta limite o al final"""
+        self.saltar_a(self.docs[self.fin - 1] + 1 if limite is None else limite)
+
+
+def puntuar_exhaustivo(cursores, longitud_media):
+    """Puntaje BM25 de todos los documentos que contienen algún término"""
+    puntajes = defaultdict(float)
+    for cursor in cursores:
+        while cursor.doc is not None:
+            puntajes[cursor.doc] += cursor.puntaje(longitud_media)
+            cursor.avanzar()
+    return puntajes
+
+
+def insertar(heap, k, puntaje, doc_id):
+    """Mete un documento en el heap del top-k y devuelve el umbral nuevo.
+
+    El umbral es -1 mientras no haya k documentos. Los doc_id llegan en
+    orden creciente: con empate se queda el anterior, así que sólo se
+    llama con puntaje > umbral.
+    """
+    if len(heap) < k:
+        heapq.heappush(heap, (puntaje, -doc_id))
+    else:
+        heapq.heapreplace(heap, (puntaje, -doc_id))
+    return heap[0][0] if len(heap) == k else -1.0
+
+
+def top_k_wand(cursores, k, longitud_media):
+    """Top-k por BM25 con poda dinámica block-max WAND.
+
+    Mantiene un heap de tamaño k; un documento sólo se puntúa si la suma
+    de cotas de los cursores que pueden contenerlo supera el umbral
+    actual (el k-ésimo mejor puntaje). Elegido el pivote con las cotas de
+    cada término, se comprueba con las cotas de los bloques donde caería:
+    si no superan el umbral, todos esos cursores saltan al final del bloque
+    más corto sin decodificar nada. Con un solo término es el mismo bucle
+    (cuando un cursor va solo, su tramo hasta el siguiente se puntúa de
+    una vez), así que en cuanto el heap se llena sólo se leen los bloques
+    cuya cota supera el umbral. Un término puede tener un cursor por segmento: como
+    los rangos de doc_id de los segmentos son disjuntos, sumar sus cotas
+    sólo hace la poda más conservadora. Devuelve [(puntaje, doc_id)]
+    ordenado de mayor a menor, con empates resueltos por doc_id ascendente.
+    """
+    cursores = [c for c in cursores if c.doc is not None]
+    heap = []
+    umbral = -1.0
+
+    while cursores:
+        cursores.sort(key=lambda c: c.doc)
+
+        # Pivote: primer cursor en el que la suma de cotas supera el umbral
+        acumulado = 0.0
+        pivote = None
+        for i, cursor in enumerate(cursores):
+            acumulado += cursor.cota
+            if acumulado > umbral:
+                pivote = i
+                break
+        if pivote is None:
+            break
+
+        doc_pivote = cursores[pivote].doc
+        # Los cursores que ya están en doc_pivote también lo puntúan
+        fin = pivote + 1
+        while fin < len(cursores) and cursores[fin].doc == doc_pivote:
+            fin += 1
+
+        # Cota block-max de doc_pivote; vale hasta siguiente (excluido), donde
+        # acaba el bloque más corto o empieza el próximo cursor
+        cota = 0.0
+        siguiente = cursores[fin].doc if fin < len(cursores) else None
+        for cursor in cursores[:fin]:
+            cota_bloque, ultimo = cursor.cota_bloque(doc_pivote, longitud_media)
+            cota += cota_bloque
+            if siguiente is None or ultimo < siguiente:
+                siguiente = ultimo + 1
+
+        if cota <= umbral:
+            # Ningún documento en [doc_pivote, siguiente) puede entrar en el top-k
+            if fin == 1:
+                # Un cursor solo sigue saltando bloques hasta el próximo cursor
+                limite = cursores[1].doc if len(cursores) > 1 else None
+                cursores[0].saltar_bloques(umbral, limite, longitud_media)
+            else:
+                for cursor in cursores[:fin]:
+                    cursor.saltar_a(siguiente)
+        elif fin == 1:
+            # Hasta siguiente sólo puntúa este cursor: el tramo va de una vez
+            for puntaje, doc_id in cursores[0].puntuar_hasta(siguiente, longitud_media):
+                if puntaje > umbral or len(heap) < k:
+                    umbral = insertar(heap, k, puntaje, doc_id)
+        elif cursores[0].doc == doc_pivote:
+            # Todos los cursores hasta fin están en doc_pivote
+            puntaje = 0.0
+            for cursor in cursores[:fin]:
+                puntaje += cursor.puntaje(longitud_media)
+                cursor.avanzar()
+            if puntaje > umbral or len(heap) < k:
+                umbral = insertar(heap, k, puntaje, doc_pivote)
+        else:
+            # Ningún documento antes del pivote puede entrar en el top-k
+            for cursor in cursores[:pivote]:
+                cursor.saltar_a(doc_pivote)
+
+        cursores = [c for c in cursores if c.doc is not None]
+
+    return sorted(((p, -d) for p, d in heap), key=lambda x: (-x[0], x[1]))
+
+
+def estimar_total(grupos, n_docs):
+    """Total de documentos que contienen algún término de la consulta.
+
+    grupos tiene, por término, la lista de secuencias de doc_id de cada
+    segmento. Con pocas postings se cuenta exacto (unión de conjuntos);
+    si no, se estima suponiendo independencia entre términos.
+    """
+    grupos = [g for g in grupos if g]
+    if not grupos:
+        return 0
+    dfs = [sum(len(docs) for docs in grupo) for grupo in grupos]
+    if len(grupos) == 1:
+        return dfs[0]
+    if sum(dfs) <= LIMITE_CONTEO_EXACTO:
+        union = set()
+        for grupo in grupos:
+            for docs in grupo:
+                union.update(docs)
+        return len(union)
+    ausente = 1.0
+    for df in dfs:
+        ausente *= 1 - df / n_docs
+    return max(int(round(n_docs * (1 - ausente))), max(dfs))
@@ -0,0 +1,231 @@
+import atexit
+import json
+import multiprocessing
+import os
+import threading
+import zlib
+from urllib.parse import urlparse
+
+from indexador import Indexador
+
+# Los shards se arrancan desde hilos de Flask o del crawler: un fork con
+# otros hilos vivos podría heredar locks tomados. forkserver (o spawn
+# donde no existe) arranca cada proceso desde un intérprete limpio
+CONTEXTO = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+
+def ejecutar_shard(json_path, conexion, opciones):
+    """Bucle de un proceso shard: atiende llamadas al Indexador que posee"""
+    indexador = Indexador(json_path, **opciones)
+    while True:
+        try:
+            metodo, args, kwargs = conexion.recv()
+        except EOFError:
+            break
+        if metodo == 'cerrar':
+            indexador.flush()
+            conexion.send(('ok', None))
+            break
+        try:
+            resultado = getattr(indexador, metodo)(*args, **kwargs)
+            conexion.send(('ok', resultado))
+        except Exception as e:
+            conexion.send(('error', f"{type(e).__name__}: {e}"))
+
+
+class Shard:
+    """Proceso worker dueño de una partición del índice"""
+
+    def __init__(self, numero, json_path, opciones):
+        self.numero = numero
+        self.json_path = json_path
+        self.conexion, extremo = CONTEXTO.Pipe()
+        self.lock = threading.Lock()
+        self.proceso = CONTEXTO.Process(target=ejecutar_shard,
+                                               args=(json_path, extremo, opciones),
+                                               name=f"shard-{numero}")
+        self.proceso.daemon = True
+        self.proceso.start()
+
+    def enviar(self, metodo, *args, **kwargs):
+        self.conexion.send((metodo, args, kwargs))
+
+    def recibir(self):
+        estado, resultado = self.conexion.recv()
+        if estado == 'error':
+            raise RuntimeError(f"shard {self.numero}: {resultado}")
+        return resultado
+
+    def llamar(self, metodo, *args, **kwargs):
+        with self.lock:
+            self.enviar(metodo, *args, **kwargs)
+            return self.recibir()
+
+
+class IndexadorDistribuido:
+    """Índice particionado en N procesos con búsqueda scatter-gather.
+
+    Cada página pertenece al shard hash(dominio) % N, así que los datos de
+    un dominio viven en un solo proceso. Las búsquedas se envían a todos
+    los shards a la vez en dos fases: primero cada shard devuelve sus
+    documentos, longitud total y df de los términos, y después puntúa su
+    top-k con esas estadísticas sumadas, así que idf y longitud media son
+    los de un índice único. El coordinador mezcla por puntaje sin
+    redondear (desempate por doc_id) y suma los totales. Ofrece la misma
+    interfaz pública que Indexador.
+    """
+
+    def __init__(self, num_shards=4, directorio='data/shards', json_path='data/index.json',
+                 **opciones):
+        self.num_shards = num_shards
+        self.directorio = directorio
+        self.json_path = json_path
+        self.opciones = opciones
+        self.shards = None
+        self.lock_inicio = threading.Lock()
+
+    def iniciar(self):
+        """Arranca los procesos la primera vez que se usan.
+
+        Arrancar en el constructor rompería los modos spawn y forkserver,
+        que reimportan app.py en los procesos hijos.
+        """
+        if self.shards is not None:
+            return
+        with self.lock_inicio:
+            if self.shards is not None:
+                return
+            nuevo = not any(os.path.exists(os.path.join(self.ruta_shard(n), 'index', 'manifest.json'))
+                            for n in range(self.num_shards))
+            self.shards = [Shard(n, os.path.join(self.ruta_shard(n), 'index.json'), self.opciones)
+                           for n in range(self.num_shards)]
+            atexit.register(self.cerrar)
+            if nuevo and os.path.exists(self.json_path):
+                self.importar_json()
+
+    def ruta_shard(self, numero):
+        return os.path.join(self.directorio, f"shard_{numero:02d}")
+
+    def importar_json(self):
+        """Reparte entre los shards las páginas del data/index.json heredado"""
+        try:
+            with open(self.json_path, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+            paginas = {p['url']: p for p in legacy.get('paginas', [])}
+            self.agregar_paginas(paginas)
+            self.flush()
+            print(f"📁 {len(paginas)} páginas repartidas en {self.num_shards} shards")
+        except Exception as e:
+            print(f"Error repartiendo {self.json_path}: {e}")
+
+    def shard_de(self, url):
+        """Shard dueño de una URL según el hash estable de su dominio"""
+        dominio = urlparse(url).netloc.lower()
+        return zlib.crc32(dominio.encode('utf-8')) % self.num_shards
+
+    def llamar_todos(self, metodo, *args, **kwargs):
+        """Scatter-gather: envía a todos los shards y después recoge las respuestas"""
+        self.iniciar()
+        for shard in self.shards:
+            shard.lock.acquire()
+        try:
+            for shard in self.shards:
+                shard.enviar(metodo, *args, **kwargs)
+            return [shard.recibir() for shard in self.shards]
+        finally:
+            for shard in self.shards:
+                shard.lock.release()
+
+    def agregar_paginas(self, nuevas_paginas):
+        """Encola cada página en el shard dueño de su dominio"""
+        self.iniciar()
+        por_shard = {}
+        for url, info in nuevas_paginas.items():
+            por_shard.setdefault(self.shard_de(url), {})[url] = info
+        return sum(self.shards[n].llamar('agregar_paginas', paginas)
+                   for n, paginas in por_shard.items())
+
+    def buscar(self, query, page=1, per_page=10, exhaustivo=False):
+        """Busca en todos los shards con estadísticas globales y mezcla sus top-k"""
+        k = page * per_page
+        globales = {'n_docs': 0, 'longitud_total': 0, 'df': {}}
+        for parte in self.llamar_todos('estadisticas_consulta', query):
+            globales['n_docs'] += parte['n_docs']
+            globales['longitud_total'] += parte['longitud_total']
+            for palabra, df in parte['df'].items():
+                globales['df'][palabra] = globales['df'].get(palabra, 0) + df
+        if not globales['n_docs']:
+            return [], 0
+
+        respuestas = self.llamar_todos('buscar_global', query, k, globales, exhaustivo=exhaustivo)
+        candidatos = []
+        total = 0
+        for numero, (resultados, total_shard) in enumerate(respuestas):
+            total += total_shard
+            for puntaje, doc_id, resultado in resultados:
+                candidatos.append((-puntaje, doc_id, numero, resultado))
+        candidatos.sort(key=lambda c: c[:3])
+        start = (page - 1) * per_page
+        return [c[3] for c in candidatos[start:start + per_page]], total
+
+    def flush(self, timeout=None):
+        return all(self.llamar_todos('flush', timeout))
+
+    def guardar_index(self):
+        self.llamar_todos('guardar_index')
+
+    def limpiar_index(self):
+        self.llamar_todos('limpiar_index')
+
+    def obtener_estadisticas(self):
+        """Suma las estadísticas de los shards.
+
+        total_keywords es la suma de los vocabularios de cada shard, así
+        que cuenta varias veces los términos compartidos.
+        """
+        por_shard = self.llamar_todos('obtener_estadisticas')
+        stats = {
+            'total_paginas': sum(s['total_paginas'] for s in por_shard),
+            'total_keywords': sum(s['total_keywords'] for s in por_shard),
+            'total_domains': sum(s['total_domains'] for s in por_shard),
+            'last_update': max((s['last_update'] for s in por_shard if s['last_update']), default=None),
+            'created': min((s['created'] for s in por_shard if s['created']), default=None),
+            'segmentos': sum(s['segmentos'] for s in por_shard),
+            'registros_wal': sum(s['registros_wal'] for s in por_shard),
+            'num_shards': self.num_shards,
+            'shards': por_shard
+        }
+        return stats
+
+    def obtener_paginas_recientes(self, limit=20):
+        paginas = []
+        for lista in self.llamar_todos('obtener_paginas_recientes', limit):
+            paginas.extend(lista)
+        paginas.sort(key=lambda p: p.get('crawled_date', ''), reverse=True)
+        return paginas[:limit]
+
+    def obtener_domains(self):
+        dominios = {}
+        for parte in self.llamar_todos('obtener_domains'):
+            for domain, info in parte.items():
+                entrada = dominios.setdefault(domain, {'pages_count': 0, 'last_crawled': info['last_crawled']})
+                entrada['pages_count'] += info['pages_count']
+                entrada['last_crawled'] = max(entrada['last_crawled'], info['last_crawled'])
+        return dominios
+
+    def url_esta_indexada(self, url):
+        self.iniciar()
+        return self.shards[self.shard_de(url)].llamar('url_esta_indexada', url)
+
+    def cerrar(self):
+        """Confirma lo pendiente y detiene los procesos"""
+        if not self.shards:
+            return
+        for shard in self.shards:
+            try:
+                shard.llamar('cerrar')
+                shard.proceso.join(timeout=10)
+            except (EOFError, OSError, BrokenPipeError):
+                pass
+        self.shards = None
@@ -0,0 +1,99 @@
+import os
+import random
+
+import almacenamiento
+from almacenamiento import AlmacenSegmentos
+from formato_binario import SegmentoBinario, escribir_segmento, fusionar_segmentos
+
+
+def pagina(doc_id, rng):
+    palabras = [f"t{rng.randint(0, 60)}" for _ in range(rng.randint(3, 40))]
+    return {
+        'doc_id': doc_id,
+        'url': f"https://ejemplo-{doc_id % 7}.com/{doc_id}",
+        'title': ' '.join(palabras[:4]),
+        'description': '',
+        'text_snippet': ' '.join(palabras[4:]),
+        'keywords': sorted(set(palabras))[:6],
+        'domain': f"ejemplo-{doc_id % 7}.com",
+        'crawled_date': f"2024-01-{doc_id % 28 + 1:02d}T00:00:00"
+    }
+
+
+def test_fusionar_segmentos_igual_que_reescribir(tmp_path):
+    rng = random.Random(3)
+    # El doc_id 700 se perdió: queda un hueco entre el segundo y el tercer segmento
+    tramos = [range(0, 300), range(300, 700), range(701, 1000)]
+    paginas = {d: pagina(d, rng) for tramo in tramos for d in tramo}
+    rutas = []
+    for n, tramo in enumerate(tramos):
+        rutas.append(str(tmp_path / f"seg_{n}.bin"))
+        escribir_segmento(rutas[-1], [paginas[d] for d in tramo], terminos_nuevos=0 if n else None)
+
+    fusionar_segmentos(str(tmp_path / 'fusion.bin'), rutas)
+    escribir_segmento(str(tmp_path / 'todo.bin'), list(paginas.values()))
+    fusion = SegmentoBinario(str(tmp_path / 'fusion.bin'))
+    todo = SegmentoBinario(str(tmp_path / 'todo.bin'))
+
+    assert (fusion.base, fusion.n_docs, fusion.n_terms, fusion.longitud_total) == \
+        (todo.base, todo.n_docs, todo.n_terms, todo.longitud_total)
+    assert fusion.terminos_nuevos == SegmentoBinario(rutas[0]).terminos_nuevos
+    assert bytes(fusion.longitudes) == bytes(todo.longitudes)
+    assert fusion.dominios == todo.dominios
+    assert list(fusion.registros()) == list(todo.registros())
+    assert fusion.documento(700) is None
+    for doc_id in (0, 299, 300, 999):
+        assert fusion.buscar_url(paginas[doc_id]['url']) == doc_id
+    for i in range(todo.n_terms):
+        assert fusion.termino(i) == todo.termino(i)
+        assert fusion.lista(i).completa() == todo.lista(i).completa()
+        assert (fusion.max_tf[i], fusion.min_len[i]) == (todo.max_tf[i], todo.min_len[i])
+    assert bytes(fusion.bloque_max_peso) == bytes(todo.bloque_max_peso)
+
+
+def almacen_con_documentos(monkeypatch, documentos, max_wal=100, max_segmentos=4):
+    """Almacén sin abrir y nombres de segmentos con esos n_docs"""
+    nombres = [f"seg_{n:06d}.bin" for n in range(len(documentos))]
+    tamanos = dict(zip(nombres, documentos))
+    monkeypatch.setattr(almacenamiento, 'documentos_segmento',
+                        lambda ruta: tamanos[os.path.basename(ruta)])
+    return AlmacenSegmentos('no-existe', max_wal=max_wal, max_segmentos=max_segmentos), nombres
+
+
+def test_nivel_por_documentos(monkeypatch):
+    almacen, _ = almacen_con_documentos(monkeypatch, [])
+    assert [almacen.nivel(n) for n in (1, 100, 399, 400, 1599, 1600)] == [0, 0, 0, 1, 1, 2]
+
+
+def test_elegir_fusion_junta_solo_segmentos_del_mismo_nivel(monkeypatch):
+    # Un segmento grande ya fusionado y WALs recién sellados
+    almacen, nombres = almacen_con_documentos(monkeypatch, [6400, 100, 100, 100, 90])
+    assert almacen.elegir_fusion(nombres) == (1, 5)
+    assert almacen.elegir_fusion(nombres[:4]) is None
+
+
+def test_elegir_fusion_empieza_por_el_nivel_mas_bajo(monkeypatch):
+    almacen, nombres = almacen_con_documentos(monkeypatch, [400] * 4 + [100] * 4)
+    assert almacen.elegir_fusion(nombres) == (4, 8)
+    assert almacen.elegir_fusion(nombres[:7]) == (0, 4)
+
+
+def test_fusiones_por_niveles(tmp_path, monkeypatch):
+    rng = random.Random(5)
+    almacen = AlmacenSegmentos(str(tmp_path / 'index'), max_wal=50, max_segmentos=4)
+    almacen.abrir()
+    # Sin hilo: la fusión se hace aquí mismo
+    monkeypatch.setattr(almacen, 'fusionar_en_segundo_plano', lambda: None)
+    for doc_id in range(1600):
+        almacen.agregar([pagina(doc_id, rng)])
+        if almacen.necesita_sellar():
+            almacen.sellar()
+            almacen.fusionar()
+    almacen.wal.close()
+
+    segmentos = [SegmentoBinario(almacen.ruta(n)) for n in almacen.segmentos()]
+    # 32 WALs sellados: dos segmentos de 16 WALs, sin ninguno pendiente
+    assert [seg.n_docs for seg in segmentos] == [800, 800]
+    assert sum(seg.n_docs for seg in segmentos) == 1600
+    assert [seg.base for seg in segmentos] == sorted(seg.base for seg in segmentos)
+    assert almacen.elegir_fusion(almacen.segmentos()) is None
@@ -0,0 +1,56 @@
+import os
+
+import cache_paginas
+from cache_paginas import AlmacenPaginas
+
+
+def clave(i):
+    return f"{i:032x}"
+
+
+def recalcular(almacen):
+    en_disco = sum(tam['total'] for tam in almacen.packs.values())
+    vivos = sum(tam['vivos'] for tam in almacen.packs.values())
+    return en_disco, vivos, sum(e[4] for e in almacen.indice.values())
+
+
+def test_estadisticas_al_dia_tras_guardar_borrar_y_compactar(tmp_path):
+    almacen = AlmacenPaginas(str(tmp_path), tam_pack=4096, compresion='zlib')
+    almacen.revisar_basura = lambda: None
+    for i in range(60):
+        almacen.guardar(clave(i), f"<p>página {i}</p>" * (i + 1))
+    for i in range(0, 60, 2):
+        almacen.borrar(clave(i))
+    almacen.guardar(clave(1), "<p>otra versión</p>")
+    assert (almacen.bytes_disco, almacen.bytes_vivos, almacen.bytes_originales) == recalcular(almacen)
+
+    almacen.compactar()
+    assert almacen.pack_con_basura() is None
+    assert (almacen.bytes_disco, almacen.bytes_vivos, almacen.bytes_originales) == recalcular(almacen)
+    almacen.cerrar()
+
+    reabierto = AlmacenPaginas(str(tmp_path), tam_pack=4096, compresion='zlib')
+    assert reabierto.estadisticas() == almacen.estadisticas()
+    assert reabierto.leer(clave(1)) == "<p>otra versión</p>"
+    reabierto.cerrar()
+
+
+def test_compactar_fallido_descarta_el_pack_nuevo(tmp_path, monkeypatch):
+    almacen = AlmacenPaginas(str(tmp_path), tam_pack=4096, compresion='zlib')
+    almacen.revisar_basura = lambda: None
+    for i in range(60):
+        almacen.guardar(clave(i), f"<p>página {i}</p>" * (i + 1))
+    for i in range(0, 60, 2):
+        almacen.borrar(clave(i))
+    packs = set(almacen.packs)
+    archivos = set(os.listdir(tmp_path))
+
+    def fallar(fd):
+        raise OSError("disco lleno")
+    monkeypatch.setattr(cache_paginas.os, 'fsync', fallar)
+    almacen.compactar()
+
+    assert set(almacen.packs) == packs
+    assert set(os.listdir(tmp_path)) == archivos
+    assert almacen.leer(clave(1)) == "<p>página 1</p>" * 2
+    almacen.cerrar()
@@ -0,0 +1,46 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from cliente_http import ClienteHTTP
+
+
+class Respuesta(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Set-Cookie', 'sesion=1')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def url():
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), Respuesta)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{servidor.server_port}/"
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_estadisticas_por_cliente(url):
+    uno = ClienteHTTP(ttl_dns=60)
+    otro = ClienteHTTP(ttl_dns=5)
+    for _ in range(4):
+        assert uno.get(url, timeout=5).text == 'ok'
+    otro.get(url, timeout=5)
+
+    stats = uno.estadisticas()
+    assert (stats['requests'], stats['connections_opened'], stats['connections_reused']) == (4, 1, 3)
+    stats = otro.estadisticas()
+    assert (stats['requests'], stats['connections_opened'], stats['connections_reused']) == (1, 1, 0)
+    assert (uno.dns.ttl, otro.dns.ttl) == (60, 5)
+    # get() no guarda las cookies de las respuestas
+    assert not uno.sesion_suelta.cookies
@@ -0,0 +1,101 @@
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from crawler import WebCrawler
+
+PAGINAS_POR_HOST = 30
+HOSTS = ('127.0.0.1', 'localhost')
+
+
+class Grafo(BaseHTTPRequestHandler):
+    """Páginas /0 ... /29 en cada host; cada una enlaza a otras de los dos hosts"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        servidor = self.server
+        host = self.headers['Host'].split(':')[0]
+        with servidor.lock:
+            servidor.activas[host] += 1
+            servidor.maximo[host] = max(servidor.maximo[host], servidor.activas[host])
+        try:
+            # Las descargas de un host se solapan si la frontera lo permite
+            time.sleep(0.01)
+            try:
+                numero = int(self.path.strip('/') or 0)
+            except ValueError:
+                numero = PAGINAS_POR_HOST
+            if numero >= PAGINAS_POR_HOST:
+                self.send_error(404)
+                return
+            cuerpo = self.pagina(host, numero).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+        finally:
+            with servidor.lock:
+                servidor.activas[host] -= 1
+
+    def pagina(self, host, numero):
+        puerto = self.server.server_port
+        # Texto distinto en cada página para que no se tomen por casi duplicadas
+        rng = random.Random(f"{host}/{numero}")
+        texto = ' '.join(f"palabra{rng.randrange(100000)}" for _ in range(120))
+        enlaces = ''.join(f'<a href="http://{otro}:{puerto}/{destino}">x</a>'
+                          for otro in HOSTS
+                          for destino in ((numero + 1) % PAGINAS_POR_HOST, numero * 7 % PAGINAS_POR_HOST))
+        return (f"<html><head><title>Página {host} {numero}</title></head>"
+                f"<body><p>{texto}</p>{enlaces}</body></html>")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), Grafo)
+    servidor.daemon_threads = True
+    servidor.lock = threading.Lock()
+    servidor.activas = Counter()
+    servidor.maximo = Counter()
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def rastrear(servidor, tmp_path, modo, max_paginas):
+    crawler = WebCrawler(cache_dir=str(tmp_path / 'cache'), retraso_host=0, concurrencia_host=2)
+    indexadas = []
+    semillas = [f"http://{host}:{servidor.server_port}/0" for host in HOSTS]
+    if modo == 'async':
+        crawler.start_async_crawl(indexadas.extend, concurrencia=20, semillas=semillas,
+                                  max_paginas=max_paginas)
+    else:
+        crawler.start_pipeline_crawl(indexadas.extend, descargadores=8, analizadores=2,
+                                     semillas=semillas, max_paginas=max_paginas)
+    return crawler, indexadas
+
+
+@pytest.mark.parametrize('modo', ['async', 'pipeline'])
+def test_rastrea_todo_el_grafo_respetando_la_concurrencia_por_host(servidor, tmp_path, modo):
+    crawler, indexadas = rastrear(servidor, tmp_path, modo, None)
+    assert len(indexadas) == len(set(indexadas)) == 2 * PAGINAS_POR_HOST
+    assert crawler.pages_crawled == 2 * PAGINAS_POR_HOST
+    assert set(servidor.maximo) == set(HOSTS)
+    assert max(servidor.maximo.values()) <= 2
+
+
+@pytest.mark.parametrize('modo', ['async', 'pipeline'])
+def test_se_detiene_en_max_paginas(servidor, tmp_path, modo):
+    crawler, indexadas = rastrear(servidor, tmp_path, modo, 25)
+    assert len(indexadas) == len(set(indexadas)) == 25
+    assert max(servidor.maximo.values()) <= 2
@@ -0,0 +1,44 @@
+from frontera import Frontera
+
+
+def test_cerrar_marca_las_urls_en_curso_como_reanudadas(tmp_path):
+    ruta = str(tmp_path / 'frontera.db')
+    frontera = Frontera(retraso=0, ruta_disco=ruta)
+    for url in ('https://a.com/1', 'https://b.com/2', 'https://c.com/3'):
+        frontera.put(url)
+    hecha = frontera.get()
+    frontera.task_done(hecha)
+    en_curso = frontera.get()
+    frontera.cerrar()
+
+    frontera = Frontera(retraso=0, ruta_disco=ruta)
+    assert frontera.qsize() == 2
+    assert frontera.reanudada(en_curso)
+    assert not frontera.reanudada(hecha)
+    urls = [frontera.get(), frontera.get()]
+    assert en_curso in urls
+    for url in urls:
+        frontera.task_done(url)
+    assert not frontera.reanudada(en_curso)
+    frontera.cerrar()
+
+    # Procesada tras reanudar: ya no vuelve a marcarse
+    assert not Frontera(retraso=0, ruta_disco=ruta).reanudada(en_curso)
+
+
+def test_enlaces_repetidos_no_hacen_crecer_los_heaps():
+    frontera = Frontera(retraso=0)
+    urls = [f'https://h{i % 10}.com/{i}' for i in range(1000)]
+    for _ in range(200):
+        for url in urls:
+            frontera.put(url)
+    assert len(frontera.pendientes) == 1000
+    assert sum(len(estado.cola) for estado in frontera.hosts.values()) <= 3 * 1000
+    assert frontera.pendientes[urls[0]][1] == 200
+
+    servidas = set()
+    for _ in urls:
+        url = frontera.get_nowait()
+        servidas.add(url)
+        frontera.task_done(url)
+    assert servidas == set(urls)
@@ -0,0 +1,108 @@
+import random
+
+import pytest
+
+from formato_binario import SegmentoBinario, escribir_segmento
+from postings import ListaBloques
+from recuperacion import (MARGEN_COTA, calcular_frecuencias, idf_bm25, peso_bm25, puntuar_exhaustivo,
+                          tokenizar, top_k_wand)
+
+# Vocabulario sesgado: unos pocos términos están en casi todas las páginas
+VOCABULARIO = [f"t{i}" for i in range(40)]
+PESOS = [1 / (i + 1) for i in range(40)]
+
+
+def pagina(doc_id, rng):
+    palabras = rng.choices(VOCABULARIO, weights=PESOS, k=rng.randint(5, 80))
+    return {
+        'doc_id': doc_id,
+        'url': f"https://ejemplo.com/{doc_id}",
+        'title': ' '.join(palabras[:5]),
+        'description': '',
+        'text_snippet': ' '.join(palabras[5:]),
+        'keywords': sorted(set(palabras))[:8],
+        'domain': 'ejemplo.com',
+        'crawled_date': '2024-01-01T00:00:00'
+    }
+
+
+@pytest.fixture(scope='module')
+def segmentos(tmp_path_factory):
+    """Tres segmentos consecutivos con listas de varios bloques"""
+    rng = random.Random(7)
+    directorio = tmp_path_factory.mktemp('segmentos')
+    lectores = []
+    for i, (inicio, fin) in enumerate(((0, 1500), (1500, 1700), (1700, 3000))):
+        ruta = str(directorio / f"seg_{i}.bin")
+        escribir_segmento(ruta, [pagina(d, rng) for d in range(inicio, fin)])
+        lectores.append(SegmentoBinario(ruta))
+    return lectores
+
+
+def crear_cursores(segmentos, palabras, sin_cotas_bloque=False):
+    n_docs = sum(seg.n_docs for seg in segmentos)
+    longitud_media = sum(seg.longitud_total for seg in segmentos) / n_docs
+    cursores = []
+    for palabra in palabras:
+        partes = [(seg, seg.postings(palabra)) for seg in segmentos]
+        partes = [(seg, p) for seg, p in partes if p]
+        idf = idf_bm25(n_docs, sum(len(p[0]) for _, p in partes))
+        for seg, (lista, max_tf, min_longitud) in partes:
+            if sin_cotas_bloque:
+                # Como una lista de un segmento de la versión 2
+                lista = ListaBloques(lista.datos, lista.primeros, lista.ultimos, lista.offsets, lista.df)
+            cota = idf * peso_bm25(max_tf, min_longitud, longitud_media) * MARGEN_COTA
+            cursores.append(lista.crear_cursor(idf, cota, seg.longitudes, seg.base))
+    return cursores, longitud_media
+
+
+@pytest.mark.parametrize('palabras', [['t0'], ['t1'], ['t0', 't1'], ['t0', 't7', 't30'], ['t2', 't39']])
+@pytest.mark.parametrize('k', [1, 10, 50])
+@pytest.mark.parametrize('sin_cotas_bloque', [False, True])
+def test_wand_igual_que_exhaustivo(segmentos, palabras, k, sin_cotas_bloque):
+    cursores, longitud_media = crear_cursores(segmentos, palabras, sin_cotas_bloque)
+    esperado = puntuar_exhaustivo(cursores, longitud_media)
+    cursores, longitud_media = crear_cursores(segmentos, palabras, sin_cotas_bloque)
+    mejores = top_k_wand(cursores, k, longitud_media)
+
+    ordenados = sorted(esperado.values(), reverse=True)[:k]
+    assert [p for p, _ in mejores] == pytest.approx(ordenados)
+    for puntaje, doc_id in mejores:
+        assert esperado[doc_id] == pytest.approx(puntaje)
+
+
+def test_cota_de_bloque_acota_sus_postings(segmentos):
+    cursores, longitud_media = crear_cursores(segmentos, ['t0'])
+    for cursor in cursores:
+        while cursor.doc is not None:
+            cota, ultimo = cursor.cota_bloque(cursor.doc, longitud_media)
+            assert cursor.doc <= ultimo
+            assert cursor.puntaje(longitud_media) <= cota
+            cursor.avanzar()
+
+
+def test_wand_un_termino_no_decodifica_todos_los_bloques(segmentos):
+    cursores, longitud_media = crear_cursores(segmentos[:1], ['t0'])
+    lista = cursores[0].lista
+    decodificados = []
+    decodificar = lista.decodificar
+    lista.decodificar = lambda b: decodificados.append(b) or decodificar(b)
+    top_k_wand(cursores, 5, longitud_media)
+    assert len(decodificados) < len(lista.primeros)
+
+
+def test_tokenizar_quita_la_puntuacion():
+    assert tokenizar('Python, python. ¡PYTHON! (python)') == ['python'] * 4
+    assert tokenizar('¿Qué es C++? año-2024 foo_bar') == ['qué', 'es', 'c', 'año', '2024', 'foo', 'bar']
+    assert tokenizar('') == []
+
+
+def test_frecuencias_cuentan_terminos_con_puntuacion():
+    info = {'title': 'Python.', 'description': 'Aprende python, rápido',
+            'text_snippet': 'python; python: python', 'keywords': ['python', 'rápido']}
+    frecuencias, longitud = calcular_frecuencias(info)
+    # +1 por estar en las keywords
+    assert frecuencias == {'python': 6, 'rápido': 2}
+    assert longitud == 7
+    # La consulta se tokeniza igual que el texto indexado
+    assert tokenizar('python?') == ['python']
@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from indexador import Indexador
+from shards import IndexadorDistribuido
+
+VOCABULARIO = [f"t{i}" for i in range(50)]
+
+
+def paginas(n_docs):
+    """Páginas de 7 dominios; d0.com usa mucho t1, así que su shard tiene otro df"""
+    rng = random.Random(3)
+    resultado = {}
+    for doc_id in range(n_docs):
+        dominio = f"d{doc_id % 7}.com"
+        pesos = [5 if palabra == 't1' and dominio == 'd0.com' else 1 / (i + 1)
+                 for i, palabra in enumerate(VOCABULARIO)]
+        palabras = rng.choices(VOCABULARIO, weights=pesos, k=rng.randint(10, 60))
+        resultado[f"https://{dominio}/{doc_id}"] = {
+            'title': ' '.join(palabras[:5]),
+            'description': '',
+            'text_snippet': ' '.join(palabras[5:]),
+            'keywords': sorted(set(palabras))[:10],
+            'domain': dominio,
+            'crawled_date': '2024-01-01T00:00:00'
+        }
+    return resultado
+
+
+@pytest.fixture(scope='module')
+def indices(tmp_path_factory):
+    directorio = tmp_path_factory.mktemp('shards')
+    todas = paginas(2000)
+    unico = Indexador(str(directorio / 'unico' / 'index.json'))
+    unico.agregar_paginas(todas)
+    unico.flush()
+    distribuido = IndexadorDistribuido(3, directorio=str(directorio / 'shards'),
+                                       json_path=str(directorio / 'index.json'))
+    distribuido.agregar_paginas(todas)
+    distribuido.flush()
+    yield unico, distribuido
+    distribuido.cerrar()
+    unico.ingesta.cerrar()
+
+
+@pytest.mark.parametrize('consulta', ['t1', 't1 t2', 't5 t30', 't0 t1 t7'])
+def test_distribuido_ordena_igual_que_un_indice(indices, consulta):
+    unico, distribuido = indices
+    esperado, _ = unico.buscar(consulta, 1, 20)
+    resultados, _ = distribuido.buscar(consulta, 1, 20)
+    assert [r['relevance'] for r in resultados] == [r['relevance'] for r in esperado]
+    # Con empates el doc_id de cada shard puede ordenar distinto: cada URL
+    # tiene que llevar el puntaje que le da el índice único
+    todos = {r['url']: r['relevance'] for r in unico.buscar(consulta, 1, 2000, exhaustivo=True)[0]}
+    assert all(todos[r['url']] == r['relevance'] for r in resultados)
+    # Sin poda el total es exacto en los dos (con poda puede ser una estimación)
+    assert distribuido.buscar(consulta, 1, 20, exhaustivo=True)[1] == len(todos)
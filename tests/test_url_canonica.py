@@ -0,0 +1,27 @@
+from urllib.parse import urljoin
+
+from url_canonica import canonicalizar, clave
+
+
+def test_conserva_barra_final_de_directorio():
+    assert canonicalizar('https://docs.python.org/3/library/') == 'https://docs.python.org/3/library/'
+    assert canonicalizar('https://docs.python.org/3/library') == 'https://docs.python.org/3/library'
+
+
+def test_enlace_relativo_contra_directorio_canonico():
+    base = canonicalizar('https://docs.python.org/3/library/')
+    assert urljoin(base, 'page.html') == 'https://docs.python.org/3/library/page.html'
+
+
+def test_raiz_y_variantes():
+    assert canonicalizar('HTTPS://Example.COM:443') == 'https://example.com/'
+    assert canonicalizar('http://example.com/a/./b/../c/?utm_source=x&b=2&a=1#frag') == \
+        'http://example.com/a/c/?a=1&b=2'
+    assert clave('http://example.com/a/') == clave('https://example.com/a/') == 'example.com/a/'
+
+
+def test_filtrar_links_usa_la_url_servida(tmp_path):
+    from crawler import WebCrawler
+    crawler = WebCrawler(cache_dir=str(tmp_path), presupuesto_recrawl=None)
+    links = crawler.filtrar_links(['page.html'], 'https://docs.python.org/3/library/')
+    assert links == {'https://docs.python.org/3/library/page.html'}
@@ -0,0 +1,100 @@
+"""Forma canónica de las URLs que maneja el crawler.
+
+Variantes de una misma página (mayúsculas en el host, puerto por
+defecto, segmentos '..', parámetros utm_*, query en otro orden, fragmento)
+eran URLs distintas para visited, la frontera y el caché, y cada una
+costaba una descarga y una entrada de caché. canonicalizar() las
+reduce a una sola:
+
+    - esquema y host en minúsculas, sin punto final ni puerto por defecto
+    - ruta sin segmentos '.' / '..' y con los escapes %xx en mayúsculas;
+      los caracteres no reservados escapados (%7E...) se desescapan. La
+      barra final se conserva: '/docs/' y '/docs' resuelven los enlaces
+      relativos de forma distinta (y el servidor puede servir cosas
+      distintas)
+    - query sin parámetros de seguimiento y con los pares ordenados (se
+      conservan tal cual, sin recodificar)
+    - sin fragmento
+
+El esquema se conserva porque no se sabe si un sitio http sirve https;
+clave() lo quita para que http y https compartan la entrada de caché.
+"""
+
+import re
+from urllib.parse import urlsplit, urlunsplit, unquote
+
+PUERTOS = {'http': 80, 'https': 443}
+
+# Parámetros que sólo identifican la campaña o el clic, no el contenido
+SEGUIMIENTO = frozenset((
+    'gclid', 'dclid', 'fbclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid',
+    '_ga', '_gl', '_hsenc', '_hsmi', 'mkt_tok', 'ref_src', 'spm'
+))
+
+ESCAPE = re.compile(r'%([0-9A-Fa-f]{2})')
+NO_RESERVADOS = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~')
+
+
+def normalizar_escape(coincidencia):
+    caracter = chr(int(coincidencia.group(1), 16))
+    return caracter if caracter in NO_RESERVADOS else '%' + coincidencia.group(1).upper()
+
+
+def quitar_puntos(ruta):
+    """Quita los segmentos '.' y '..' de una ruta absoluta (RFC 3986, 5.2.4)"""
+    if '.' not in ruta:
+        return ruta
+    salida = []
+    for segmento in ruta.split('/')[1:]:
+        if segmento == '..':
+            if salida:
+                salida.pop()
+        elif segmento != '.':
+            salida.append(segmento)
+    final = '/' if ruta.endswith(('/.', '/..')) else ''
+    return '/' + '/'.join(salida) + final
+
+
+def es_seguimiento(par):
+    nombre = unquote(par.split('=', 1)[0]).lower()
+    return nombre.startswith('utm_') or nombre in SEGUIMIENTO
+
+
+def canonicalizar(url):
+    """Forma canónica de una URL http(s); las demás (o las que no se pueden
+    analizar) se devuelven sin cambios"""
+    try:
+        partes = urlsplit(url.strip())
+        esquema = partes.scheme.lower()
+        if esquema not in PUERTOS:
+            return url
+        host = (partes.hostname or '').rstrip('.')
+        puerto = partes.port
+    except ValueError:
+        return url
+
+    netloc = host
+    if ':' in host:
+        # IPv6 literal
+        netloc = f'[{host}]'
+    if puerto and puerto != PUERTOS[esquema]:
+        netloc += f':{puerto}'
+    if partes.username is not None:
+        credenciales = partes.username + (f':{partes.password}' if partes.password is not None else '')
+        netloc = f'{credenciales}@{netloc}'
+
+    ruta = ESCAPE.sub(normalizar_escape, partes.path) or '/'
+    ruta = quitar_puntos(ruta)
+
+    query = ''
+    if partes.query:
+        pares = [ESCAPE.sub(normalizar_escape, par) for par in partes.query.split('&') if par]
+        query = '&'.join(sorted(par for par in pares if not es_seguimiento(par)))
+
+    return urlunsplit((esquema, netloc, ruta, query, ''))
+
+
+def clave(url):
+    """URL canónica sin esquema: http y https comparten clave"""
+    canonica = canonicalizar(url)
+    return canonica.split('://', 1)[1] if '://' in canonica else canonica
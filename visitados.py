@@ -0,0 +1,365 @@
+"""Conjuntos de URLs visitadas para el crawler.
+
+Tres implementaciones con la interfaz de set que usa el crawler
+(url in v, v.add(url), len(v)):
+
+    exacto    set de URLs completas; sin falsos positivos, ~100+ B por URL
+    bloom     filtro de Bloom escalable sobre una huella de 64 bits
+    cuckoo    filtro cuckoo (4 huecos por cubo) sobre la misma huella
+
+Los filtros aceptan una tasa objetivo de falsos positivos (una URL nueva
+tomada por visitada y por tanto no rastreada) y crecen encadenando
+filtros nuevos, así que no hace falta conocer el número de URLs de
+antemano. A 0,1 % un filtro de Bloom lleno ocupa ~1,8 B por URL y uno
+cuckoo ~2,1 B (huellas de 16 bits); como cada filtro encadenado dobla al
+anterior, la media real queda en 2-4 B frente a los ~110 B del set.
+
+Todos se guardan en un único archivo binario (guardar) y se recuperan
+con crear_visitados(ruta=...), que reanuda el conjunto si el archivo
+existe.
+"""
+
+import hashlib
+import json
+import math
+import os
+import struct
+import sys
+from array import array
+
+MAGIA = b'VISIT001'
+# Máximo de desalojos antes de dar un filtro cuckoo por lleno
+MAX_DESALOJOS = 500
+# Ocupación máxima de un filtro cuckoo antes de encadenar otro
+OCUPACION_CUCKOO = 0.95
+
+
+def huella(url):
+    """Huella de 64 bits de la URL"""
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class ConjuntoExacto:
+    tipo = 'exacto'
+
+    def __init__(self):
+        self.urls = set()
+        self.bytes_urls = 0
+
+    def __contains__(self, url):
+        return url in self.urls
+
+    def add(self, url):
+        if url not in self.urls:
+            self.urls.add(url)
+            self.bytes_urls += sys.getsizeof(url)
+
+    def __len__(self):
+        return len(self.urls)
+
+    def memoria(self):
+        return sys.getsizeof(self.urls) + self.bytes_urls
+
+    def tasa_fp(self):
+        return 0.0
+
+    def exportar(self):
+        return {}, ['\n'.join(self.urls).encode('utf-8')]
+
+    @classmethod
+    def importar(cls, meta, bloques):
+        conjunto = cls()
+        if bloques[0]:
+            for url in bloques[0].decode('utf-8').split('\n'):
+                conjunto.add(url)
+        return conjunto
+
+
+class FiltroBloom:
+    """Filtro de Bloom de tamaño fijo; k posiciones por doble hashing de la huella"""
+
+    def __init__(self, capacidad, tasa_fp, bits=None, k=None, elementos=0, datos=None):
+        self.capacidad = capacidad
+        self.bits = bits or max(64, math.ceil(-capacidad * math.log(tasa_fp) / math.log(2) ** 2))
+        self.k = k or max(1, round(self.bits / capacidad * math.log(2)))
+        self.elementos = elementos
+        self.datos = datos if datos is not None else bytearray((self.bits + 7) // 8)
+
+    def posiciones(self, h):
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        bits = self.bits
+        return [(h1 + i * h2) % bits for i in range(self.k)]
+
+    def contiene(self, h):
+        datos = self.datos
+        return all(datos[p >> 3] & (1 << (p & 7)) for p in self.posiciones(h))
+
+    def agregar(self, h):
+        datos = self.datos
+        for p in self.posiciones(h):
+            datos[p >> 3] |= 1 << (p & 7)
+        self.elementos += 1
+
+    def lleno(self):
+        return self.elementos >= self.capacidad
+
+    def tasa_fp(self):
+        return (1 - math.exp(-self.k * self.elementos / self.bits)) ** self.k
+
+
+class BloomEscalable:
+    """Cadena de filtros de Bloom: cada uno el doble de grande y con la mitad de tasa.
+
+    La tasa total queda acotada por tasa_fp (serie geométrica).
+    """
+    tipo = 'bloom'
+    CRECIMIENTO = 2
+    RAZON = 0.5
+
+    def __init__(self, tasa_fp=0.001, capacidad=100000):
+        self.tasa_objetivo = tasa_fp
+        self.capacidad_inicial = capacidad
+        self.filtros = []
+        self.elementos = 0
+
+    def nuevo_filtro(self):
+        i = len(self.filtros)
+        tasa = self.tasa_objetivo * (1 - self.RAZON) * self.RAZON ** i
+        filtro = FiltroBloom(self.capacidad_inicial * self.CRECIMIENTO ** i, tasa)
+        self.filtros.append(filtro)
+        return filtro
+
+    def __contains__(self, url):
+        h = huella(url)
+        return any(f.contiene(h) for f in self.filtros)
+
+    def add(self, url):
+        h = huella(url)
+        if any(f.contiene(h) for f in self.filtros):
+            return
+        filtro = self.filtros[-1] if self.filtros and not self.filtros[-1].lleno() else self.nuevo_filtro()
+        filtro.agregar(h)
+        self.elementos += 1
+
+    def __len__(self):
+        return self.elementos
+
+    def memoria(self):
+        return sum(len(f.datos) for f in self.filtros)
+
+    def tasa_fp(self):
+        return 1 - math.prod(1 - f.tasa_fp() for f in self.filtros)
+
+    def exportar(self):
+        meta = {'tasa_fp': self.tasa_objetivo, 'capacidad': self.capacidad_inicial,
+                'elementos': self.elementos,
+                'filtros': [[f.capacidad, f.bits, f.k, f.elementos] for f in self.filtros]}
+        return meta, [bytes(f.datos) for f in self.filtros]
+
+    @classmethod
+    def importar(cls, meta, bloques):
+        bloom = cls(meta['tasa_fp'], meta['capacidad'])
+        bloom.elementos = meta['elementos']
+        for (capacidad, bits, k, elementos), datos in zip(meta['filtros'], bloques):
+            bloom.filtros.append(FiltroBloom(capacidad, None, bits, k, elementos, bytearray(datos)))
+        return bloom
+
+
+class TablaCuckoo:
+    """Tabla de cubos de 4 huecos con huellas de `ancho` bits (0 = hueco libre)"""
+    HUECOS = 4
+
+    def __init__(self, cubos, ancho, elementos=0, datos=None, victima=None):
+        self.cubos = cubos
+        self.mascara = cubos - 1
+        self.ancho = ancho
+        self.elementos = elementos
+        codigo = 'B' if ancho <= 8 else 'H' if ancho <= 16 else 'I'
+        if datos is None:
+            self.datos = array(codigo, bytes(cubos * self.HUECOS * array(codigo).itemsize))
+        else:
+            self.datos = array(codigo)
+            self.datos.frombytes(datos)
+        # (cubo, huella) que no cupo tras MAX_DESALOJOS; con víctima la tabla está llena
+        self.victima = tuple(victima) if victima else None
+
+    def indices(self, h):
+        f = (h & ((1 << self.ancho) - 1)) or 1
+        i1 = (h >> 32) & self.mascara
+        return f, i1, self.alternativo(i1, f)
+
+    def alternativo(self, i, f):
+        return (i ^ (f * 0x5BD1E995)) & self.mascara
+
+    def en_cubo(self, i, f):
+        inicio = i * self.HUECOS
+        return f in self.datos[inicio:inicio + self.HUECOS]
+
+    def contiene(self, h):
+        f, i1, i2 = self.indices(h)
+        if self.en_cubo(i1, f) or self.en_cubo(i2, f):
+            return True
+        return self.victima is not None and self.victima[1] == f and self.victima[0] in (i1, i2)
+
+    def poner(self, i, f):
+        datos = self.datos
+        inicio = i * self.HUECOS
+        for j in range(inicio, inicio + self.HUECOS):
+            if not datos[j]:
+                datos[j] = f
+                return True
+        return False
+
+    def lleno(self):
+        return self.victima is not None or self.elementos >= self.cubos * self.HUECOS * OCUPACION_CUCKOO
+
+    def agregar(self, h, azar):
+        f, i1, i2 = self.indices(h)
+        self.elementos += 1
+        if self.poner(i1, f) or self.poner(i2, f):
+            return
+        i = i1 if azar & 1 else i2
+        for _ in range(MAX_DESALOJOS):
+            azar = (azar * 1103515245 + 12345) & 0x7FFFFFFF
+            hueco = i * self.HUECOS + (azar >> 16) % self.HUECOS
+            f, self.datos[hueco] = self.datos[hueco], f
+            i = self.alternativo(i, f)
+            if self.poner(i, f):
+                return
+        self.victima = (i, f)
+
+    @classmethod
+    def tasa_maxima(cls, ancho):
+        """Tasa de falsos positivos con la tabla llena: 2 cubos de 4 huecos por búsqueda"""
+        return 2 * cls.HUECOS / (2 ** ancho - 1)
+
+    def tasa_fp(self):
+        ocupacion = self.elementos / (self.cubos * self.HUECOS)
+        return min(1.0, ocupacion * self.tasa_maxima(self.ancho))
+
+
+class FiltroCuckoo:
+    """Cadena de tablas cuckoo; cada tabla nueva tiene el doble de cubos"""
+    tipo = 'cuckoo'
+
+    def __init__(self, tasa_fp=0.001, capacidad=100000):
+        self.tasa_objetivo = tasa_fp
+        self.capacidad_inicial = capacidad
+        self.tablas = []
+        self.elementos = 0
+
+    def nueva_tabla(self):
+        i = len(self.tablas)
+        # Huellas de 8, 16 o 32 bits (lo que ocupa el array): la más corta que
+        # deje la suma de tasas de todas las tablas por debajo del objetivo
+        restante = self.tasa_objetivo - sum(TablaCuckoo.tasa_maxima(t.ancho) for t in self.tablas)
+        ancho = next((a for a in (8, 16) if TablaCuckoo.tasa_maxima(a) <= restante / 2), 32)
+        cubos = 1 << max(1, math.ceil(math.log2(
+            self.capacidad_inicial * 2 ** i / (TablaCuckoo.HUECOS * OCUPACION_CUCKOO))))
+        tabla = TablaCuckoo(cubos, ancho)
+        self.tablas.append(tabla)
+        return tabla
+
+    def __contains__(self, url):
+        h = huella(url)
+        return any(t.contiene(h) for t in self.tablas)
+
+    def add(self, url):
+        h = huella(url)
+        if any(t.contiene(h) for t in self.tablas):
+            return
+        tabla = self.tablas[-1] if self.tablas and not self.tablas[-1].lleno() else self.nueva_tabla()
+        # Bits de la huella que no usa la tabla eligen qué hueco desalojar
+        tabla.agregar(h, (h >> 16) & 0xFFFF ^ self.elementos)
+        self.elementos += 1
+
+    def __len__(self):
+        return self.elementos
+
+    def memoria(self):
+        return sum(len(t.datos) * t.datos.itemsize for t in self.tablas)
+
+    def tasa_fp(self):
+        return 1 - math.prod(1 - t.tasa_fp() for t in self.tablas)
+
+    def exportar(self):
+        meta = {'tasa_fp': self.tasa_objetivo, 'capacidad': self.capacidad_inicial,
+                'elementos': self.elementos,
+                'tablas': [[t.cubos, t.ancho, t.elementos, t.victima] for t in self.tablas]}
+        return meta, [t.datos.tobytes() for t in self.tablas]
+
+    @classmethod
+    def importar(cls, meta, bloques):
+        filtro = cls(meta['tasa_fp'], meta['capacidad'])
+        filtro.elementos = meta['elementos']
+        for (cubos, ancho, elementos, victima), datos in zip(meta['tablas'], bloques):
+            filtro.tablas.append(TablaCuckoo(cubos, ancho, elementos, datos, victima))
+        return filtro
+
+
+TIPOS = {c.tipo: c for c in (ConjuntoExacto, BloomEscalable, FiltroCuckoo)}
+
+
+def guardar(visitados, ruta, lock=None):
+    """Escribe el conjunto: MAGIA, u32 largo + JSON de metadatos, bloques binarios.
+
+    Con lock sólo la exportación se hace con él tomado: los hilos que
+    añaden URLs no esperan a la escritura.
+    """
+    if lock is None:
+        meta, bloques = visitados.exportar()
+    else:
+        with lock:
+            meta, bloques = visitados.exportar()
+    meta = dict(meta, tipo=visitados.tipo, bloques=[len(b) for b in bloques])
+    cabecera = json.dumps(meta).encode('utf-8')
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    tmp = ruta + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIA)
+        f.write(struct.pack('<I', len(cabecera)))
+        f.write(cabecera)
+        for bloque in bloques:
+            f.write(bloque)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, ruta)
+
+
+def cargar(ruta):
+    with open(ruta, 'rb') as f:
+        if f.read(len(MAGIA)) != MAGIA:
+            raise ValueError(f"{ruta} no es un archivo de URLs visitadas")
+        largo, = struct.unpack('<I', f.read(4))
+        meta = json.loads(f.read(largo))
+        bloques = [f.read(n) for n in meta['bloques']]
+    return TIPOS[meta['tipo']].importar(meta, bloques)
+
+
+def crear_visitados(tipo='exacto', tasa_fp=0.001, capacidad=100000, ruta=None):
+    """Conjunto de visitadas del tipo pedido; si ruta existe se reanuda el guardado"""
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de visitadas desconocido: {tipo} (usa {', '.join(TIPOS)})")
+    if ruta and os.path.exists(ruta):
+        try:
+            visitados = cargar(ruta)
+            print(f"📂 {len(visitados)} URLs visitadas recuperadas de {ruta} ({visitados.tipo})")
+            return visitados
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ No se pudieron leer las visitadas de {ruta}: {e}")
+    if tipo == 'exacto':
+        return ConjuntoExacto()
+    return TIPOS[tipo](tasa_fp, capacidad)
+
+
+def estadisticas(visitados):
+    return {
+        'backend': visitados.tipo,
+        'urls': len(visitados),
+        'memory_bytes': visitados.memoria(),
+        'bytes_per_url': round(visitados.memoria() / len(visitados), 2) if len(visitados) else 0,
+        'false_positive_rate': round(visitados.tasa_fp(), 6)
+    }